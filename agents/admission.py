@@ -0,0 +1,96 @@
+"""
+Admission control for shared model servers.
+
+Each model gets a concurrency limit and a bounded wait queue. Requests
+beyond the queue are rejected immediately, and requests that wait longer
+than the timeout are shed, so a burst of users degrades into clear errors
+instead of collapsing everyone's latency.
+"""
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
+
+class ServerBusyError(RuntimeError):
+    """Raised when a request cannot be admitted. retry_after is a hint in seconds."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency=2, max_queue=32, queue_timeout=60.0):
+        """
+        Args:
+            max_concurrency: Requests allowed to run at once.
+            max_queue: Requests allowed to wait for a slot.
+            queue_timeout: Seconds a request may wait before it is shed.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.counters = {"admitted": 0, "rejected": 0, "timed_out": 0}
+        self._waits = deque(maxlen=1000)
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Hold a slot for the duration of the block.
+        
+        Yields:
+            Seconds spent waiting in the queue.
+            
+        Raises:
+            ServerBusyError: If the queue is full or the wait timed out.
+        """
+        ## waiting also counts requests about to take a free slot, so a burst cannot overshoot the queue
+        if self.in_flight + self.waiting >= self.max_concurrency + self.max_queue:
+            self.counters["rejected"] += 1
+            raise ServerBusyError(f"Server busy: {self.waiting} requests already queued", retry_after=self._retry_after())
+
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["timed_out"] += 1
+            raise ServerBusyError(f"Server busy: no slot free after {self.queue_timeout:.0f}s", retry_after=self._retry_after())
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - start
+        self._waits.append(waited)
+        self.counters["admitted"] += 1
+        self.in_flight += 1
+        try:
+            yield waited
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def _retry_after(self):
+        waits = sorted(self._waits)
+        return round(waits[len(waits) // 2], 1) if waits else 1.0
+
+    def metrics(self):
+        """Queue depth, in-flight requests, counters and recent wait-time percentiles."""
+        waits = sorted(self._waits)
+
+        def percentile(p):
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return dict(
+            self.counters,
+            in_flight=self.in_flight,
+            queue_depth=self.waiting,
+            max_concurrency=self.max_concurrency,
+            max_queue=self.max_queue,
+            wait_p50=percentile(0.5),
+            wait_p95=percentile(0.95),
+            wait_max=waits[-1] if waits else 0.0,
+        )
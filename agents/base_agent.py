@@ -1,13 +1,14 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
-from tools.calculator import calculator
+from tools.calculator import batch_calculator, calculator
 from langchain.agents import AgentExecutor,create_tool_calling_agent
+from config import settings
+from config.registry import get_llm
 
 class BaseAgent:
-    def __init__(self,model_name='llama3.2:3b', temperature=0.1, max_tokens=1000):
+    def __init__(self,model_name=settings.DEFAULT_MODEL, temperature=settings.DEFAULT_TEMPERATURE, max_tokens=settings.DEFAULT_MAX_TOKENS):
                 
-        self.llm = ChatOllama(model=model_name,temperature=temperature,max_tokens=max_tokens)
-        self.tools = [calculator]
+        self.llm = get_llm(model_name, temperature, max_tokens)
+        self.tools = [calculator, batch_calculator]
         ## create the agent
         self.agent = self._create_agent()
         self.agent_executor = AgentExecutor(agent=self.agent, tools=self.tools, verbose=True)
@@ -33,3 +34,10 @@ class BaseAgent:
             return response
         except Exception as e:
             return f"An error occurred: {e}"
+
+    async def arun(self, input_text):
+        try:
+            response = await self.agent_executor.ainvoke({"input": input_text})
+            return response
+        except Exception as e:
+            return f"An error occurred: {e}"
@@ -0,0 +1,78 @@
+"""
+Thin client for the headless server (server.py).
+
+RemoteSupervisor exposes the parts of UISupervisor the Streamlit app uses,
+so the app can either run the agents in-process or share a server. The
+server answers each turn in one piece, so there is no run_stream.
+"""
+import os
+import uuid
+
+import requests
+
+from agents.rag_agent import IngestResult
+
+
+class RemoteSupervisor:
+    def __init__(self, server_url, session_id=None, timeout=300):
+        self.server_url = server_url.rstrip("/")
+        self.session_id = session_id or uuid.uuid4().hex
+        self.timeout = timeout
+        ## latency breakdown of the last turn, as measured by the server
+        self.last_trace = None
+
+    def run(self, input_text):
+        try:
+            response = requests.post(
+                f"{self.server_url}/chat",
+                json={"session_id": self.session_id, "message": input_text},
+                timeout=self.timeout,
+            )
+            if response.status_code == 503:
+                retry_after = response.headers.get("Retry-After", "a few")
+                return f"The server is busy, please retry in {retry_after} seconds."
+            response.raise_for_status()
+            result = response.json()
+            self.last_trace = result.get("trace")
+            return result["output"]
+        except Exception as e:
+            print(f"Error calling agent server: {e}")
+            return str(e)
+
+    def ingest(self, source, filename=None, progress=None, **kwargs):
+        """Upload a document to the server's shared knowledge base."""
+        if isinstance(source, (bytes, bytearray)):
+            data = bytes(source)
+        else:
+            with open(source, "rb") as f:
+                data = f.read()
+        filename = filename or (os.path.basename(source) if isinstance(source, str) else "document")
+        try:
+            response = requests.post(
+                f"{self.server_url}/documents",
+                params={"filename": filename},
+                data=data,
+                timeout=self.timeout,
+            )
+            return IngestResult(**response.json())
+        except Exception as e:
+            print(f"Error uploading document: {e}")
+            return IngestResult(source=filename, error=str(e))
+
+    def clear_conversation(self):
+        try:
+            requests.delete(f"{self.server_url}/sessions/{self.session_id}", timeout=self.timeout)
+        except Exception as e:
+            print(f"Error clearing conversation: {e}")
+
+    def get_session_info(self):
+        """Metadata of this session on the server, {} before its first message."""
+        try:
+            response = requests.get(f"{self.server_url}/sessions/{self.session_id}", timeout=self.timeout)
+            if response.status_code == 404:
+                return {}
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            print(f"Error retrieving session info: {e}")
+            return {}
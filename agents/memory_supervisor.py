@@ -1,17 +1,21 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 from langchain_core.tools import tool
 from agents.base_agent import BaseAgent
+from agents.streaming import stream_events
+from agents.subagents import agent_output, attach_async_subagents
 from agents.rag_agent import RagAgent
 from memory.memory_manager import MemoryManager
+from config import settings
+from config.registry import get_llm
+import asyncio
 
 class MemorySupervisor:
-    def __init__(self,model_name="llama3.2:3b" ):
-        self.llm = ChatOllama(model=model_name, temperature=0.1, max_tokens=1000)
-        self.memory_manager = MemoryManager()
-        self.base_agent = BaseAgent()
-        self.rag_agent = RagAgent()
+    def __init__(self,model_name=settings.DEFAULT_MODEL ):
+        self.llm = get_llm(model_name)
+        self.memory_manager = MemoryManager(model_name=model_name)
+        self.base_agent = BaseAgent(model_name=model_name)
+        self.rag_agent = RagAgent(model_name=model_name)
 
         self.tools = self._create_supervisor_tools()
 
@@ -26,8 +30,7 @@ class MemorySupervisor:
         def call_calculator_agent(query):
             """ Call the calculator agent with a query."""
             try:
-                response = self.base_agent.run(query)
-                return response.get('output', str(response))
+                return agent_output(self.base_agent.run(query))
             except Exception as e:
                 return f"Error calling calculator agent: {e}"
             
@@ -36,8 +39,7 @@ class MemorySupervisor:
         def call_rag_agent(query):
             """ Call the RAG agent with a query."""
             try:
-                response = self.rag_agent.run(query)
-                return response.get('output', str(response))
+                return agent_output(self.rag_agent.run(query))
             except Exception as e:
                 return f"Error calling RAG agent: {e}"
             
@@ -61,8 +63,10 @@ class MemorySupervisor:
                 return f"Retrieved from memory: {response}"
             except Exception as e:
                 return f"Error retrieving from memory: {e}"
-            
-        return [call_calculator_agent, call_rag_agent, save_to_memory, retrieve_from_memory]
+
+        tools = [call_calculator_agent, call_rag_agent, save_to_memory, retrieve_from_memory]
+        ## async versions let arun await the sub-agents
+        return attach_async_subagents(tools, self.base_agent, self.rag_agent)
 
     def _create_agent(self):
         prompt = ChatPromptTemplate.from_messages(
@@ -99,7 +103,7 @@ Memory guidelines:
     def run(self, input_text):
         try:
         ## get conversation history
-            conversation_history = self.memory_manager.get_conversation_history(query=input_text)
+            conversation_history = self.memory_manager.get_conversation_history(query=input_text).get("chat_history", [])
 
             ## run the agent with conversation history
             response = self.agent_executor.invoke({"input": input_text, "conversation_history": conversation_history})
@@ -112,11 +116,37 @@ Memory guidelines:
         except Exception as e:
             return f"An error occurred: {e}"
         
+    async def arun(self, input_text):
+        try:
+            ## session file and chroma access run in worker threads
+            conversation_history = (await asyncio.to_thread(self.memory_manager.get_conversation_history, input_text)).get("chat_history", [])
+
+            response = await self.agent_executor.ainvoke({"input": input_text, "conversation_history": conversation_history})
+
+            output = response.get('output', str(response))
+            await asyncio.to_thread(self.memory_manager.add_to_conversation, input_text, output)
+
+            return response
+        except Exception as e:
+            return f"An error occurred: {e}"
+        
     def get_memory_stats(self):
         """Get memory statistics"""
         session_info = self.memory_manager.get_session_metadata()
         return {
             "session_id": self.memory_manager.current_session,
             "messages_in_session": session_info.get("messages", 0),
-            "session_created": session_info.get("created", "Unknown")
-        }
\ No newline at end of file
+            "session_created": session_info.get("created_at", "Unknown")
+        }
+
+    def run_stream(self, input_text):
+        """Run a turn and stream its events, see agents.streaming."""
+        try:
+            conversation_history = self.memory_manager.get_conversation_history(query=input_text).get("chat_history", [])
+            inputs = {"input": input_text, "conversation_history": conversation_history}
+            for event in stream_events(self.agent_executor, inputs):
+                if event["type"] == "final":
+                    self.memory_manager.add_to_conversation(input_text, event["output"])
+                yield event
+        except Exception as e:
+            yield {"type": "final", "output": f"An error occurred: {e}"}
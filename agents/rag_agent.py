@@ -1,18 +1,59 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from tools.calculator import calculator
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from memory.vector_store import VectorStore
-from tools.document import document_loader,split_document_content
-from langchain_community.document_loaders import PyPDFLoader,TextLoader
+from memory.vector_store import create_vector_store, chunk_id
+from memory.manifest import ID_SCHEME, fingerprint, file_fingerprint
+from tools.document import document_loader,split_document_content,iter_pages
 from langchain_core.tools import tool
+from config import settings
+from config.registry import get_llm, get_document_manifest
+from dataclasses import dataclass, asdict
+from datetime import datetime
+import asyncio
 import os
+import re
+import time
+
+## requests that need the agent's add_document_to_knowledge tool rather than a lookup
+_INGEST_REQUEST = re.compile(r"\b(add|upload|ingest|load|index)\b.*\b(document|file|pdf|path)\b", re.IGNORECASE)
+## questions scoped by when documents were added, which only the agent's search tool can filter on
+_TIME_SCOPE = re.compile(
+    r"\b(added|uploaded|ingested)\s+(after|since|before|until|on|in|during|last|this|yesterday|today)\b", re.IGNORECASE)
+## "page 3", "pages 2-5", "pages 2 to 5"
+_PAGE_RANGE = re.compile(r"\bpages?\s+(?P<first>\d+)(?:\s*(?:-|–|to|through)\s*(?P<last>\d+))?\b", re.IGNORECASE)
+
+
+@dataclass
+class IngestResult:
+    """Outcome of adding one document to the knowledge base."""
+    source: str
+    chunks: int = 0
+    skipped_chunks: int = 0
+    failed_chunks: int = 0
+    deleted_chunks: int = 0
+    changed_pages: int = 0
+    unchanged: bool = False
+    bytes: int = 0
+    embed_seconds: float = 0.0
+    store_seconds: float = 0.0
+    total_seconds: float = 0.0
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def to_dict(self):
+        return asdict(self)
+
 
 class RagAgent:
-    def __init__(self):
-        self.llm = ChatOllama(model='llama3.2:3b', temperature=0.1, max_tokens=1000)
-        self.vector_store = VectorStore()
+    def __init__(self, model_name=settings.DEFAULT_MODEL):
+        self.llm = get_llm(model_name)
+        self.vector_store = create_vector_store()
+        self.manifest = get_document_manifest()
         
         ## create the RAG specific tools
         self.tools = self._create_rag_tools()
@@ -21,6 +62,9 @@ class RagAgent:
         self.agent = self._create_agent()
         self.agent_executor = AgentExecutor(agent=self.agent, tools=self.tools, verbose=True)
 
+        ## single-call answer chain used by direct mode
+        self.answer_chain = self._create_answer_chain()
+
     def _create_rag_tools(self):
         """Create tools specific to RAG functionality"""
         
@@ -35,54 +79,41 @@ class RagAgent:
             Returns:
                 Status of the operation
             """
-            try:
-                # Load document
-                if not os.path.exists(file_path):
-                    return f"Error: File {file_path} not found"
-                                
-                if file_path.endswith('.pdf'):
-                    loader = PyPDFLoader(file_path)
-                else:
-                    loader = TextLoader(file_path)
-                
-                docs = loader.load()
-                
-                # Split into chunks
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=200
-                )
-                
-                chunks = []
-                metadata = []
-                for doc in docs:
-                    doc_chunks = splitter.split_text(doc.page_content)
-                    chunks.extend(doc_chunks)
-                    # Add metadata for each chunk
-                    for _ in doc_chunks:
-                        metadata.append({"source": file_path})
-                
-                # Add to vector store
-                result = self.vector_store.add_documents(chunks, metadata)
-                return f"Successfully processed {file_path}: {result}"
-                
-            except Exception as e:
-                return f"Error processing document: {str(e)}"
+            result = self.ingest(file_path)
+            if not result.ok:
+                return f"Error processing document: {result.error}"
+            return f"Successfully processed {file_path}: {result.chunks} chunks added"
         
         @tool
-        def search_knowledge_base(query: str, num_results: int = 3) -> str:
+        def search_knowledge_base(query: str, num_results: int = 3, document: str = None,
+                                  first_page: int = None, last_page: int = None,
+                                  added_after: str = None) -> str:
             """
             Search the knowledge base for relevant information.
             
             Args:
                 query: The search query
                 num_results: Number of results to return
+                document: Only search this document (file name), e.g. when asked what report X says
+                first_page: Only search from this page on (1-based)
+                last_page: Only search up to this page (1-based)
+                added_after: Only search documents added after this ISO date, e.g. 2024-05-01
                 
             Returns:
                 Relevant information from the knowledge base
             """
             try:
-                results = self.vector_store.search(query, k=num_results)
+                source = None
+                if document:
+                    source = self.resolve_source(document)
+                    if source is None:
+                        return f"No document named {document} in the knowledge base. Known documents: {', '.join(self.manifest.sources())}"
+                pages = None
+                if first_page is not None or last_page is not None:
+                    pages = (first_page - 1 if first_page else None, last_page - 1 if last_page else None)
+                since = datetime.fromisoformat(added_after) if added_after else None
+
+                results = self.vector_store.search(query, k=num_results, source=source, pages=pages, since=since)
                 
                 if not results or isinstance(results, str):
                     return "No relevant information found in knowledge base."
@@ -90,7 +121,10 @@ class RagAgent:
                 # Format results
                 formatted_results = "\n\n--- Relevant Information ---\n"
                 for i, result in enumerate(results):
-                    formatted_results += f"Result {i+1}:\n{result}\n\n"
+                    origin = result.metadata.get("source", "unknown source")
+                    if "page" in result.metadata:
+                        origin += f", page {result.metadata['page'] + 1}"
+                    formatted_results += f"Result {i+1} ({origin}):\n{result.page_content}\n\n"
                 
                 return formatted_results
                 
@@ -126,15 +160,263 @@ class RagAgent:
             tools=self.tools
         )
     
-    def run(self, input_text):
+    def _create_answer_chain(self):
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are a helpful RAG assistant that answers questions about the user's documents.
+Answer using only the context below. Mention the document and page you relied on.
+If the context does not contain the answer, say so clearly.
+
+Context:
+{context}"""),
+            ("human", "{input}"),
+        ])
+        return prompt | self.llm | StrOutputParser()
+
+    def answer(self, query, k=None, **filters):
+        """
+        Answer a question with one retrieval and one LLM call.
+        
+        Args:
+            query: The question.
+            k: Number of chunks to put in the context.
+            filters: Search filters passed to VectorStore.search (source, pages, since, until).
+                Defaults to the document and pages named in the query, see scope_filters.
+            
+        Returns:
+            Dict with input, output and the source_documents used.
+        """
+        filters = filters or self.scope_filters(query)
+        docs = self.vector_store.search(query, k=k or settings.RAG_CONTEXT_CHUNKS, **filters)
+        if not docs:
+            ## nothing to ground an answer on, so skip the LLM entirely
+            return {"input": query, "output": "I couldn't find anything relevant in the knowledge base.", "source_documents": []}
+
+        output = self.answer_chain.invoke({"input": query, "context": self._format_context(docs)})
+        return {"input": query, "output": output, "source_documents": docs}
+
+    @staticmethod
+    def _format_context(docs):
+        return "\n\n".join(
+            f"[{doc.metadata.get('source', 'unknown source')}"
+            f"{', page ' + str(doc.metadata['page'] + 1) if 'page' in doc.metadata else ''}]\n{doc.page_content}"
+            for doc in docs
+        )
+
+    async def aanswer(self, query, k=None, **filters):
+        """Async version of answer; the blocking vector search runs in a worker thread."""
+        filters = filters or self.scope_filters(query)
+        docs = await asyncio.to_thread(self.vector_store.search, query, k or settings.RAG_CONTEXT_CHUNKS, **filters)
+        if not docs:
+            return {"input": query, "output": "I couldn't find anything relevant in the knowledge base.", "source_documents": []}
+
+        output = await self.answer_chain.ainvoke({"input": query, "context": self._format_context(docs)})
+        return {"input": query, "output": output, "source_documents": docs}
+
+    def resolve_source(self, name):
+        """
+        Find the source of an ingested document from a user supplied name.
+        
+        Matches the stored source exactly, then by file name, then by a
+        case-insensitive substring of the file name.
+        
+        Returns:
+            The stored source, or None if no document matches.
+        """
+        sources = self.manifest.sources()
+        if name in sources:
+            return name
+        lowered = name.lower()
+        for source in sources:
+            if os.path.basename(source).lower() == lowered:
+                return source
+        for source in sources:
+            if lowered in os.path.basename(source).lower():
+                return source
+        return None
+
+    def mentioned_source(self, query):
+        """
+        Find an ingested document named in a question, e.g. "what does report X say about Y".
+        
+        A document is named by its file name or by its file name without
+        extension, where "_", "-" and "." may be written as spaces.
+        
+        Returns:
+            The stored source with the longest name found in the query, or None.
+        """
+        def words(text):
+            return " ".join(re.sub(r"[_\-.]+", " ", text.lower()).split())
+
+        query_words = f" {words(query)} "
+        best, best_length = None, 0
+        for source in self.manifest.sources():
+            name = os.path.basename(source)
+            stem = words(os.path.splitext(name)[0])
+            ## very short names like "a.pdf" would match ordinary words
+            if len(stem) < 3:
+                continue
+            for candidate in (words(name), stem):
+                if f" {candidate} " in query_words and len(candidate) > best_length:
+                    best, best_length = source, len(candidate)
+        return best
+
+    def scope_filters(self, query):
+        """
+        Search filters for the document and pages a question names.
+        
+        Returns:
+            Dict of VectorStore.search filters, empty when the question names neither.
+        """
+        filters = {}
+        source = self.mentioned_source(query)
+        if source is not None:
+            filters["source"] = source
+        match = _PAGE_RANGE.search(query)
+        if match:
+            first = int(match.group("first"))
+            last = int(match.group("last") or first)
+            filters["pages"] = (max(first, 1) - 1, max(last, 1) - 1)
+        return filters
+
+    def ingest(self, source, filename=None, chunk_size=1000, chunk_overlap=200, progress=None):
+        """
+        Add a document to the knowledge base without going through the LLM.
+        
+        Documents are identified by their name. Re-ingesting a known
+        document only embeds the pages whose text changed and deletes the
+        chunks that no document references anymore; an identical file is
+        skipped entirely.
+        
+        Args:
+            source: Path to the document file, or its raw contents as bytes.
+            filename: Name of the document when source is bytes.
+            chunk_size: Size of each chunk.
+            chunk_overlap: Overlap between chunks.
+            progress: Optional callable(done, total) reporting stored chunks.
+            
+        Returns:
+            IngestResult with chunk count, size and timings.
+        """
+        start = time.perf_counter()
+        name = filename or (source if isinstance(source, str) else "document")
+        result = IngestResult(source=name)
         try:
+            if isinstance(source, (bytes, bytearray)):
+                result.bytes = len(source)
+                file_hash = fingerprint(bytes(source))
+            else:
+                if not os.path.exists(source):
+                    raise FileNotFoundError(f"File {source} not found")
+                result.bytes = os.path.getsize(source)
+                file_hash = file_fingerprint(source)
+
+            previous = self.manifest.get(name)
+            ## pages stored under an older chunk id scheme cannot be reused
+            reusable = previous is not None and previous.get("id_scheme") == ID_SCHEME
+            if reusable and previous["fingerprint"] == file_hash:
+                result.unchanged = True
+                result.skipped_chunks = sum(len(page["chunk_ids"]) for page in previous["pages"].values())
+                result.total_seconds = time.perf_counter() - start
+                return result
+            previous_pages = previous["pages"] if previous else {}
+            reusable_pages = previous_pages if reusable else {}
+
+            # Split only the pages whose text changed, streaming pages
+            # straight into the embedding pipeline as they are parsed
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                add_start_index=True
+            )
+            
+            pages = {}
+            ingested_at = time.time()
+
+            def changed_chunks():
+                for page_number, doc in enumerate(iter_pages(source, filename=filename)):
+                    page_hash = fingerprint(doc.page_content)
+                    old_page = reusable_pages.get(str(page_number))
+                    if old_page and old_page["hash"] == page_hash:
+                        pages[page_number] = old_page
+                        continue
+                    doc_chunks = splitter.create_documents([doc.page_content])
+                    pages[page_number] = {"hash": page_hash, "chunk_ids": [chunk_id(c.page_content, name) for c in doc_chunks]}
+                    result.changed_pages += 1
+                    for chunk in doc_chunks:
+                        # Store where each chunk came from with its vector
+                        chunk.metadata = {
+                            "source": name,
+                            "page": page_number,
+                            "chunk_start": chunk.metadata["start_index"],
+                            "ingested_at": ingested_at,
+                        }
+                        yield chunk
+
+            # Add to vector store
+            stats = self.vector_store.add_documents(changed_chunks(), progress=progress)
+            result.chunks = stats["added"]
+            result.skipped_chunks = stats["skipped"]
+            result.failed_chunks = stats["failed"]
+            result.embed_seconds = stats["embed_seconds"]
+            result.store_seconds = stats["store_seconds"]
+            if stats["failed"] and not (result.chunks or result.skipped_chunks):
+                raise RuntimeError("no chunks could be embedded")
+
+            ## pages with failed chunks keep no hash so the next ingest retries them, and the
+            ## file keeps no fingerprint so that ingest is not skipped as unchanged
+            failed = set(stats["failed_ids"])
+            for page in pages.values():
+                if failed.intersection(page["chunk_ids"]):
+                    page["hash"] = None
+                    file_hash = None
+
+            ## delete chunks of changed or removed pages that no document uses anymore
+            current = {id_ for page in pages.values() for id_ in page["chunk_ids"]}
+            old = {id_ for page in previous_pages.values() for id_ in page["chunk_ids"]}
+            stale = old - current - self.manifest.referenced_ids(exclude=name)
+            if stale:
+                result.deleted_chunks = self.vector_store.delete(stale)
+
+            self.manifest.put(name, file_hash, pages)
+        except Exception as e:
+            result.error = str(e)
+        result.total_seconds = time.perf_counter() - start
+        return result
+
+    def run(self, input_text, mode=None):
+        """
+        Handle a request.
+        
+        Args:
+            input_text: The user request.
+            mode: "direct" retrieves and answers in a single LLM call, "agent"
+                runs the tool-calling agent loop. Defaults to settings.RAG_MODE.
+                Requests to add a document, and questions scoped by when
+                documents were added, always use the agent.
+        """
+        mode = mode or settings.RAG_MODE
+        try:
+            if mode == "direct" and not self._needs_agent(input_text):
+                return self.answer(input_text)
             response = self.agent_executor.invoke({"input": input_text})
             return response
         except Exception as e:
             return f"An error occurred: {e}"
-    
-
-
 
+    @staticmethod
+    def _needs_agent(input_text):
+        return bool(_INGEST_REQUEST.search(input_text) or _TIME_SCOPE.search(input_text))
 
+    async def arun(self, input_text, mode=None):
+        """Async version of run."""
+        mode = mode or settings.RAG_MODE
+        try:
+            if mode == "direct" and not self._needs_agent(input_text):
+                return await self.aanswer(input_text)
+            return await self.agent_executor.ainvoke({"input": input_text})
+        except Exception as e:
+            return f"An error occurred: {e}"
 
+    async def aingest(self, source, **kwargs):
+        """Async version of ingest; loading, embedding and writes run in a worker thread."""
+        return await asyncio.to_thread(self.ingest, source, **kwargs)
@@ -0,0 +1,190 @@
+"""
+Semantic response cache for the supervisor.
+
+Answers are keyed by the normalized user input plus the versions of the
+state they may depend on (knowledge base and long term memory), so a new
+document or memory invalidates them, and are shared between sessions.
+Only answers built with tools that read a session's history or memories
+are kept under that session. Lookups first try an exact match and then,
+if an embedding client is configured, the most similar cached input
+above a threshold.
+"""
+from collections import OrderedDict
+import re
+import threading
+import time
+
+import numpy as np
+
+_HISTORY_REFERENCE = re.compile(
+    ## references to the conversation itself
+    r"\b(my (first|last|previous|earlier) (question|message|answer)|what did (i|we|you) (say|ask|tell|mention)|"
+    r"(you|i|we) (said|told|mentioned|asked|discussed|talked about)|"
+    r"(our|this|the) (conversation|chat)|(chat|conversation) history|"
+    r"do you (remember|recall)|(say|repeat|explain) (that|it) again)\b"
+    ## follow-ups that only make sense with the previous turn
+    r"|^(and|also|what about|how about)\b|^(why|how|what|when|where) (is|are|was|were|does|do|did) (it|that|they|those|he|she)\b"
+    r"|\b(tell me more|elaborate|go on)\b"
+    ## questions about the user, e.g. "what is my name", are answered from their own history
+    r"|\b(who am i|about me|my (name|age|birthday|job|favou?rite \w+)|do i (like|love|prefer|want|have|need))\b",
+    re.IGNORECASE,
+)
+
+## tools that read the session's conversation or long term memories
+MEMORY_TOOLS = {"show_conversation_history", "retrieve_from_memory"}
+## tools with side effects that a cached answer would skip
+UNCACHEABLE_TOOLS = {"save_to_memory"}
+
+
+def normalize(text):
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", text.strip().lower()).rstrip("?!. ")
+
+
+def is_history_dependent(text):
+    """True if the input refers to the conversation, so its answer must not be shared."""
+    return bool(_HISTORY_REFERENCE.search(text))
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+class ResponseCache:
+    def __init__(self, embeddings=None, threshold=0.95, ttl=3600, max_entries=1024):
+        """
+        Args:
+            embeddings: Optional embedding client used for similarity lookups.
+            threshold: Minimum cosine similarity for a semantic hit.
+            ttl: Seconds an answer stays valid.
+            max_entries: Maximum number of cached answers, least recently used are dropped.
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        ## unit vectors of the cached inputs, one row per entry slot, and the slots of each (scope, versions);
+        ## scope is None for shared answers and the session id for answers that read its memory
+        self._vectors = None
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._groups = {}
+        self._lock = threading.Lock()
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stored": 0, "bypassed": 0}
+
+    def lookup(self, text, versions, session=None):
+        """
+        Find a cached answer.
+        
+        Args:
+            text: The user input.
+            versions: Hashable state versions the answer depends on.
+            session: Session asking, whose own memory based answers are also searched.
+            
+        Returns:
+            The cached answer, or None.
+        """
+        if is_history_dependent(text):
+            self._count("bypassed")
+            return None
+        normalized = normalize(text)
+        scopes = [None] if session is None else [None, session]
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            for scope in scopes:
+                key = (normalized, scope, versions)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.counters["exact_hits"] += 1
+                    return entry["output"]
+            ## nothing to compare against, so no need to embed the input
+            candidates = self.embeddings is not None and any(self._groups.get((scope, versions)) for scope in scopes)
+
+        if candidates:
+            vector = _unit(self.embeddings.embed_query(normalized))
+            with self._lock:
+                slots = [slot for scope in scopes for slot in self._groups.get((scope, versions), ())]
+                if slots:
+                    scores = self._vectors[slots] @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        entry = self._entries[self._slot_keys[slots[best]]]
+                        self.counters["semantic_hits"] += 1
+                        return entry["output"]
+
+        self._count("misses")
+        return None
+
+    def store(self, text, versions, output, tools_used=(), session=None):
+        """
+        Cache an answer unless it refers to the conversation.
+        
+        Answers that used a memory tool are only served back to the
+        session that produced them, all others are shared.
+        
+        Args:
+            text: The user input.
+            versions: Hashable state versions the answer depends on.
+            output: The answer to cache.
+            tools_used: Names of the tools called while answering.
+            session: Session the answer was produced in, e.g. a session id.
+        """
+        if is_history_dependent(text) or UNCACHEABLE_TOOLS.intersection(tools_used):
+            return
+        scope = None
+        if MEMORY_TOOLS.intersection(tools_used):
+            if session is None:
+                return
+            scope = session
+        normalized = normalize(text)
+        key = (normalized, scope, versions)
+        vector = _unit(self.embeddings.embed_query(normalized)) if self.embeddings is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            slot = None
+            if vector is not None:
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                slot = self._free_slots.pop()
+                self._vectors[slot] = vector
+                self._slot_keys[slot] = key
+                self._groups.setdefault((scope, versions), set()).add(slot)
+            self._entries[key] = {"output": output, "slot": slot, "created": time.time()}
+            self.counters["stored"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        slot = entry["slot"]
+        if slot is not None:
+            group = self._groups.get(key[1:])
+            if group is not None:
+                group.discard(slot)
+                if not group:
+                    del self._groups[key[1:]]
+            self._slot_keys[slot] = None
+            self._free_slots.append(slot)
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            self._remove(key)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """Hit and miss counters plus the current size and hit rate."""
+        with self._lock:
+            stats = dict(self.counters, size=len(self._entries))
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
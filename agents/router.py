@@ -0,0 +1,182 @@
+"""
+Deterministic fast-path router that runs before the supervisor LLM.
+
+Each rule pairs a cheap matcher with a handler. The first rule whose
+matcher fires and whose handler returns an answer wins; everything else
+falls through to the AgentExecutor. Decisions and the hit rate are logged
+so the latency saved can be measured.
+"""
+from dataclasses import dataclass
+import logging
+import re
+import threading
+import time
+
+from tools.calculator import calculator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Route:
+    """An answer produced by a fast-path rule."""
+    rule: str
+    output: str
+    seconds: float
+
+
+@dataclass
+class Rule:
+    name: str
+    matcher: object
+    handler: object
+
+
+class FastPathRouter:
+    def __init__(self, rules=None):
+        self.rules = list(rules or [])
+        self._lock = threading.Lock()
+        self.counters = {"routed": 0, "fallthrough": 0}
+
+    def add_rule(self, name, matcher, handler, first=False):
+        """
+        Register a rule.
+        
+        Args:
+            name: Rule name used in logs and counters.
+            matcher: callable(text) returning a truthy match, or None.
+            handler: callable(text, match) returning the answer, or None to fall through.
+            first: Put the rule ahead of the existing ones.
+        """
+        rule = Rule(name, matcher, handler)
+        if first:
+            self.rules.insert(0, rule)
+        else:
+            self.rules.append(rule)
+
+    def route(self, text):
+        """
+        Try to answer without the LLM.
+        
+        Returns:
+            A Route, or None when the input should go to the LLM.
+        """
+        start = time.perf_counter()
+        for rule in self.rules:
+            match = rule.matcher(text)
+            if not match:
+                continue
+            try:
+                output = rule.handler(text, match)
+            except Exception as e:
+                logger.warning("fast path rule %s failed: %s", rule.name, e)
+                output = None
+            if output is not None:
+                route = Route(rule.name, output, time.perf_counter() - start)
+                self._record(rule.name)
+                logger.info("fast path: %s answered in %.1f ms (hit rate %.0f%%)",
+                            rule.name, route.seconds * 1000, self.hit_rate() * 100)
+                return route
+        self._record(None)
+        logger.info("fast path: no rule matched, falling through to the LLM (hit rate %.0f%%)",
+                    self.hit_rate() * 100)
+        return None
+
+    def _record(self, rule_name):
+        with self._lock:
+            if rule_name is None:
+                self.counters["fallthrough"] += 1
+            else:
+                self.counters["routed"] += 1
+                self.counters[rule_name] = self.counters.get(rule_name, 0) + 1
+
+    def hit_rate(self):
+        total = self.counters["routed"] + self.counters["fallthrough"]
+        return self.counters["routed"] / total if total else 0.0
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, hit_rate=self.hit_rate())
+
+
+_ARITHMETIC = re.compile(
+    r"^\s*(?P<prefix>what\s+is|what's|calculate|compute|evaluate|solve)?\s*"
+    r"(?P<expression>[\d\s.()+\-*/]*\d[\d\s.()]*[+\-*/][\d\s.()+\-*/]*\d[\d\s.()]*)\s*[?=.!]*\s*$",
+    re.IGNORECASE,
+)
+## dates and phone numbers look like subtractions and divisions: 2024-05-01, 05/01/2024, 555-1234
+_NOT_ARITHMETIC = re.compile(
+    r"\b\d{4}-\d{1,2}-\d{1,2}\b|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{3}-\d{3,4}\b|\b\d{3}-\d{3}-\d{4}\b")
+_SPACED_OPERATOR = re.compile(r"\s[+\-*/]\s")
+
+
+def match_arithmetic(text):
+    """
+    Match an input that is only an arithmetic expression.
+
+    The input needs an explicit prefix ("what is", "calculate", ...) or an
+    operator surrounded by spaces, so "12 * 7" and "calculate 12*7" match but
+    "555-1234" does not, and dates and phone numbers never match.
+
+    Returns:
+        The match, with the expression in its "expression" group, or None.
+    """
+    match = _ARITHMETIC.match(text)
+    if match is None or _NOT_ARITHMETIC.search(match.group("expression")):
+        return None
+    if not match.group("prefix") and not _SPACED_OPERATOR.search(match.group("expression")):
+        return None
+    return match
+_HISTORY = re.compile(
+    r"\b(?:what\s+(?:was|were)\s+my\s+(?P<which>first|last|previous)\s+(?:question|message)s?"
+    r"|what\s+did\s+(?:i|we)\s+(?:ask|say|talk\s+about|discuss)"
+    r"|(?:show|list)\s+(?:me\s+)?(?:my|the|our)\s+(?:conversation|chat)(?:\s+history)?)\b",
+    re.IGNORECASE,
+)
+## only explicit instructions: "remember what my favourite colour is?" is a question for the LLM
+_REMEMBER = re.compile(
+    r"^(?!.*\?\s*$)\s*(?:please\s+)?(?:remember|keep\s+in\s+mind)(?:\s+that\s+|\s*:\s*)"
+    r"(?P<fact>.+?)\s*[.!]?\s*$",
+    re.IGNORECASE,
+)
+
+
+def default_router(memory_manager):
+    """
+    Build the router with the built-in rules.
+    
+    - arithmetic expressions go straight to the calculator tool
+    - questions about earlier turns are answered from short term memory
+    - "remember that ..." or "remember: ..." is saved to long term memory
+    """
+    router = FastPathRouter()
+
+    def calculate(text, match):
+        result = calculator.invoke({"expression": match.group("expression").strip()})
+        if result.startswith(("Error", "Invalid")):
+            return None
+        return f"{match.group('expression').strip()} = {result}"
+
+    def history(text, match):
+        messages = memory_manager.get_conversation_history().get("chat_history", [])
+        questions = [content for role, content in messages if role == "human"]
+        if not questions:
+            return "We haven't talked about anything yet in this conversation."
+        which = (match.group("which") or "").lower()
+        if which == "first":
+            ## older turns may already be folded into the summary
+            first = memory_manager.short_term_memory.first_question or questions[0]
+            return f'Your first question was: "{first}"'
+        if which in ("last", "previous"):
+            return f'Your previous question was: "{questions[-1]}"'
+        return "So far you asked:\n" + "\n".join(f"{i + 1}. {q}" for i, q in enumerate(questions))
+
+    def remember(text, match):
+        fact = match.group("fact")
+        memory_manager.add_to_long_term_memory(fact)
+        return f"Got it, I'll remember that {fact}."
+
+    router.add_rule("calculator", match_arithmetic, calculate)
+    router.add_rule("conversation_history", _HISTORY.search, history)
+    router.add_rule("remember", _REMEMBER.match, remember)
+    return router
@@ -0,0 +1,121 @@
+"""
+Multi-tenant agent service shared by every session of a server process.
+
+One BaseAgent and one RagAgent (and through the registry one set of model,
+embedding and Chroma clients) serve all tenants. Each session gets its own
+UISupervisor with its own MemoryManager, so conversations and long term
+memories stay isolated. Every request goes through the admission
+controller of its model.
+"""
+from collections import OrderedDict
+import asyncio
+import time
+
+from agents.admission import AdmissionController
+from agents.base_agent import BaseAgent
+from agents.rag_agent import RagAgent
+from agents.ui_supervisor import UISupervisor
+from config import settings
+from memory.memory_manager import MemoryManager
+
+
+class AgentService:
+    def __init__(self, model_name=settings.DEFAULT_MODEL, max_concurrency=None, max_queue=None,
+                 queue_timeout=None, max_sessions=None, session_idle_seconds=None):
+        self.model_name = model_name
+        self.base_agent = BaseAgent(model_name=model_name)
+        self.rag_agent = RagAgent(model_name=model_name)
+
+        self.max_sessions = max_sessions or settings.MAX_SESSIONS
+        self.session_idle_seconds = session_idle_seconds or settings.SESSION_IDLE_SECONDS
+        self._sessions = OrderedDict()
+        self._session_lock = asyncio.Lock()
+
+        self._limits = {
+            "max_concurrency": max_concurrency or settings.MAX_CONCURRENT_PER_MODEL,
+            "max_queue": max_queue or settings.MAX_QUEUE_DEPTH,
+            "queue_timeout": queue_timeout or settings.QUEUE_TIMEOUT,
+        }
+        self._admission = {}
+
+    def admission(self, model_name=None):
+        """Admission controller of a model, created on first use."""
+        model_name = model_name or self.model_name
+        if model_name not in self._admission:
+            self._admission[model_name] = AdmissionController(**self._limits)
+        return self._admission[model_name]
+
+    async def session(self, session_id):
+        """Get or create the supervisor of a session, evicting idle and least recent sessions."""
+        async with self._session_lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                ## long term memories are stored under and recalled for the tenant's own session id
+                memory_manager = await asyncio.to_thread(
+                    MemoryManager, model_name=self.model_name, session_id=session_id)
+                supervisor = UISupervisor(
+                    model_name=self.model_name,
+                    memory_manager=memory_manager,
+                    base_agent=self.base_agent,
+                    rag_agent=self.rag_agent,
+                )
+                entry = {"supervisor": supervisor, "last_used": time.time()}
+                self._sessions[session_id] = entry
+            entry["last_used"] = time.time()
+            self._sessions.move_to_end(session_id)
+            self._evict()
+            return entry["supervisor"]
+
+    def _evict(self):
+        now = time.time()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - oldest["last_used"] > self.session_idle_seconds:
+                del self._sessions[oldest_id]
+            else:
+                break
+
+    async def chat(self, session_id, message):
+        """
+        Run one turn of a session.
+        
+        Returns:
+            Dict with the output, the seconds spent queued and running, and
+            the turn's latency breakdown (see config.tracing).
+            
+        Raises:
+            ServerBusyError: When the model's queue is saturated.
+        """
+        supervisor = await self.session(session_id)
+        start = time.perf_counter()
+        async with self.admission().admit() as waited:
+            output = await supervisor.arun(message)
+        return {"session_id": session_id, "output": output, "wait_seconds": waited,
+                "total_seconds": time.perf_counter() - start, "trace": supervisor.last_trace}
+
+    async def ingest(self, data, filename):
+        """Add a document shared by every tenant, see RagAgent.ingest."""
+        result = await self.rag_agent.aingest(data, filename=filename)
+        return result.to_dict()
+
+    async def session_info(self, session_id):
+        """Metadata of a live session, or None if the server has no such session."""
+        async with self._session_lock:
+            entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        return await asyncio.to_thread(entry["supervisor"].get_session_info)
+
+    async def clear_session(self, session_id):
+        async with self._session_lock:
+            entry = self._sessions.get(session_id)
+        if entry is not None:
+            await asyncio.to_thread(entry["supervisor"].clear_conversation)
+        return entry is not None
+
+    def metrics(self):
+        """Per-model queue metrics and the number of live sessions."""
+        return {
+            "sessions": len(self._sessions),
+            "models": {model: controller.metrics() for model, controller in self._admission.items()},
+        }
@@ -0,0 +1,102 @@
+"""
+Synchronous event streaming for agent executors.
+
+stream_events drives a runnable's astream_events on a background thread
+and yields simplified events as they happen, so callers such as Streamlit
+can render tokens incrementally without being async themselves. Events of
+sub-agents invoked from tools are included, because child runs inherit
+the streaming callbacks of the tool that calls them.
+
+Event dicts:
+    {"type": "token", "text": str, "nested": bool}
+        nested is True for tokens generated inside a tool (sub-agents),
+        False for the top-level model, which produces the final answer.
+    {"type": "tool_start", "name": str, "input": object, "depth": int}
+    {"type": "tool_end", "name": str, "output": str, "depth": int}
+    {"type": "final", "output": str}
+"""
+import asyncio
+import contextvars
+import queue
+import threading
+
+_DONE = object()
+
+
+def _content_text(content):
+    if isinstance(content, str):
+        return content
+    ## some models stream a list of content blocks
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+async def _aiter_simplified(runnable, inputs, config=None):
+    tool_runs = set()
+    root_id = None
+    tokens = []
+    output = None
+    async for event in runnable.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        if root_id is None:
+            root_id = event["run_id"]
+        parents = event.get("parent_ids", [])
+        depth = sum(1 for parent in parents if parent in tool_runs)
+
+        if kind == "on_chat_model_stream":
+            text = _content_text(event["data"]["chunk"].content)
+            if text:
+                if not depth:
+                    tokens.append(text)
+                yield {"type": "token", "text": text, "nested": bool(depth)}
+        elif kind == "on_tool_start":
+            tool_runs.add(event["run_id"])
+            yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input"), "depth": depth}
+        elif kind == "on_tool_end":
+            tool_runs.discard(event["run_id"])
+            yield {"type": "tool_end", "name": event["name"], "output": str(event["data"].get("output", "")), "depth": depth}
+        elif kind == "on_chain_end" and event["run_id"] == root_id:
+            result = event["data"].get("output")
+            output = result.get("output") if isinstance(result, dict) else result
+
+    if output is None:
+        output = "".join(tokens)
+    yield {"type": "final", "output": output if isinstance(output, str) else str(output)}
+
+
+def stream_events(runnable, inputs, config=None):
+    """
+    Yield simplified streaming events of a runnable from synchronous code.
+    
+    Args:
+        runnable: An AgentExecutor or any runnable supporting astream_events.
+        inputs: Inputs for the runnable.
+        config: Optional runnable config.
+        
+    Yields:
+        Event dicts, ending with a "final" event. Errors raised by the
+        runnable are re-raised in the caller.
+    """
+    ## unbounded so the producer never blocks if the caller stops iterating early
+    events = queue.Queue()
+
+    def produce():
+        async def consume():
+            async for event in _aiter_simplified(runnable, inputs, config):
+                events.put(event)
+
+        try:
+            asyncio.run(consume())
+        except BaseException as e:
+            events.put(e)
+        finally:
+            events.put(_DONE)
+
+    ## run in a copy of the caller's context so the turn's trace (config.tracing) sees the events
+    threading.Thread(target=contextvars.copy_context().run, args=(produce,), name="agent-stream", daemon=True).start()
+    while True:
+        event = events.get()
+        if event is _DONE:
+            return
+        if isinstance(event, BaseException):
+            raise event
+        yield event
@@ -0,0 +1,55 @@
+"""
+Async sub-agent tools shared by the supervisors.
+
+Every supervisor exposes the calculator and RAG agents as the
+call_calculator_agent and call_rag_agent tools. attach_async_subagents
+gives those tools coroutine versions, so arun awaits the sub-agents
+without blocking the event loop; sync-only tools are offloaded to worker
+threads by the executor.
+"""
+
+
+def agent_output(response):
+    """
+    The answer text of a sub-agent response.
+
+    Args:
+        response: An executor result dict, or the error string agents return on failure.
+
+    Returns:
+        The output string.
+    """
+    if isinstance(response, dict):
+        return response.get("output", str(response))
+    return str(response)
+
+
+def attach_async_subagents(tools, base_agent, rag_agent):
+    """
+    Give the supervisor's sub-agent tools coroutine versions.
+
+    Args:
+        tools: The supervisor's tools, call_calculator_agent and call_rag_agent among them.
+        base_agent: Agent answering calculator questions.
+        rag_agent: Agent answering document questions.
+
+    Returns:
+        The same tools.
+    """
+    async def acall_calculator_agent(query):
+        try:
+            return agent_output(await base_agent.arun(query))
+        except Exception as e:
+            return f"Error calling calculator agent: {e}"
+
+    async def acall_rag_agent(query):
+        try:
+            return agent_output(await rag_agent.arun(query))
+        except Exception as e:
+            return f"Error calling RAG agent: {e}"
+
+    coroutines = {"call_calculator_agent": acall_calculator_agent, "call_rag_agent": acall_rag_agent}
+    for sub_tool in tools:
+        if sub_tool.name in coroutines:
+            sub_tool.coroutine = coroutines[sub_tool.name]
+    return tools
@@ -1,24 +1,28 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from tools.calculator import calculator
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from memory.vector_store import VectorStore
+from memory.vector_store import create_vector_store
 from tools.document import document_loader, split_document_content
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_core.tools import tool
 from agents.rag_agent import RagAgent
 from agents.base_agent import BaseAgent
+from agents.streaming import stream_events
+from agents.subagents import agent_output, attach_async_subagents
+from config import settings
+from config.registry import get_llm
+import asyncio
 import os
 
 class SupervisorAgent:
-    def __init__(self):
-        self.llm = ChatOllama(model='llama3.2:3b', temperature=0.1, max_tokens=1000)
-        self.vector_store = VectorStore()
+    def __init__(self, model_name=settings.DEFAULT_MODEL):
+        self.llm = get_llm(model_name)
+        self.vector_store = create_vector_store()
         
         ## initialize the agents
-        self.rag_agent = RagAgent()
-        self.base_agent = BaseAgent()
+        self.rag_agent = RagAgent(model_name=model_name)
+        self.base_agent = BaseAgent(model_name=model_name)
 
         ## create the supervisor tools
         self.tools = self._create_supervisor_tools()
@@ -34,20 +38,20 @@ class SupervisorAgent:
         def call_calculator_agent(query):
             """ Call the calculator agent with a query."""
             try:
-                response = self.base_agent.run(query)
-                return response.get('output', str(response))
+                return agent_output(self.base_agent.run(query))
             except Exception as e:
                 return f"Error calling calculator agent: {e}"
         @tool    
         def call_rag_agent(query):
             """ Call the RAG agent with a query."""
             try:
-                response = self.rag_agent.run(query)
-                return response.get('output', str(response))
+                return agent_output(self.rag_agent.run(query))
             except Exception as e:
                 return f"Error calling RAG agent: {e}"
-            
-        return [call_calculator_agent, call_rag_agent]
+
+        tools = [call_calculator_agent, call_rag_agent]
+        ## async versions let arun await the sub-agents
+        return attach_async_subagents(tools, self.base_agent, self.rag_agent)
     
     def _create_agent(self):
         system_prompt = SystemMessagePromptTemplate.from_template("""You are a supervisor agent that can delegate tasks to other agents.
@@ -86,3 +90,17 @@ class SupervisorAgent:
             return response
         except Exception as e:
             return f"An error occurred: {e}"
+
+    async def arun(self, input_text):
+        try:
+            response = await self.agent_executor.ainvoke({"input": input_text})
+            return response
+        except Exception as e:
+            return f"An error occurred: {e}"
+
+    def run_stream(self, input_text):
+        """Run a turn and stream its events, see agents.streaming."""
+        try:
+            yield from stream_events(self.agent_executor, {"input": input_text})
+        except Exception as e:
+            yield {"type": "final", "output": f"An error occurred: {e}"}
@@ -1,27 +1,51 @@
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate, ChatPromptTemplate,MessagesPlaceholder
 from langchain.agents import AgentExecutor, create_tool_calling_agent
 from langchain_core.tools import tool
 from agents.base_agent import BaseAgent
 from agents.rag_agent import RagAgent
+from agents.router import default_router
+from agents.streaming import stream_events
+from agents.subagents import agent_output, attach_async_subagents
 from memory.memory_manager import MemoryManager
+from config import settings
+from config.registry import get_llm, get_response_cache
+from config import tracing
+from memory.cache import collection_version
+import asyncio
 import os
 
 class UISupervisor:
-    def __init__(self,model_name="llama3.2:3b" ):
-        self.llm = ChatOllama(model=model_name, temperature=0.1, max_tokens=1000)
+    def __init__(self,model_name=settings.DEFAULT_MODEL, response_cache=None, router=None,
+                 memory_manager=None, base_agent=None, rag_agent=None ):
+        self.model_name = model_name
+        self.llm = get_llm(model_name)
+
+        ## opt-in response cache, shared across sessions unless one is passed in;
+        ## only answers that read a session's memory are kept under that session
+        if response_cache is None and settings.RESPONSE_CACHE_ENABLED:
+            response_cache = get_response_cache()
+        self.response_cache = response_cache
         
-        ## initialize the memory manager and agents
-        self.memory_manager = MemoryManager(model_name=model_name)
-        self.base_agent = BaseAgent(model_name=model_name)
-        self.rag_agent = RagAgent()
+        ## initialize the memory manager and agents; a server passes in shared
+        ## sub-agents and gives each session its own memory manager
+        self.memory_manager = memory_manager or MemoryManager(model_name=model_name)
+        self.base_agent = base_agent or BaseAgent(model_name=model_name)
+        self.rag_agent = rag_agent or RagAgent(model_name=model_name)
+
+        ## cheap rules that answer obvious inputs without calling the LLM
+        if router is None and settings.FAST_PATH_ENABLED:
+            router = default_router(self.memory_manager)
+        self.router = router
 
         ## create supervisor tools
         self.tools = self._create_supervisor_tools()
 
         ## create the supervisor agent
         self.agent = self._create_agent()
-        self.agent_executor = AgentExecutor(agent=self.agent, tools=self.tools, verbose=False)
+        self.agent_executor = AgentExecutor(agent=self.agent, tools=self.tools, verbose=False, return_intermediate_steps=True)
+
+        ## latency breakdown of the last turn, see config.tracing
+        self.last_trace = None
         
     def _create_supervisor_tools(self):
         """Create tools specific to the supervisor agent"""
@@ -29,8 +53,7 @@ class UISupervisor:
         def call_calculator_agent(query):
             """ Call the calculator agent with a query."""
             try:
-                response = self.base_agent.run(query)
-                return response.get('output', str(response))
+                return agent_output(self.base_agent.run(query))
             except Exception as e:
                 return f"Error calling calculator agent: {e}"
             
@@ -38,8 +61,7 @@ class UISupervisor:
         def call_rag_agent(query):
             """ Call the RAG agent with a query for document related questions."""
             try:
-                response = self.rag_agent.run(query)
-                return response.get('output', str(response))
+                return agent_output(self.rag_agent.run(query))
             except Exception as e:
                 return f"Error calling RAG agent: {e}"
             
@@ -57,7 +79,7 @@ class UISupervisor:
             """ Retrieve a response from long term memory."""
             try:
                 response = self.memory_manager.get_relevant_history(query)
-                if not response or not response.get("relavant_history"):
+                if not response or not response.get("relevant_history"):
                     return "No relevant memory found."
                 return f"From my memory: {response.get('relevant_history', 'No information found')}"
             except Exception as e:
@@ -73,8 +95,10 @@ class UISupervisor:
                 return f"Conversation history: {history}"
             except Exception as e:
                 return f"Error retrieving conversation history: {e}"
-            
-        return [call_calculator_agent, call_rag_agent, save_to_memory, retrieve_from_memory, show_conversation_history]
+
+        tools = [call_calculator_agent, call_rag_agent, save_to_memory, retrieve_from_memory, show_conversation_history]
+        ## async versions let arun await the sub-agents
+        return attach_async_subagents(tools, self.base_agent, self.rag_agent)
     
 
     def _create_agent(self):
@@ -132,8 +156,38 @@ Instructions:
             prompt=prompt,
             tools=self.tools
         )
+    def _state_versions(self):
+        """Versions of the state a cached answer depends on."""
+        return (
+            self.model_name,
+            collection_version(self.rag_agent.vector_store.persist_directory, "documents"),
+            collection_version(self.memory_manager.persist_directory, "long_term_memory"),
+        )
+
     def run(self, input_text):
+        with tracing.turn("ui_supervisor", input_chars=len(input_text)) as trace:
+            output = self._run(input_text)
+        self.last_trace = trace.summary() if trace is not None else None
+        return output
+
+    def _run(self, input_text):
         try:
+            ## answer arithmetic, history and "remember that" inputs without the LLM
+            if self.router is not None:
+                route = self.router.route(input_text)
+                if route is not None:
+                    self.memory_manager.add_to_conversation(input_text, route.output)
+                    return route.output
+
+            ## serve repeated questions from the response cache
+            if self.response_cache is not None:
+                versions = self._state_versions()
+                session = self.memory_manager.current_session
+                cached = self.response_cache.lookup(input_text, versions, session=session)
+                if cached is not None:
+                    self.memory_manager.add_to_conversation(input_text, cached)
+                    return cached
+
             ## get conversation history
             chat_history = self.memory_manager.get_conversation_history()
             ## run with memory context
@@ -142,10 +196,126 @@ Instructions:
             output = response.get('output', str(response))
             self.memory_manager.add_to_conversation(input_text, output)
 
+            if self.response_cache is not None:
+                tools_used = [action.tool for action, _ in response.get("intermediate_steps", [])]
+                self.response_cache.store(input_text, versions, output, tools_used, session=session)
+
             return output
         except Exception as e:
             print(f"Error running UiSupervisor: {e}")
             return str(e)
         
+    async def arun(self, input_text):
+        """
+        Async version of run.
+        
+        Memory, cache and routing work touches SQLite, chroma and the
+        session file, so it runs in worker threads. Tool calls emitted in
+        the same agent step are executed concurrently by the executor.
+        """
+        with tracing.turn("ui_supervisor", input_chars=len(input_text)) as trace:
+            output = await self._arun(input_text)
+        self.last_trace = trace.summary() if trace is not None else None
+        return output
+
+    async def _arun(self, input_text):
+        try:
+            if self.router is not None:
+                route = await asyncio.to_thread(self.router.route, input_text)
+                if route is not None:
+                    await asyncio.to_thread(self.memory_manager.add_to_conversation, input_text, route.output)
+                    return route.output
+
+            if self.response_cache is not None:
+                versions = self._state_versions()
+                session = self.memory_manager.current_session
+                cached = await asyncio.to_thread(self.response_cache.lookup, input_text, versions, session=session)
+                if cached is not None:
+                    await asyncio.to_thread(self.memory_manager.add_to_conversation, input_text, cached)
+                    return cached
+
+            chat_history = await asyncio.to_thread(self.memory_manager.get_conversation_history)
+            response = await self.agent_executor.ainvoke({"input": input_text, "chat_history": chat_history.get("chat_history", [])})
+            output = response.get('output', str(response))
+            await asyncio.to_thread(self.memory_manager.add_to_conversation, input_text, output)
+
+            if self.response_cache is not None:
+                tools_used = [action.tool for action, _ in response.get("intermediate_steps", [])]
+                await asyncio.to_thread(self.response_cache.store, input_text, versions, output, tools_used, session=session)
+
+            return output
+        except Exception as e:
+            print(f"Error running UiSupervisor: {e}")
+            return str(e)
+
+    def run_stream(self, input_text):
+        """
+        Run a turn and stream its progress.
+        
+        Yields the events documented in agents.streaming: tokens of the
+        final answer, tokens of sub-agents (nested=True), tool start and
+        end events, and a closing "final" event with the full answer.
+        The turn is saved to memory once the final answer is known.
+        """
+        with tracing.turn("ui_supervisor", input_chars=len(input_text), streaming=True) as trace:
+            yield from self._run_stream(input_text)
+        self.last_trace = trace.summary() if trace is not None else None
+
+    def _run_stream(self, input_text):
+        try:
+            if self.router is not None:
+                route = self.router.route(input_text)
+                if route is not None:
+                    self.memory_manager.add_to_conversation(input_text, route.output)
+                    yield {"type": "token", "text": route.output, "nested": False}
+                    yield {"type": "final", "output": route.output}
+                    return
+
+            if self.response_cache is not None:
+                versions = self._state_versions()
+                session = self.memory_manager.current_session
+                cached = self.response_cache.lookup(input_text, versions, session=session)
+                if cached is not None:
+                    self.memory_manager.add_to_conversation(input_text, cached)
+                    yield {"type": "token", "text": cached, "nested": False}
+                    yield {"type": "final", "output": cached}
+                    return
+
+            chat_history = self.memory_manager.get_conversation_history()
+            inputs = {"input": input_text, "chat_history": chat_history.get("chat_history", [])}
+            tools_used = []
+            for event in stream_events(self.agent_executor, inputs):
+                if event["type"] == "tool_start" and not event["depth"]:
+                    tools_used.append(event["name"])
+                if event["type"] == "final":
+                    output = event["output"]
+                    self.memory_manager.add_to_conversation(input_text, output)
+                    if self.response_cache is not None:
+                        self.response_cache.store(input_text, versions, output, tools_used, session=session)
+                yield event
+        except Exception as e:
+            print(f"Error running UiSupervisor: {e}")
+            yield {"type": "final", "output": str(e)}
+
+    def ingest(self, source, **kwargs):
+        """Add a document to the knowledge base, see RagAgent.ingest."""
+        return self.rag_agent.ingest(source, **kwargs)
+
+    def clear_conversation(self):
+        """Start a new conversation in this session."""
+        self.memory_manager.clear_conversation_history()
+
     def get_session_info(self):
         return self.memory_manager.get_session_metadata()
+
+    def get_router_stats(self):
+        """Fast-path routing counters and hit rate, or None when routing is disabled."""
+        if self.router is None:
+            return None
+        return self.router.stats()
+
+    def get_response_cache_stats(self):
+        """Hit and miss counters of the response cache, or None when it is disabled."""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.stats()
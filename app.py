@@ -1,7 +1,10 @@
 # app.py
 import streamlit as st
+import logging
 import os
 from agents.ui_supervisor import UISupervisor
+from agents.client import RemoteSupervisor
+from config import settings
 import time
 
 # Page configuration
@@ -11,10 +14,51 @@ st.set_page_config(
     layout="wide"
 )
 
+## log fast-path routing decisions without turning on every library's INFO logs
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logging.getLogger("agents").setLevel(os.getenv("AGENT_LOG_LEVEL", "INFO"))
+
+
+def trace_caption(trace):
+    """One-line latency and token summary of a turn, see config.tracing."""
+    return (
+        f"⏱️ {trace['duration_ms'] / 1000:.1f}s · {trace['llm_calls']} LLM calls · "
+        f"{trace['input_tokens']} in / {trace['output_tokens']} out tokens"
+    )
+
+
+def show_latency_breakdown(trace):
+    """Where the time of a turn went, by span kind, and its slowest spans."""
+    st.header("⏱️ Last Turn")
+    if not trace:
+        st.caption("Latency breakdown appears after the first answer.")
+        return
+    col1, col2 = st.columns(2)
+    col1.metric("Latency", f"{trace['duration_ms'] / 1000:.2f}s")
+    col2.metric("LLM calls", trace["llm_calls"])
+    col1.metric("Input tokens", trace["input_tokens"])
+    col2.metric("Output tokens", trace["output_tokens"])
+    for kind, ms in trace["breakdown_ms"].items():
+        share = ms / trace["duration_ms"] if trace["duration_ms"] else 0.0
+        st.progress(min(share, 1.0), text=f"{kind}: {ms / 1000:.2f}s ({share:.0%})")
+    with st.expander("Slowest spans"):
+        for span in trace["slowest"]:
+            st.write(f"{span['name']} ({span['kind']}): {span['duration_ms'] / 1000:.2f}s")
+
+def turn_events(supervisor, prompt):
+    """Stream a turn where the supervisor can; a remote server answers each turn in one piece."""
+    if hasattr(supervisor, "run_stream"):
+        return supervisor.run_stream(prompt)
+    return [{"type": "final", "output": supervisor.run(prompt)}]
+
 # Initialize session state
 if 'supervisor' not in st.session_state:
     with st.spinner("Initializing AI Agent System..."):
-        st.session_state.supervisor = UISupervisor()
+        ## share a headless server when one is configured, otherwise run the agents in-process
+        if settings.SERVER_URL:
+            st.session_state.supervisor = RemoteSupervisor(settings.SERVER_URL)
+        else:
+            st.session_state.supervisor = UISupervisor()
 
 if 'messages' not in st.session_state:
     st.session_state.messages = []
@@ -24,11 +68,14 @@ st.title("🤖 Personal AI Agent System")
 
 # Sidebar
 with st.sidebar:
-    # st.header("System Info")
+    st.header("System Info")
     
     # Session info
-    # session_info = st.session_state.supervisor.get_session_info()
-    # st.metric("Messages in Session", session_info.get('messages', 0))
+    session_info = st.session_state.supervisor.get_session_info()
+    st.metric("Messages in Session", session_info.get('messages', 0))
+
+    ## filled at the end of the script, once the current turn has finished
+    latency_panel = st.container()
     
     # Capabilities
     st.header("🛠️ Available Agents")
@@ -46,7 +93,11 @@ with st.sidebar:
         help="Upload documents to add to the AI's knowledge base"
     )
     
-    if uploaded_file:
+    if 'ingested_files' not in st.session_state:
+        st.session_state.ingested_files = set()
+
+    ## the uploader keeps its file across reruns, so only ingest each upload once
+    if uploaded_file and (uploaded_file.name, uploaded_file.size) not in st.session_state.ingested_files:
         # Save uploaded file
         os.makedirs("uploaded_docs", exist_ok=True)
         file_path = os.path.join("uploaded_docs", uploaded_file.name)
@@ -54,27 +105,44 @@ with st.sidebar:
         with open(file_path, "wb") as f:
             f.write(uploaded_file.getbuffer())
         
-        # Add to knowledge base with proper command
+        # Add to knowledge base directly, no LLM turn needed
         with st.spinner(f"Adding {uploaded_file.name} to knowledge base..."):
-            # Use the exact file path that was saved
-            response = st.session_state.supervisor.run(f"Add the document at path {file_path} to your knowledge base")
+            progress_bar = st.progress(0.0, text="Embedding chunks...")
+
+            def show_progress(done, total):
+                if total:
+                    progress_bar.progress(min(done / total, 1.0), text=f"Embedded {done}/{total} chunks")
+                else:
+                    ## pages are streamed, so the total is unknown until the end
+                    progress_bar.progress((done % 100) / 100, text=f"Embedded {done} chunks")
+
+            result = st.session_state.supervisor.ingest(file_path, progress=show_progress)
+            progress_bar.empty()
             
-            if "Successfully processed" in response or "success" in response.lower():
-                st.success(f"✅ Added {uploaded_file.name}")
-                st.info(f"File saved at: {file_path}")
-            else:
-                st.error(f"❌ Failed to add {uploaded_file.name}")
-                st.error(f"Error: {response}")
-                
-        # Clear the uploader to prevent re-processing
-        st.rerun()
+        if result.ok and result.unchanged:
+            st.session_state.ingested_files.add((uploaded_file.name, uploaded_file.size))
+            st.info(f"{uploaded_file.name} is already in the knowledge base and has not changed")
+        elif result.ok:
+            st.session_state.ingested_files.add((uploaded_file.name, uploaded_file.size))
+            st.success(f"✅ Added {uploaded_file.name}")
+            st.info(
+                f"File saved at: {file_path}\n\n"
+                f"{result.changed_pages} changed pages, {result.chunks} new chunks "
+                f"({result.skipped_chunks} already stored, {result.failed_chunks} failed, {result.deleted_chunks} removed), "
+                f"{result.bytes / 1024:.1f} KB in {result.total_seconds:.1f}s "
+                f"(embedding {result.embed_seconds:.1f}s, store {result.store_seconds:.1f}s)"
+            )
+        else:
+            st.error(f"❌ Failed to add {uploaded_file.name}")
+            st.error(f"Error: {result.error}")
     
 
-
 # Display chat messages
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        if message.get("trace"):
+            st.caption(trace_caption(message["trace"]))
 
 # Chat input
 if prompt := st.chat_input("Ask me anything..."):
@@ -83,19 +151,38 @@ if prompt := st.chat_input("Ask me anything..."):
     with st.chat_message("user"):
         st.markdown(prompt)
     
-    # Get AI response
+    # Stream the AI response as it is generated
     with st.chat_message("assistant"):
-        with st.spinner("AI is thinking..."):
-            response = st.session_state.supervisor.run(prompt)
-        st.markdown(response)
+        status = st.status("AI is thinking...", expanded=False)
+        placeholder = st.empty()
+        response = ""
+        for event in turn_events(st.session_state.supervisor, prompt):
+            if event["type"] == "token" and not event["nested"]:
+                response += event["text"]
+                placeholder.markdown(response + "▌")
+            elif event["type"] == "tool_start":
+                status.update(label=f"Running {event['name']}...")
+                status.write(f"{'  ' * event['depth']}▶️ {event['name']}")
+            elif event["type"] == "tool_end":
+                status.write(f"{'  ' * event['depth']}✅ {event['name']} finished")
+            elif event["type"] == "final":
+                response = event["output"]
+        placeholder.markdown(response)
+        status.update(label="Done", state="complete")
+        trace = st.session_state.supervisor.last_trace
+        if trace:
+            st.caption(trace_caption(trace))
     
     # Add assistant message
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    st.session_state.messages.append({"role": "assistant", "content": response, "trace": trace})
+
+with latency_panel:
+    show_latency_breakdown(getattr(st.session_state.supervisor, "last_trace", None))
 
 # Clear chat button
 if st.sidebar.button("🗑️ Clear Chat"):
     st.session_state.messages = []
     st.session_state
-    st.session_state.supervisor.memory_manager.clear_conversation_history()
+    st.session_state.supervisor.clear_conversation()
     st.success("Chat cleared successfully!")
     st.rerun()
@@ -0,0 +1,224 @@
+"""
+Framework overhead benchmark for the supervisors.
+
+ChatOllama is replaced by a scripted fake model (benchmarks/fakes.py) that
+emits predetermined tool calls after a configurable latency, and embeddings
+by a deterministic hashing embedder, so no model server is needed. The
+harness drives UISupervisor.run, MemorySupervisor.run and SupervisorAgent.run
+through multi-turn sessions in a temporary persist directory and reports,
+per turn:
+
+- wall time, time spent inside the model, and the difference: our overhead
+- model calls and prompt size, which show how context grows with the session
+- bytes allocated and peak allocation, from tracemalloc
+
+Timings come from a pass without tracemalloc, allocations from a second
+pass with it, so tracing does not inflate the overhead numbers. Results are
+written as JSON, including a per-turn series and the slope of overhead over
+the session length:
+
+    python -m benchmarks.agent_overhead_bench --turns 60 --latency 0.05
+"""
+from contextlib import redirect_stdout
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+## mixes direct answers with every tool path of the supervisors
+DEFAULT_SCRIPT = [
+    "hello, how are you?",
+    "calculate 2847 * 392 + 1583",
+    "what does the uploaded document say about pricing?",
+    "remember that my favourite colour is blue",
+    "what was my first question?",
+    "what do you remember about me?",
+    "explain what an embedding is in two sentences",
+]
+
+SUPERVISORS = ("ui", "memory", "supervisor")
+
+
+def setup(persist_directory, latency, fast_path=False):
+    """
+    Point the app at a scratch directory and swap in the fake clients.
+
+    Must run before any agent module is imported, since settings are read at import time.
+
+    Returns:
+        The stats dict shared by every fake model instance.
+    """
+    os.environ["AGENT_PERSIST_DIRECTORY"] = persist_directory
+    os.environ["AGENT_FAST_PATH"] = "1" if fast_path else "0"
+    os.environ["AGENT_RESPONSE_CACHE"] = "0"
+
+    from benchmarks.fakes import HashEmbeddings, ScriptedChatModel
+    from config import registry
+    import memory.embeddings
+
+    model_stats = ScriptedChatModel().stats
+
+    def fake_chat_model(model, temperature=None, max_tokens=None):
+        return ScriptedChatModel(model_name=model, latency=latency, stats=model_stats)
+
+    registry.ChatOllama = fake_chat_model
+    memory.embeddings.create_embeddings = lambda backend, model_name: HashEmbeddings()
+    return model_stats
+
+
+def build(kind):
+    if kind == "ui":
+        from agents.ui_supervisor import UISupervisor
+
+        return UISupervisor()
+    if kind == "memory":
+        from agents.memory_supervisor import MemorySupervisor
+
+        return MemorySupervisor()
+    if kind == "supervisor":
+        from agents.supervisor_agent import SupervisorAgent
+
+        return SupervisorAgent()
+    raise ValueError(f"Unknown supervisor: {kind}")
+
+
+def run_session(kind, turns, script, model_stats, trace=False):
+    """
+    Drive one session of a supervisor.
+
+    Returns:
+        List of per-turn measurements.
+    """
+    supervisor = build(kind)
+    thread = threading.get_ident()
+    rows = []
+    with open(os.devnull, "w") as devnull:
+        for turn in range(turns):
+            text = script[turn % len(script)]
+            calls = model_stats["calls"][thread]
+            seconds = model_stats["seconds"][thread]
+            prompt_chars = model_stats["prompt_chars"][thread]
+            if trace:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+
+            ## agent executors log every step, that printing is part of the overhead but not of the report
+            with redirect_stdout(devnull):
+                start = time.perf_counter()
+                supervisor.run(text)
+                wall = time.perf_counter() - start
+
+            row = {
+                "turn": turn + 1,
+                "input": text,
+                "wall_ms": wall * 1000,
+                "llm_ms": (model_stats["seconds"][thread] - seconds) * 1000,
+                "llm_calls": model_stats["calls"][thread] - calls,
+                "prompt_chars": model_stats["prompt_chars"][thread] - prompt_chars,
+            }
+            row["overhead_ms"] = row["wall_ms"] - row["llm_ms"]
+            if trace:
+                current, peak = tracemalloc.get_traced_memory()
+                row["allocated_bytes"] = current - before
+                row["peak_bytes"] = peak - before
+            rows.append(row)
+
+    ## let background memory writes finish before the next session starts
+    memory_manager = getattr(supervisor, "memory_manager", None)
+    if memory_manager is not None:
+        memory_manager.memory_writer.flush(timeout=30)
+        memory_manager.short_term_memory.wait(timeout=30)
+    return rows
+
+
+def slope(rows, field):
+    """Least-squares change of a field per additional turn."""
+    if len(rows) < 2:
+        return 0.0
+    return statistics.linear_regression([row["turn"] for row in rows], [row[field] for row in rows]).slope
+
+
+def summarize(kind, timing, allocations):
+    overhead = sorted(row["overhead_ms"] for row in timing)
+    tenth = max(1, len(timing) // 10)
+
+    def quantile(p):
+        return overhead[min(len(overhead) - 1, int(p * len(overhead)))]
+
+    summary = {
+        "supervisor": kind,
+        "turns": len(timing),
+        "overhead_p50_ms": round(quantile(0.5), 3),
+        "overhead_p95_ms": round(quantile(0.95), 3),
+        "overhead_first_turns_ms": round(statistics.mean(row["overhead_ms"] for row in timing[:tenth]), 3),
+        "overhead_last_turns_ms": round(statistics.mean(row["overhead_ms"] for row in timing[-tenth:]), 3),
+        "overhead_slope_ms_per_turn": round(slope(timing, "overhead_ms"), 4),
+        "llm_calls_per_turn": round(statistics.mean(row["llm_calls"] for row in timing), 3),
+        "prompt_chars_slope_per_turn": round(slope(timing, "prompt_chars"), 2),
+    }
+    if allocations:
+        summary.update({
+            "allocated_bytes_per_turn": round(statistics.mean(row["allocated_bytes"] for row in allocations)),
+            "peak_bytes_p95": sorted(row["peak_bytes"] for row in allocations)[int(0.95 * (len(allocations) - 1))],
+            "allocated_slope_bytes_per_turn": round(slope(allocations, "allocated_bytes"), 1),
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the framework overhead of the supervisors with a fake model.")
+    parser.add_argument("--supervisors", default=",".join(SUPERVISORS), help="comma separated: ui, memory, supervisor")
+    parser.add_argument("--turns", type=int, default=50, help="turns per session")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds each fake model call takes")
+    parser.add_argument("--fast-path", action="store_true", help="keep the deterministic router in front of the LLM")
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="JSON file, defaults to benchmarks/results/agent-overhead-<timestamp>.json")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"agent-overhead-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    persist_directory = tempfile.mkdtemp(prefix="agent_overhead_bench_")
+    model_stats = setup(persist_directory, args.latency, fast_path=args.fast_path)
+
+    report = {
+        "benchmark": "agent_overhead",
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"turns": args.turns, "latency": args.latency, "fast_path": args.fast_path,
+                   "persist_directory": persist_directory, "script": DEFAULT_SCRIPT},
+        "summaries": [],
+        "turns": {},
+    }
+
+    for kind in args.supervisors.split(","):
+        timing = run_session(kind, args.turns, DEFAULT_SCRIPT, model_stats)
+        allocations = []
+        if not args.no_allocations:
+            tracemalloc.start()
+            allocations = run_session(kind, args.turns, DEFAULT_SCRIPT, model_stats, trace=True)
+            tracemalloc.stop()
+        summary = summarize(kind, timing, allocations)
+        report["summaries"].append(summary)
+        report["turns"][kind] = {"timing": timing, "allocations": allocations}
+        print(
+            f"{kind:>10}: overhead p50 {summary['overhead_p50_ms']} ms p95 {summary['overhead_p95_ms']} ms, "
+            f"first turns {summary['overhead_first_turns_ms']} ms, last turns {summary['overhead_last_turns_ms']} ms "
+            f"({summary['overhead_slope_ms_per_turn']:+} ms/turn), {summary['llm_calls_per_turn']} model calls/turn"
+            + (f", {summary['allocated_bytes_per_turn'] / 1024:.0f} KiB allocated/turn" if allocations else "")
+        )
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
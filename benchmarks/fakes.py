@@ -0,0 +1,135 @@
+"""
+Deterministic stand-ins for the model clients, so benchmarks run without Ollama.
+"""
+from collections import defaultdict
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field
+
+from memory.lexical_index import tokenize
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Feature-hashing embedder.
+
+    Every term maps to a fixed pseudo-random vector and a text embeds to the
+    normalized sum of its terms, so texts sharing terms are similar and
+    retrieval quality can be measured the same way as with a real model.
+    """
+
+    def __init__(self, dimension=384, latency=0.0):
+        """
+        Args:
+            dimension: Vector size.
+            latency: Seconds each embedding call sleeps, to mimic a model server.
+        """
+        self.dimension = dimension
+        self.latency = latency
+        self.model_name = f"fake:hash-{dimension}"
+        self.calls = 0
+        self._terms = {}
+
+    def _term(self, term):
+        vector = self._terms.get(term)
+        if vector is None:
+            seed = int.from_bytes(hashlib.sha256(term.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            self._terms[term] = vector
+        return vector
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for term in tokenize(text):
+            vector += self._term(term)
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+_ARITHMETIC = r"(?P<expression>\d[\d\s.()]*[-+*/][\d\s.+\-*/()]*\d)"
+
+## (pattern, tool, arguments) tried in order; the first rule whose tool is bound to the model is used
+DEFAULT_RULES = [
+    (_ARITHMETIC, "calculator", lambda text, match: {"expression": match.group("expression").strip()}),
+    (_ARITHMETIC, "call_calculator_agent", lambda text, match: {"query": text}),
+    (r"\b(document|uploaded|report|knowledge base)\b", "search_knowledge_base", lambda text, match: {"query": text}),
+    (r"\b(document|uploaded|report|knowledge base)\b", "call_rag_agent", lambda text, match: {"query": text}),
+    (r"\bwhat do you remember\b", "retrieve_from_memory", lambda text, match: {"query": text}),
+    (r"^(please )?remember\b", "save_to_memory", lambda text, match: {"query": text}),
+    (r"\b(first question|what did i ask|what did we)\b", "show_conversation_history", lambda text, match: {"query": text}),
+]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that answers from rules instead of a network call.
+
+    A user input matching a rule produces a call to the rule's tool when that
+    tool is bound, a tool result produces a final answer, and anything else
+    is answered directly. Each call sleeps for the configured latency, which
+    is recorded per thread so a harness can subtract model time from a turn.
+    """
+
+    model_name: str = "scripted"
+    latency: float = 0.0
+    rules: list = Field(default_factory=lambda: list(DEFAULT_RULES))
+    stats: dict = Field(default_factory=lambda: {"calls": defaultdict(int), "seconds": defaultdict(float),
+                                                 "prompt_chars": defaultdict(int)})
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        names = [convert_to_openai_tool(tool)["function"]["name"] for tool in tools]
+        return self.bind(tool_names=names, **kwargs)
+
+    def _respond(self, messages, tool_names):
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"Here is what I found: {str(last.content)[:200]}")
+        text = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), str(last.content))
+        for pattern, tool_name, arguments in self.rules:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match and tool_name in tool_names:
+                call_id = hashlib.sha256(f"{len(messages)}{text}".encode("utf-8")).hexdigest()[:12]
+                return AIMessage(content="", tool_calls=[
+                    {"name": tool_name, "args": arguments(text, match), "id": f"call_{call_id}", "type": "tool_call"}
+                ])
+        return AIMessage(content=f"Scripted answer to: {text[:100]}")
+
+    def _generate(self, messages, stop=None, run_manager=None, tool_names=(), **kwargs):
+        thread = threading.get_ident()
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        self.stats["calls"][thread] += 1
+        self.stats["prompt_chars"][thread] += prompt_chars
+        if self.latency:
+            time.sleep(self.latency)
+            self.stats["seconds"][thread] += self.latency
+
+        message = self._respond(messages, tool_names)
+        output_tokens = max(1, len(str(message.content)) // 4)
+        message.usage_metadata = {
+            "input_tokens": prompt_chars // 4, "output_tokens": output_tokens,
+            "total_tokens": prompt_chars // 4 + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,197 @@
+"""
+Retrieval benchmark for the vector store backends.
+
+Builds synthetic corpora of several sizes in temporary directories, embeds
+them with a deterministic hashing embedder (no Ollama needed) and reports:
+
+- ingestion throughput of VectorStore.add_documents, in chunks per second
+- p50/p95/p99 latency of VectorStore.search per search mode
+- recall@k of the results against an exact brute-force search
+- on-disk size of the collection
+
+Results are written as JSON so runs before and after a storage or index
+change can be compared:
+
+    python -m benchmarks.retrieval_bench --sizes 1000,10000 --backends chroma,mmap
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.fakes import HashEmbeddings
+from config import registry, settings
+from memory.vector_store import chunk_id, create_vector_store
+
+
+def make_corpus(size, seed=0, vocabulary=5000, min_words=40, max_words=120):
+    """
+    Generate chunks of Zipf-distributed words, like real text has a few common and many rare terms.
+
+    Returns:
+        List of unique chunk texts.
+    """
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(vocabulary)]
+    cumulative = []
+    total = 0.0
+    for rank in range(vocabulary):
+        total += 1.0 / (rank + 1)
+        cumulative.append(total)
+
+    texts = {}
+    while len(texts) < size:
+        text = " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(min_words, max_words)))
+        texts[text] = None
+    return list(texts)
+
+
+def make_queries(texts, count, seed=0, words=6):
+    """Queries made of a few words sampled from random chunks, each query unique."""
+    rng = random.Random(seed + 1)
+    queries = {}
+    while len(queries) < count:
+        chunk = rng.choice(texts).split()
+        queries[" ".join(rng.sample(chunk, min(words, len(chunk))))] = None
+    return list(queries)
+
+
+def source_of(index):
+    """Source document of a corpus chunk, 100 chunks per document."""
+    return f"doc{index // 100}.txt"
+
+
+def brute_force(embeddings, texts, queries, k):
+    """Exact top-k chunk ids of each query by cosine similarity."""
+    matrix = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    ids = [chunk_id(text, source_of(i)) for i, text in enumerate(texts)]
+    truth = []
+    for query in queries:
+        scores = matrix @ np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        truth.append({ids[i] for i in top})
+    return truth
+
+
+def percentile(values, p):
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def disk_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def run_one(backend, texts, queries, truth, modes, k, embeddings, warmup=10):
+    """Ingest a corpus into a fresh store and measure it."""
+    directory = tempfile.mkdtemp(prefix=f"retrieval_bench_{backend}_")
+    try:
+        store = create_vector_store("bench", directory, backend=backend, embeddings=embeddings)
+        metadata = [{"source": source_of(i), "page": i % 100, "ingested_at": time.time()} for i in range(len(texts))]
+
+        start = time.perf_counter()
+        stats = store.add_documents(texts, metadata=metadata)
+        ingest_seconds = time.perf_counter() - start
+
+        results = []
+        for mode in modes:
+            ## warm up on queries outside the measured set, results of measured queries are never cached
+            for i in range(min(warmup, len(queries))):
+                store.search(f"warmup {i} {queries[i]}", k=k, mode=mode)
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = store.search(query, k=k, mode=mode)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len(expected & {doc.id for doc in found})
+            results.append({
+                "backend": backend,
+                "size": len(texts),
+                "mode": mode,
+                "chunks_added": stats["added"],
+                "ingest_seconds": round(ingest_seconds, 3),
+                "ingest_chunks_per_second": round(stats["added"] / ingest_seconds, 1) if ingest_seconds else None,
+                "embed_seconds": round(stats["embed_seconds"], 3),
+                "store_seconds": round(stats["store_seconds"], 3),
+                "queries": len(queries),
+                "k": k,
+                "search_p50_ms": round(percentile(latencies, 50), 3),
+                "search_p95_ms": round(percentile(latencies, 95), 3),
+                "search_p99_ms": round(percentile(latencies, 99), 3),
+                "recall_at_k": round(hits / (k * len(queries)), 4) if queries else None,
+                "disk_bytes": disk_size(directory),
+            })
+        return results
+    finally:
+        ## drop the cached clients of the temporary directory before deleting it
+        registry.clear()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and search of the vector store backends.")
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated corpus sizes, in chunks")
+    parser.add_argument("--backends", default="chroma,mmap", help="comma separated backends: chroma, mmap")
+    parser.add_argument("--modes", default="vector,hybrid", help="comma separated search modes: vector, lexical, hybrid")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embedding call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file, defaults to benchmarks/results/retrieval-<timestamp>.json")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    backends = args.backends.split(",")
+    modes = args.modes.split(",")
+
+    report = {
+        "benchmark": "retrieval",
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "queries": args.queries, "k": args.k, "dimension": args.dimension, "seed": args.seed,
+            "embed_latency": args.embed_latency, "embed_batch_size": settings.EMBED_BATCH_SIZE,
+            "embed_workers": settings.EMBED_WORKERS, "hnsw_params": settings.HNSW_PARAMS,
+            "index_params": settings.INDEX_PARAMS, "mmap_dtype": settings.MMAP_DTYPE,
+        },
+        "results": [],
+    }
+
+    for size in sizes:
+        embeddings = HashEmbeddings(args.dimension, latency=args.embed_latency)
+        texts = make_corpus(size, seed=args.seed)
+        queries = make_queries(texts, args.queries, seed=args.seed)
+        truth = brute_force(embeddings, texts, queries, args.k)
+        for backend in backends:
+            for result in run_one(backend, texts, queries, truth, modes, args.k, embeddings):
+                report["results"].append(result)
+                print(
+                    f"{result['backend']:>6} {result['size']:>8} {result['mode']:>7}: "
+                    f"ingest {result['ingest_chunks_per_second']} chunks/s, "
+                    f"search p50 {result['search_p50_ms']} ms p95 {result['search_p95_ms']} ms "
+                    f"p99 {result['search_p99_ms']} ms, recall@{args.k} {result['recall_at_k']}, "
+                    f"{result['disk_bytes'] / 1e6:.1f} MB"
+                )
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"retrieval-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Process-wide registry of model, embedding and Chroma clients.
+
+Every agent asks the registry for its clients instead of constructing them,
+so a process holds one client per distinct configuration no matter how many
+agents or Streamlit sessions are alive.
+"""
+import os
+import threading
+
+from langchain_ollama import ChatOllama
+
+from config import settings
+
+_lock = threading.Lock()
+_llms = {}
+_embeddings = {}
+_embedding_caches = {}
+_manifests = {}
+_lexical_indexes = {}
+_session_stores = {}
+_memory_writers = {}
+_response_cache = None
+_chroma_clients = {}
+
+
+def get_llm(model_name=None, temperature=None, max_tokens=None):
+    """
+    Get the shared chat model client for a configuration.
+
+    Args:
+        model_name: Ollama model name, defaults to settings.DEFAULT_MODEL.
+        temperature: Sampling temperature.
+        max_tokens: Maximum number of tokens to generate.
+
+    Returns:
+        A ChatOllama instance shared by every caller with the same config.
+    """
+    model_name = model_name or settings.DEFAULT_MODEL
+    temperature = settings.DEFAULT_TEMPERATURE if temperature is None else temperature
+    max_tokens = settings.DEFAULT_MAX_TOKENS if max_tokens is None else max_tokens
+    key = (model_name, temperature, max_tokens)
+    with _lock:
+        if key not in _llms:
+            _llms[key] = ChatOllama(model=model_name, temperature=temperature, max_tokens=max_tokens)
+        return _llms[key]
+
+
+def get_embeddings(model_name=None, backend=None):
+    """
+    Get the shared embedding client for a model.
+
+    The embedding model is configured independently of the chat model.
+    The client is wrapped in a CachedEmbeddings backed by the on-disk
+    embedding cache, so repeated chunks are never embedded twice.
+
+    Args:
+        model_name: Embedding model, defaults to settings.EMBEDDING_MODEL.
+        backend: "ollama" or "local", defaults to settings.EMBEDDING_BACKEND.
+
+    Returns:
+        A CachedEmbeddings instance shared by every caller with the same
+        backend and model. Its model_name is "<backend>:<model>".
+    """
+    backend = backend or settings.EMBEDDING_BACKEND
+    model_name = model_name or settings.EMBEDDING_MODEL
+    key = f"{backend}:{model_name}"
+    cache = get_embedding_cache()
+    with _lock:
+        if key not in _embeddings:
+            from memory.embedding_cache import CachedEmbeddings
+            from memory.embeddings import create_embeddings
+
+            _embeddings[key] = CachedEmbeddings(
+                create_embeddings(backend, model_name), cache, key,
+                query_cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            )
+        return _embeddings[key]
+
+
+def get_embedding_cache(path=None):
+    """
+    Get the shared on-disk embedding cache.
+
+    Args:
+        path: SQLite file holding the cache, defaults to settings.EMBEDDING_CACHE_FILE.
+
+    Returns:
+        An EmbeddingCache, one per resolved path.
+    """
+    from memory.embedding_cache import EmbeddingCache
+
+    key = os.path.abspath(path or settings.EMBEDDING_CACHE_FILE)
+    with _lock:
+        if key not in _embedding_caches:
+            _embedding_caches[key] = EmbeddingCache(key, max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        return _embedding_caches[key]
+
+
+def get_document_manifest(path=None):
+    """
+    Get the shared manifest of ingested documents.
+
+    Args:
+        path: JSON file holding the manifest, defaults to settings.DOCUMENT_MANIFEST_FILE.
+
+    Returns:
+        A DocumentManifest, one per resolved path.
+    """
+    from memory.manifest import DocumentManifest
+
+    key = os.path.abspath(path or settings.DOCUMENT_MANIFEST_FILE)
+    with _lock:
+        if key not in _manifests:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            _manifests[key] = DocumentManifest(key)
+        return _manifests[key]
+
+
+def get_lexical_index(collection_name, persist_directory=None):
+    """
+    Get the shared BM25 index kept alongside a chroma collection.
+
+    Args:
+        collection_name: Name of the chroma collection the index mirrors.
+        persist_directory: Directory holding the chroma database.
+
+    Returns:
+        A LexicalIndex, one per collection.
+    """
+    from memory.lexical_index import LexicalIndex
+
+    persist_directory = persist_directory or settings.PERSIST_DIRECTORY
+    key = os.path.abspath(os.path.join(persist_directory, f"lexical_{collection_name}.sqlite"))
+    with _lock:
+        if key not in _lexical_indexes:
+            _lexical_indexes[key] = LexicalIndex(key)
+        return _lexical_indexes[key]
+
+
+def get_session_store(persist_directory=None):
+    """
+    Get the shared session metadata store of a persist directory.
+
+    Args:
+        persist_directory: Directory holding the session database.
+
+    Returns:
+        A SessionStore, one per directory, so every MemoryManager batches into the same buffer.
+    """
+    from memory.session_store import SessionStore
+
+    persist_directory = persist_directory or settings.PERSIST_DIRECTORY
+    key = os.path.abspath(os.path.join(persist_directory, "sessions.sqlite"))
+    with _lock:
+        if key not in _session_stores:
+            _session_stores[key] = SessionStore(
+                key, flush_every=settings.SESSION_FLUSH_EVERY, flush_interval=settings.SESSION_FLUSH_INTERVAL)
+        return _session_stores[key]
+
+
+def get_memory_writer(persist_directory=None):
+    """
+    Get the shared write-behind queue of the long term memory collection.
+
+    Args:
+        persist_directory: Directory holding the chroma database.
+
+    Returns:
+        A MemoryWriter, one per directory, so every session's saves share one writer thread.
+    """
+    from memory.embeddings import open_collection
+    from memory.memory_writer import MemoryWriter
+
+    persist_directory = persist_directory or settings.PERSIST_DIRECTORY
+    key = os.path.abspath(persist_directory)
+    embeddings = get_embeddings()
+    client = get_chroma_client(persist_directory)
+    with _lock:
+        if key not in _memory_writers:
+            collection = open_collection(client, "long_term_memory", embeddings, embeddings.model_name)
+            _memory_writers[key] = MemoryWriter(
+                collection, embeddings, persist_directory,
+                batch_size=settings.MEMORY_WRITE_BATCH_SIZE,
+                batch_wait=settings.MEMORY_WRITE_WAIT,
+                max_attempts=settings.MEMORY_WRITE_RETRIES,
+                duplicate_threshold=settings.MEMORY_DUPLICATE_THRESHOLD,
+                ttl_days=settings.MEMORY_TTL_DAYS,
+                max_per_session=settings.MEMORY_MAX_PER_SESSION,
+                max_entries=settings.MEMORY_MAX_ENTRIES,
+            )
+        return _memory_writers[key]
+
+
+def get_response_cache():
+    """
+    Get the process-wide semantic response cache shared by every supervisor.
+
+    Returns:
+        A ResponseCache configured from settings.
+    """
+    global _response_cache
+    from agents.response_cache import ResponseCache
+
+    embeddings = get_embeddings()
+    with _lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                embeddings=embeddings,
+                threshold=settings.RESPONSE_CACHE_THRESHOLD,
+                ttl=settings.RESPONSE_CACHE_TTL,
+                max_entries=settings.RESPONSE_CACHE_SIZE,
+            )
+        return _response_cache
+
+
+def get_chroma_client(persist_directory=None):
+    """
+    Get the shared persistent Chroma client for a directory.
+
+    Args:
+        persist_directory: Directory holding the chroma database.
+
+    Returns:
+        A chromadb PersistentClient, one per resolved directory.
+    """
+    import chromadb
+
+    persist_directory = persist_directory or settings.PERSIST_DIRECTORY
+    key = os.path.abspath(persist_directory)
+    with _lock:
+        if key not in _chroma_clients:
+            os.makedirs(key, exist_ok=True)
+            _chroma_clients[key] = chromadb.PersistentClient(path=key)
+        return _chroma_clients[key]
+
+
+def clear():
+    """Drop every cached client. Mainly useful for tests and benchmarks."""
+    global _response_cache
+    with _lock:
+        _response_cache = None
+        _llms.clear()
+        _embeddings.clear()
+        _embedding_caches.clear()
+        _manifests.clear()
+        _lexical_indexes.clear()
+        for store in _session_stores.values():
+            store.flush()
+        _session_stores.clear()
+        for writer in _memory_writers.values():
+            writer.flush()
+        _memory_writers.clear()
+        _chroma_clients.clear()
@@ -0,0 +1,120 @@
+import json
+import os
+
+## default model settings shared by every agent
+DEFAULT_MODEL = os.getenv("AGENT_MODEL", "llama3.2:3b")
+DEFAULT_TEMPERATURE = float(os.getenv("AGENT_TEMPERATURE", "0.1"))
+DEFAULT_MAX_TOKENS = int(os.getenv("AGENT_MAX_TOKENS", "1000"))
+
+## directory holding the chroma database and other persisted state
+PERSIST_DIRECTORY = os.getenv("AGENT_PERSIST_DIRECTORY", "db")
+
+## ingestion: chunks per embedding request and concurrent embedding requests
+EMBED_BATCH_SIZE = int(os.getenv("AGENT_EMBED_BATCH_SIZE", "32"))
+EMBED_WORKERS = int(os.getenv("AGENT_EMBED_WORKERS", "4"))
+
+## on-disk embedding cache kept next to the chroma database
+EMBEDDING_CACHE_FILE = os.getenv("AGENT_EMBEDDING_CACHE_FILE", os.path.join(PERSIST_DIRECTORY, "embedding_cache.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("AGENT_EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+## manifest of ingested documents used for incremental re-ingestion
+DOCUMENT_MANIFEST_FILE = os.getenv("AGENT_DOCUMENT_MANIFEST_FILE", os.path.join(PERSIST_DIRECTORY, "document_manifest.json"))
+
+## document loading: PDFs with at least this many pages are extracted in a process pool
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("AGENT_PDF_PARALLEL_MIN_PAGES", "50"))
+PDF_WORKERS = int(os.getenv("AGENT_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+## text files are streamed in pages of roughly this many characters
+TEXT_PAGE_CHARS = int(os.getenv("AGENT_TEXT_PAGE_CHARS", "20000"))
+
+## embedding backend, configurable apart from the chat model: "ollama" or "local" (in-process sentence-transformers);
+## ollama defaults to the chat model so existing collections keep their vector dimension
+EMBEDDING_BACKEND = os.getenv("AGENT_EMBEDDING_BACKEND", "ollama")
+EMBEDDING_MODEL = os.getenv(
+    "AGENT_EMBEDDING_MODEL",
+    DEFAULT_MODEL if EMBEDDING_BACKEND == "ollama" else "sentence-transformers/all-MiniLM-L6-v2",
+)
+
+## knowledge base search: "vector", "lexical" or "hybrid" (reciprocal-rank fusion of both)
+SEARCH_MODE = os.getenv("AGENT_SEARCH_MODE", "hybrid")
+RRF_K = int(os.getenv("AGENT_RRF_K", "60"))
+
+## in-process caches for query embeddings and search / memory lookup results
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("AGENT_QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+SEARCH_CACHE_SIZE = int(os.getenv("AGENT_SEARCH_CACHE_SIZE", "512"))
+
+## opt-in semantic response cache in front of UISupervisor.run
+RESPONSE_CACHE_ENABLED = os.getenv("AGENT_RESPONSE_CACHE", "0").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("AGENT_RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL = float(os.getenv("AGENT_RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("AGENT_RESPONSE_CACHE_SIZE", "1024"))
+
+## deterministic fast-path router ahead of the supervisor LLM
+FAST_PATH_ENABLED = os.getenv("AGENT_FAST_PATH", "1").lower() in ("1", "true", "yes")
+
+## "direct": retrieve then answer in one LLM call, "agent": let the RAG agent drive its tools
+RAG_MODE = os.getenv("AGENT_RAG_MODE", "direct")
+RAG_CONTEXT_CHUNKS = int(os.getenv("AGENT_RAG_CONTEXT_CHUNKS", "4"))
+
+## short term memory: prompt history budget, older turns are folded into a rolling summary
+SHORT_TERM_TOKEN_BUDGET = int(os.getenv("AGENT_SHORT_TERM_TOKENS", "2000"))
+SHORT_TERM_SUMMARY_TOKENS = int(os.getenv("AGENT_SHORT_TERM_SUMMARY_TOKENS", "300"))
+
+## session metadata counters are written to sqlite in batches
+SESSION_FLUSH_EVERY = int(os.getenv("AGENT_SESSION_FLUSH_EVERY", "20"))
+SESSION_FLUSH_INTERVAL = float(os.getenv("AGENT_SESSION_FLUSH_INTERVAL", "5"))
+
+## long term memory saves are queued and written in batches by a background thread
+MEMORY_WRITE_BATCH_SIZE = int(os.getenv("AGENT_MEMORY_WRITE_BATCH_SIZE", "16"))
+MEMORY_WRITE_WAIT = float(os.getenv("AGENT_MEMORY_WRITE_WAIT", "0.5"))
+MEMORY_WRITE_RETRIES = int(os.getenv("AGENT_MEMORY_WRITE_RETRIES", "3"))
+MEMORY_DUPLICATE_THRESHOLD = float(os.getenv("AGENT_MEMORY_DUPLICATE_THRESHOLD", "0.95"))
+
+## vector index: "chroma" (HNSW) or "mmap" (quantized vectors in a memory-mapped file, exact NumPy search)
+VECTOR_BACKEND = os.getenv("AGENT_VECTOR_BACKEND", "chroma")
+MMAP_DTYPE = os.getenv("AGENT_MMAP_DTYPE", "float16")
+
+## chroma HNSW parameters of new collections, unset values keep chroma's defaults.
+## AGENT_INDEX_PARAMS overrides them per collection, e.g. '{"documents": {"M": 32, "search_ef": 200}}'
+HNSW_PARAMS = {
+    "space": os.getenv("AGENT_HNSW_SPACE"),
+    "M": os.getenv("AGENT_HNSW_M"),
+    "construction_ef": os.getenv("AGENT_HNSW_CONSTRUCTION_EF"),
+    "search_ef": os.getenv("AGENT_HNSW_SEARCH_EF"),
+    "batch_size": os.getenv("AGENT_HNSW_BATCH_SIZE"),
+}
+INDEX_PARAMS = json.loads(os.getenv("AGENT_INDEX_PARAMS", "{}"))
+
+## long term memory retention and recall, see memory/retention.py and `python -m memory.compaction`
+MEMORY_TTL_DAYS = float(os.getenv("AGENT_MEMORY_TTL_DAYS", "180"))
+MEMORY_MAX_PER_SESSION = int(os.getenv("AGENT_MEMORY_MAX_PER_SESSION", "200"))
+MEMORY_MAX_ENTRIES = int(os.getenv("AGENT_MEMORY_MAX_ENTRIES", "10000"))
+MEMORY_RECALL_K = int(os.getenv("AGENT_MEMORY_RECALL_K", "3"))
+MEMORY_RECALL_CANDIDATES = int(os.getenv("AGENT_MEMORY_RECALL_CANDIDATES", "4"))
+MEMORY_HALF_LIFE_DAYS = float(os.getenv("AGENT_MEMORY_HALF_LIFE_DAYS", "30"))
+MEMORY_RECENCY_WEIGHT = float(os.getenv("AGENT_MEMORY_RECENCY_WEIGHT", "0.3"))
+MEMORY_MERGE_THRESHOLD = float(os.getenv("AGENT_MEMORY_MERGE_THRESHOLD", "0.92"))
+
+## headless server: admission control and session limits
+SERVER_HOST = os.getenv("AGENT_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("AGENT_SERVER_PORT", "8600"))
+SERVER_URL = os.getenv("AGENT_SERVER_URL", "")
+MAX_CONCURRENT_PER_MODEL = int(os.getenv("AGENT_MAX_CONCURRENT_PER_MODEL", "2"))
+MAX_QUEUE_DEPTH = int(os.getenv("AGENT_MAX_QUEUE_DEPTH", "32"))
+QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "60"))
+MAX_SESSIONS = int(os.getenv("AGENT_MAX_SESSIONS", "1000"))
+SESSION_IDLE_SECONDS = float(os.getenv("AGENT_SESSION_IDLE_SECONDS", "3600"))
+
+## per-turn tracing, see config/tracing.py. Spans are appended to AGENT_TRACE_FILE when it is set,
+## as flat JSON lines ("jsonl") or OpenTelemetry OTLP/JSON records ("otlp")
+TRACE_ENABLED = os.getenv("AGENT_TRACE", "1").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("AGENT_TRACE_FILE", "")
+TRACE_FORMAT = os.getenv("AGENT_TRACE_FORMAT", "jsonl")
+
+## calculator limits, see tools/calculator.py. They bound the cost of any expression a user can send
+CALC_MAX_LENGTH = int(os.getenv("AGENT_CALC_MAX_LENGTH", "500"))
+CALC_MAX_DEPTH = int(os.getenv("AGENT_CALC_MAX_DEPTH", "200"))
+CALC_MAX_MAGNITUDE = float(os.getenv("AGENT_CALC_MAX_MAGNITUDE", "1e300"))
+CALC_MAX_EXPONENT = int(os.getenv("AGENT_CALC_MAX_EXPONENT", "10000"))
+CALC_TIMEOUT = float(os.getenv("AGENT_CALC_TIMEOUT", "0.05"))
+CALC_BATCH_TIMEOUT = float(os.getenv("AGENT_CALC_BATCH_TIMEOUT", "2"))
+CALC_MAX_BATCH = int(os.getenv("AGENT_CALC_MAX_BATCH", "1000000"))
@@ -0,0 +1,370 @@
+"""
+Per-turn tracing of the agents.
+
+A turn (one user message) is wrapped in `turn()`, which opens a trace and
+installs a LangChain callback for its duration, so every LLM call (with
+token counts) and tool call made inside the turn, including those of
+sub-agents called from tools, is recorded as a span. Work LangChain does
+not see is wrapped in `span()`: embedding requests, vector queries and
+session metadata writes. Spans started outside of a turn, e.g. by the
+background memory writer, are only exported.
+
+When settings.TRACE_FILE is set, spans are appended to it when their turn
+ends, one JSON object per span ("jsonl") or one OTLP/JSON ResourceSpans
+record per turn ("otlp"), which OpenTelemetry collectors can read with
+their file receiver. `Trace.summary()` gives the latency breakdown shown
+in the app's sidebar.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import os
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from config import settings
+
+_current_trace = ContextVar("agent_trace", default=None)
+_current_span = ContextVar("agent_span", default=None)
+_handler = ContextVar("agent_trace_handler", default=None)
+## every LangChain run started while the handler is set reports to it, nested runs included
+register_configure_hook(_handler, inheritable=True)
+
+_export_lock = threading.Lock()
+
+## spans of these kinds call another process or service
+_CLIENT_KINDS = {"llm", "embedding", "vector", "metadata"}
+
+
+def _new_id(size):
+    return os.urandom(size).hex()
+
+
+def _reset(var, token):
+    try:
+        var.reset(token)
+    except ValueError:
+        ## a generator finished in another context than it started in
+        var.set(None)
+
+
+class Span:
+    """A timed operation with attributes, in a trace."""
+
+    def __init__(self, trace_id, name, kind, parent_id=None, attributes=None):
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start = time.time()
+        self.duration = 0.0
+        self._started = time.perf_counter()
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "end": self.start + self.duration,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def to_otlp(self):
+        start = int(self.start * 1e9)
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            ## SPAN_KIND_CLIENT or SPAN_KIND_INTERNAL
+            "kind": 3 if self.kind in _CLIENT_KINDS else 1,
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int(self.duration * 1e9)),
+            "attributes": [_otlp_attribute("agent.span.kind", self.kind)]
+                          + [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            ## STATUS_CODE_ERROR or STATUS_CODE_UNSET
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Trace:
+    """The spans of one turn, under a root span."""
+
+    def __init__(self, name, attributes=None):
+        self.trace_id = _new_id(16)
+        self.root = Span(self.trace_id, name, "turn", attributes=attributes)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self, slowest=5):
+        """
+        Latency breakdown of the turn.
+
+        Each span contributes its own time, without the time of its child
+        spans, so the breakdown adds up to the turn's duration: "other" is
+        the time not covered by any span (agent framework, prompt building).
+
+        Returns:
+            Dict with the duration, milliseconds and span counts per kind,
+            LLM calls and token totals, and the slowest spans.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        children = defaultdict(float)
+        for span in spans:
+            children[span.parent_id] += span.duration
+        breakdown = defaultdict(float)
+        counts = defaultdict(int)
+        for span in spans:
+            breakdown[span.kind] += max(span.duration - children[span.span_id], 0.0)
+            counts[span.kind] += 1
+        breakdown["other"] = max(self.root.duration - children[self.root.span_id], 0.0)
+
+        llm_spans = [span for span in spans if span.kind == "llm"]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "duration_ms": round(self.root.duration * 1000, 1),
+            "breakdown_ms": {kind: round(seconds * 1000, 1)
+                             for kind, seconds in sorted(breakdown.items(), key=lambda item: -item[1])},
+            "counts": dict(counts),
+            "llm_calls": len(llm_spans),
+            "input_tokens": sum(span.attributes.get("input_tokens", 0) for span in llm_spans),
+            "output_tokens": sum(span.attributes.get("output_tokens", 0) for span in llm_spans),
+            "slowest": [
+                {"name": span.name, "kind": span.kind, "duration_ms": round(span.duration * 1000, 1)}
+                for span in sorted(spans, key=lambda span: -span.duration)[:slowest]
+            ],
+            "error": self.root.error,
+        }
+
+
+def export(spans, path=None, format=None):
+    """
+    Append spans to the trace file.
+
+    Args:
+        spans: Spans of one trace.
+        path: File to append to, defaults to settings.TRACE_FILE. Nothing is written without one.
+        format: "jsonl" or "otlp", defaults to settings.TRACE_FORMAT.
+    """
+    path = path or settings.TRACE_FILE
+    if not path or not spans:
+        return
+    if (format or settings.TRACE_FORMAT) == "otlp":
+        lines = [json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", "personal-ai-agent")]},
+            "scopeSpans": [{"scope": {"name": "config.tracing"}, "spans": [span.to_otlp() for span in spans]}],
+        }]})]
+    else:
+        lines = [json.dumps(span.to_dict()) for span in spans]
+    try:
+        with _export_lock:
+            with open(path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Error writing trace file: {e}")
+
+
+@contextmanager
+def turn(name, **attributes):
+    """
+    Trace one turn.
+
+    Args:
+        name: Name of the root span, e.g. the supervisor handling the turn.
+        **attributes: Attributes of the root span.
+
+    Yields:
+        The Trace, or None when tracing is disabled. Its summary() is
+        complete once the block has exited.
+    """
+    if not settings.TRACE_ENABLED:
+        yield None
+        return
+    trace = Trace(name, attributes)
+    tokens = [
+        (_current_trace, _current_trace.set(trace)),
+        (_current_span, _current_span.set(trace.root)),
+        (_handler, _handler.set(TracingCallbackHandler(trace))),
+    ]
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = repr(e)
+        raise
+    finally:
+        for var, token in tokens:
+            _reset(var, token)
+        trace.root.finish()
+        export([trace.root] + trace.spans)
+
+
+@contextmanager
+def span(name, kind="internal", **attributes):
+    """
+    Time a block as a span of the current turn.
+
+    Args:
+        name: Name of the operation.
+        kind: Category used by the latency breakdown, e.g. "embedding", "vector" or "metadata".
+        **attributes: Attributes of the span, more can be added to span.attributes inside the block.
+
+    Yields:
+        The Span.
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    record = Span(
+        trace.trace_id if trace is not None else _new_id(16), name, kind,
+        parent_id=parent.span_id if parent is not None else None, attributes=attributes,
+    )
+    token = _current_span.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record.error = repr(e)
+        raise
+    finally:
+        _reset(_current_span, token)
+        record.finish()
+        if trace is not None:
+            trace.add(record)
+        elif settings.TRACE_ENABLED:
+            export([record])
+
+
+def _token_usage(response):
+    """Input and output token counts of an LLMResult."""
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not (input_tokens or output_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records LLM, tool and retriever runs of a turn as spans."""
+
+    ## called in the run's own thread and context, so tool spans can become the current span
+    run_inline = True
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._spans = {}
+        self._outer = {}
+        ## runs without a span (chains), to find the nearest traced ancestor
+        self._parents = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, parent_run_id, name, kind, attributes=None):
+        with self._lock:
+            while parent_run_id is not None and parent_run_id not in self._spans:
+                parent_run_id = self._parents.get(parent_run_id)
+            parent = self._spans.get(parent_run_id) or _current_span.get() or self.trace.root
+            record = Span(self.trace.trace_id, name, kind, parent_id=parent.span_id, attributes=attributes)
+            self._spans[run_id] = record
+        return record
+
+    def _end(self, run_id, error=None, **attributes):
+        with self._lock:
+            record = self._spans.pop(run_id, None)
+        if record is None:
+            return
+        record.attributes.update(attributes)
+        if error is not None:
+            record.error = repr(error)
+        record.finish()
+        self.trace.add(record)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        with self._lock:
+            self._parents.pop(run_id, None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._parents.pop(run_id, None)
+
+    def _start_llm(self, serialized, run_id, parent_run_id, metadata, prompts):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "llm"
+        self._start(run_id, parent_run_id, f"llm {model}", "llm", {"model": model, "prompts": prompts})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, metadata, len(messages))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._start_llm(serialized, run_id, parent_run_id, metadata, len(prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens, output_tokens = _token_usage(response)
+        self._end(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        record = self._start(run_id, parent_run_id, f"tool {name}", "tool", {"tool": name})
+        ## spans opened by the tool's code (embedding, vector queries) nest under the tool
+        self._outer[run_id] = _current_span.get()
+        _current_span.set(record)
+
+    def _end_tool(self, run_id, error=None):
+        if run_id in self._outer:
+            _current_span.set(self._outer.pop(run_id))
+        self._end(run_id, error=error)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end_tool(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end_tool(run_id, error=error)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "retriever", "vector")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
@@ -0,0 +1,72 @@
+"""
+In-process LRU caches and collection versions used to invalidate them.
+
+Every write to a collection bumps its version. Caches of search results
+include the version in their keys, so stale entries are never served and
+simply age out of the LRU.
+"""
+from collections import OrderedDict
+import os
+import threading
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit and miss counters."""
+
+    _missing = object()
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, self._missing)
+            if value is self._missing:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._data)
+
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def _version_key(persist_directory, collection_name):
+    return os.path.abspath(persist_directory), collection_name
+
+
+def collection_version(persist_directory, collection_name):
+    """Current write version of a collection in this process."""
+    return _versions.get(_version_key(persist_directory, collection_name), 0)
+
+
+def bump_collection_version(persist_directory, collection_name):
+    """Record a write to a collection, invalidating cached results for it."""
+    key = _version_key(persist_directory, collection_name)
+    with _versions_lock:
+        _versions[key] = _versions.get(key, 0) + 1
+        return _versions[key]
@@ -0,0 +1,180 @@
+"""
+Offline compaction of the long term memory collection.
+
+Applies the retention policy, merges near-duplicate memories into the most
+recently used one and rebuilds the collection into a fresh HNSW index, which
+also reclaims the space chroma keeps for deleted vectors. The old collection
+is only deleted once the rebuilt one holds its name, and a run interrupted
+in between is recovered by the next one. Run it while the app and server
+are stopped:
+
+    python -m memory.compaction --persist-directory db
+"""
+import argparse
+import time
+
+import numpy as np
+
+from config import settings
+from config.registry import get_chroma_client
+from memory.cache import bump_collection_version
+from memory.embeddings import index_params
+from memory.retention import apply_retention, last_used, stamp
+
+COLLECTION = "long_term_memory"
+_TEMP = f"{COLLECTION}_compacting"
+_PREVIOUS = f"{COLLECTION}_previous"
+_BATCH = 500
+
+
+def merge_near_duplicates(ids, documents, metadatas, embeddings, threshold=0.92):
+    """
+    Group memories of the same session whose cosine similarity reaches the threshold.
+
+    Each group keeps its most recently used memory, with the earliest
+    creation time, the latest recall time and the number of merged memories.
+
+    Returns:
+        (ids, documents, metadatas, embeddings) of the kept memories.
+    """
+    if not ids:
+        return [], [], [], []
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    ## memories of different sessions are never merged, each tenant keeps its own
+    codes = {}
+    sessions = np.array([codes.setdefault((metadata or {}).get("session_id"), len(codes)) for metadata in metadatas])
+
+    order = sorted(range(len(ids)), key=lambda i: last_used(metadatas[i]), reverse=True)
+    merged = np.zeros(len(ids), dtype=bool)
+    kept = []
+    for i in order:
+        if merged[i]:
+            continue
+        similar = np.flatnonzero((vectors @ vectors[i] >= threshold) & (sessions == sessions[i]) & ~merged)
+        merged[similar] = True
+        metadata = dict(metadatas[i])
+        metadata["created_at"] = min(metadatas[j]["created_at"] for j in similar)
+        metadata["last_recalled"] = max(metadatas[j]["last_recalled"] for j in similar)
+        metadata["merged"] = int(sum(metadatas[j].get("merged", 1) for j in similar))
+        kept.append((i, metadata))
+
+    return (
+        [ids[i] for i, _ in kept],
+        [documents[i] for i, _ in kept],
+        [metadata for _, metadata in kept],
+        [embeddings[i] for i, _ in kept],
+    )
+
+
+def _names(client):
+    return {c if isinstance(c, str) else c.name for c in client.list_collections()}
+
+
+def recover(client):
+    """
+    Finish or undo a swap interrupted between renaming the old collection and the rebuilt one.
+
+    Returns:
+        True if the collection had to be restored.
+    """
+    names = _names(client)
+    if _PREVIOUS not in names:
+        return False
+    previous = client.get_collection(_PREVIOUS)
+    if COLLECTION in names:
+        ## either the swap completed, or the app was started in between and created an empty collection
+        if client.get_collection(COLLECTION).count() or not previous.count():
+            return False
+        client.delete_collection(COLLECTION)
+    previous.modify(name=COLLECTION)
+    print(f"Restored '{COLLECTION}' from an interrupted compaction")
+    return True
+
+
+def _swap(client, collection, rebuilt):
+    """Give the rebuilt collection the live name, keeping the old one until that succeeded."""
+    if _PREVIOUS in _names(client):
+        client.delete_collection(_PREVIOUS)
+    collection.modify(name=_PREVIOUS)
+    try:
+        rebuilt.modify(name=COLLECTION)
+    except Exception:
+        collection.modify(name=COLLECTION)
+        raise
+    client.delete_collection(_PREVIOUS)
+
+
+def compact(persist_directory=None, threshold=None, dry_run=False):
+    """
+    Compact the long term memory of a persist directory.
+
+    Args:
+        persist_directory: Directory holding the chroma database.
+        threshold: Cosine similarity at which memories are merged.
+        dry_run: Report what would happen without changing anything.
+
+    Returns:
+        Dict with the memory counts before and after each step.
+    """
+    persist_directory = persist_directory or settings.PERSIST_DIRECTORY
+    threshold = threshold or settings.MEMORY_MERGE_THRESHOLD
+    client = get_chroma_client(persist_directory)
+    if not dry_run:
+        recover(client)
+    collection = client.get_collection(COLLECTION)
+    now = time.time()
+    stats = {"before": collection.count()}
+
+    if not dry_run:
+        stats["expired_or_evicted"] = apply_retention(
+            collection,
+            ttl_days=settings.MEMORY_TTL_DAYS,
+            max_per_session=settings.MEMORY_MAX_PER_SESSION,
+            max_entries=settings.MEMORY_MAX_ENTRIES,
+            now=now,
+        )
+
+    data = collection.get(include=["documents", "metadatas", "embeddings"])
+    metadatas = [stamp(metadata, now) for metadata in data["metadatas"]]
+    ids, documents, metadatas, embeddings = merge_near_duplicates(
+        data["ids"], data["documents"], metadatas, list(data["embeddings"]), threshold=threshold)
+    stats["merged"] = len(data["ids"]) - len(ids)
+    stats["after"] = len(ids)
+    if dry_run:
+        return stats
+
+    ## build the new index next to the old one, then swap names
+    if _TEMP in _names(client):
+        client.delete_collection(_TEMP)
+    ## the rebuild is where changed index parameters take effect
+    rebuilt = client.create_collection(_TEMP, metadata={**(collection.metadata or {}), **index_params(COLLECTION)})
+    for start in range(0, len(ids), _BATCH):
+        rebuilt.add(
+            ids=ids[start:start + _BATCH],
+            documents=documents[start:start + _BATCH],
+            metadatas=metadatas[start:start + _BATCH],
+            embeddings=embeddings[start:start + _BATCH],
+        )
+    _swap(client, collection, rebuilt)
+    bump_collection_version(persist_directory, COLLECTION)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact the long term memory collection.")
+    parser.add_argument("--persist-directory", default=settings.PERSIST_DIRECTORY)
+    parser.add_argument("--threshold", type=float, default=settings.MEMORY_MERGE_THRESHOLD,
+                        help="cosine similarity at which memories are merged")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change")
+    args = parser.parse_args()
+
+    stats = compact(args.persist_directory, threshold=args.threshold, dry_run=args.dry_run)
+    print(
+        f"{stats['before']} memories, {stats.get('expired_or_evicted', 0)} expired or evicted, "
+        f"{stats['merged']} merged, {stats['after']} kept" + (" (dry run)" if args.dry_run else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Content-addressed embedding cache persisted in SQLite.
+
+Vectors are keyed by sha256(model name, text) so the same chunk is only
+embedded once per model, no matter which document or collection it came
+from. The cache is bounded and evicts the least recently used entries.
+"""
+from array import array
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from config.tracing import span
+from memory.cache import LRUCache
+
+
+def embedding_key(model_name, text):
+    """Return the cache key for a text embedded with a given model."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path, max_entries=200000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys):
+        """
+        Look up cached vectors.
+        
+        Args:
+            keys: Cache keys from embedding_key.
+            
+        Returns:
+            Dict mapping each cached key to its vector.
+        """
+        if not keys:
+            return {}
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            ## sqlite limits the number of bound parameters per statement
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """
+        Store vectors in the cache.
+        
+        Args:
+            items: Iterable of (key, vector) pairs.
+        """
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._size += self._conn.total_changes - before
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop the least recently used entries down to 90% of the limit."""
+        excess = self._size - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def __len__(self):
+        return self._size
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from an EmbeddingCache.
+    
+    Query embeddings are also kept in an in-memory LRU, so a repeated
+    query costs a dictionary lookup instead of a SQLite read.
+    """
+
+    def __init__(self, embeddings, cache, model_name, query_cache_size=2048):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        self.query_cache = LRUCache(query_cache_size)
+
+    def embed_documents(self, texts):
+        with span("embed_documents", "embedding", model=self.model_name, texts=len(texts)) as record:
+            keys = [embedding_key(self.model_name, text) for text in texts]
+            cached = self.cache.get_many(keys)
+
+            ## embed every distinct missing text once
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in cached and key not in missing:
+                    missing[key] = text
+            record.attributes["embedded"] = len(missing)
+            if missing:
+                vectors = self.embeddings.embed_documents(list(missing.values()))
+                new = dict(zip(missing.keys(), vectors))
+                self.cache.put_many(new.items())
+                cached.update(new)
+            return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        vector = self.query_cache.get(text)
+        if vector is not None:
+            return vector
+        with span("embed_query", "embedding", model=self.model_name) as record:
+            key = embedding_key(self.model_name, text)
+            cached = self.cache.get_many([key])
+            record.attributes["cached"] = key in cached
+            if key in cached:
+                vector = cached[key]
+            else:
+                vector = self.embeddings.embed_query(text)
+                self.cache.put_many([(key, vector)])
+        self.query_cache.put(text, vector)
+        return vector
@@ -0,0 +1,130 @@
+"""
+Embedding backends, per-collection index parameters and the per-collection
+embedding dimension check.
+"""
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+
+
+class EmbeddingDimensionError(ValueError):
+    """Raised when a collection is opened with embeddings of the wrong dimension."""
+
+
+class LocalEmbeddings(Embeddings):
+    """In-process sentence-transformers embeddings, no server needed."""
+
+    def __init__(self, model_name):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding backend needs sentence-transformers: pip install sentence-transformers"
+            ) from e
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def embed_documents(self, texts):
+        vectors = self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def create_embeddings(backend, model_name):
+    """
+    Create an embedding client.
+    
+    Args:
+        backend: "ollama" or "local".
+        model_name: Model to embed with.
+        
+    Returns:
+        A LangChain Embeddings instance.
+    """
+    if backend == "ollama":
+        from langchain_ollama import OllamaEmbeddings
+
+        return OllamaEmbeddings(model=model_name)
+    if backend == "local":
+        return LocalEmbeddings(model_name)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def embedding_dimension(embeddings):
+    """Dimension of the vectors produced by an embedding client."""
+    dimension = getattr(embeddings, "dimension", None)
+    if dimension is None:
+        dimension = len(embeddings.embed_query("dimension probe"))
+    return dimension
+
+
+def index_params(name):
+    """
+    HNSW parameters of a collection as chroma metadata.
+    
+    settings.HNSW_PARAMS applies to every collection, settings.INDEX_PARAMS
+    overrides it per collection name. Unset values keep chroma's defaults.
+    """
+    params = {key: value for key, value in settings.HNSW_PARAMS.items() if value is not None}
+    params.update(settings.INDEX_PARAMS.get(name, {}))
+    return {
+        f"hnsw:{key}": value if key == "space" else int(value)
+        for key, value in params.items()
+    }
+
+
+def open_collection(client, name, embeddings, model_key):
+    """
+    Get or create a chroma collection and check it matches the embeddings.
+    
+    The embedding model and vector dimension are recorded in the collection
+    metadata when it is created, and checked every time it is opened. New
+    collections are built with index_params(name).
+    
+    Args:
+        client: chromadb client.
+        name: Collection name.
+        embeddings: Embedding client used to write and query the collection.
+        model_key: "<backend>:<model>" identifying the embedding model.
+        
+    Returns:
+        The chromadb collection.
+        
+    Raises:
+        EmbeddingDimensionError: If the collection holds vectors of another dimension.
+    """
+    dimension = embedding_dimension(embeddings)
+    params = index_params(name)
+    collection = client.get_or_create_collection(
+        name, metadata={"embedding_model": model_key, "embedding_dimension": dimension, **params}
+    )
+    metadata = dict(collection.metadata or {})
+    ## index parameters are fixed when the collection is created
+    changed = [key for key in params if metadata.get(key) != params[key]]
+    if changed:
+        print(f"Warning: collection '{name}' was built with other index parameters ({', '.join(changed)}); "
+              f"rebuild it to apply them")
+    stored = metadata.get("embedding_dimension")
+
+    if stored is None:
+        ## collection created before dimensions were recorded, check an existing vector
+        if collection.count():
+            sample = collection.peek(1)["embeddings"]
+            if sample is not None and len(sample) and len(sample[0]) != dimension:
+                stored = len(sample[0])
+        if stored is None:
+            metadata.update({"embedding_model": model_key, "embedding_dimension": dimension})
+            collection.modify(metadata=metadata)
+            return collection
+
+    if stored != dimension:
+        raise EmbeddingDimensionError(
+            f"Collection '{name}' holds {stored}-dimensional vectors "
+            f"({metadata.get('embedding_model', 'unknown model')}) but {model_key} produces {dimension}. "
+            f"Use the original embedding model or rebuild the collection."
+        )
+    if metadata.get("embedding_model") not in (None, model_key):
+        print(f"Warning: collection '{name}' was embedded with {metadata['embedding_model']}, now using {model_key}")
+    return collection
@@ -0,0 +1,172 @@
+"""
+BM25 inverted index kept alongside a chroma collection.
+
+The index lives in its own SQLite file and is updated in the same
+ingestion path as the vectors, so exact identifiers, error codes and part
+numbers can be found without an embedding round trip.
+"""
+from collections import Counter
+import math
+import os
+import re
+import sqlite3
+import threading
+
+_TOKEN = re.compile(r"\w(?:[\w.\-]*\w)?")
+
+
+def tokenize(text):
+    """
+    Split text into lowercase terms.
+    
+    Compound identifiers such as "ERR-404" or "v1.2" are kept whole and
+    also indexed by their parts, so both "err-404" and "404" match.
+    """
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        terms.append(token)
+        if any(sep in token for sep in ".-"):
+            terms.extend(part for part in re.split(r"[.\-]", token) if part)
+    return terms
+
+
+class LexicalIndex:
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._stats = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, length INTEGER NOT NULL, source TEXT, page INTEGER, ingested_at REAL)"
+        )
+        ## indexes created before chunk metadata was stored lack the filter columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        for column, kind in (("source", "TEXT"), ("page", "INTEGER"), ("ingested_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} {kind}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, chunk_id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_chunk ON postings(chunk_id)")
+        self._conn.commit()
+
+    def add(self, ids, texts, metadatas=None):
+        """
+        Index chunks. Chunks already in the index are left untouched.
+        
+        Args:
+            ids: Chunk ids, matching the ids in the vector store.
+            texts: Chunk texts.
+            metadatas: Optional chunk metadata; source, page and ingested_at
+                are kept for filtered search.
+        """
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock:
+            existing = self._existing(ids)
+            chunk_rows, posting_rows = [], []
+            for id_, text, metadata in zip(ids, texts, metadatas):
+                if id_ in existing:
+                    continue
+                metadata = metadata or {}
+                terms = tokenize(text)
+                chunk_rows.append((id_, len(terms), metadata.get("source"), metadata.get("page"), metadata.get("ingested_at")))
+                posting_rows.extend((term, id_, tf) for term, tf in Counter(terms).items())
+            if not chunk_rows:
+                return
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (id, length, source, page, ingested_at) VALUES (?, ?, ?, ?, ?)", chunk_rows
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            self._conn.commit()
+            self._stats = None
+
+    def delete(self, ids):
+        """Remove chunks from the index."""
+        ids = list(ids)
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                marks = ",".join("?" * len(part))
+                self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({marks})", part)
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({marks})", part)
+            self._conn.commit()
+            self._stats = None
+
+    def _existing(self, ids):
+        found = set()
+        ids = list(ids)
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            rows = self._conn.execute(f"SELECT id FROM chunks WHERE id IN ({','.join('?' * len(part))})", part)
+            found.update(row[0] for row in rows)
+        return found
+
+    def _collection_stats(self):
+        if self._stats is None:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+            self._stats = (count, (total / count) if count else 0.0)
+        return self._stats
+
+    def __len__(self):
+        with self._lock:
+            return self._collection_stats()[0]
+
+    def search(self, query, k=5, source=None, page_start=None, page_end=None, since=None, until=None):
+        """
+        Rank chunks against a query with BM25.
+        
+        Args:
+            query: The search query.
+            k: Number of results to return.
+            source: Only match chunks of this source.
+            page_start: Only match chunks on this page or later.
+            page_end: Only match chunks on this page or earlier.
+            since: Only match chunks ingested at or after this epoch time.
+            until: Only match chunks ingested at or before this epoch time.
+            
+        Returns:
+            List of (chunk id, score, matched term count) tuples, best first.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        conditions, params = [], []
+        for column, op, value in (("source", "=", source), ("page", ">=", page_start), ("page", "<=", page_end),
+                                  ("ingested_at", ">=", since), ("ingested_at", "<=", until)):
+            if value is not None:
+                conditions.append(f"c.{column} {op} ?")
+                params.append(value)
+        where = "".join(f" AND {condition}" for condition in conditions)
+        with self._lock:
+            count, avg_length = self._collection_stats()
+            if not count:
+                return []
+            scores = {}
+            matched = Counter()
+            for term in terms:
+                df = self._conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+                if not df:
+                    continue
+                idf = math.log((count - df + 0.5) / (df + 0.5) + 1.0)
+                rows = self._conn.execute(
+                    "SELECT p.chunk_id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.chunk_id "
+                    f"WHERE p.term = ?{where}", (term, *params)
+                ).fetchall()
+                for chunk_id, tf, length in rows:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / (avg_length or 1.0))
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+                    matched[chunk_id] += 1
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(chunk_id, score, matched[chunk_id]) for chunk_id, score in ranked]
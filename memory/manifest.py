@@ -0,0 +1,101 @@
+"""
+Manifest of the documents in the knowledge base.
+
+For every source the manifest records a fingerprint of the whole file and,
+per page, a hash of the page text plus the ids of the chunks stored for it.
+Re-ingesting a file compares against it to embed only the pages that
+changed and to delete the chunks that no longer belong to any document.
+"""
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+
+## chunk ids include their source since scheme 2, documents recorded with an older scheme are re-ingested in full
+ID_SCHEME = 2
+
+
+def fingerprint(data):
+    """sha256 of a page's text or of a file's raw bytes."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_fingerprint(path, block_size=1 << 20):
+    """sha256 of a file, read in blocks so large files are not loaded at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentManifest:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._documents = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading document manifest: {e}")
+            return {}
+
+    def _save(self):
+        ## write to a temporary file first so a crash never leaves a truncated manifest
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._documents, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, source):
+        """Get the manifest entry of a source, or None if it was never ingested."""
+        with self._lock:
+            return self._documents.get(source)
+
+    def sources(self):
+        with self._lock:
+            return list(self._documents)
+
+    def put(self, source, file_hash, pages):
+        """
+        Record the current state of a source.
+        
+        Args:
+            source: Document identity, usually its file name.
+            file_hash: Fingerprint of the whole file, None if some pages must be retried.
+            pages: Dict of page number -> {"hash": page hash, "chunk_ids": [...]}.
+        """
+        with self._lock:
+            self._documents[source] = {
+                "fingerprint": file_hash,
+                "id_scheme": ID_SCHEME,
+                "updated_at": datetime.now().isoformat(),
+                "pages": {str(page): record for page, record in pages.items()},
+            }
+            self._save()
+
+    def remove(self, source):
+        """Forget a source and return its entry."""
+        with self._lock:
+            entry = self._documents.pop(source, None)
+            if entry is not None:
+                self._save()
+            return entry
+
+    def referenced_ids(self, exclude=None):
+        """Chunk ids used by every source except exclude."""
+        with self._lock:
+            return {
+                chunk_id
+                for source, entry in self._documents.items() if source != exclude
+                for page in entry["pages"].values()
+                for chunk_id in page["chunk_ids"]
+            }
@@ -1,90 +1,164 @@
 from datetime import datetime
-import json
-from langchain.memory import ConversationBufferMemory, VectorStoreRetrieverMemory
+from langchain_core.documents import Document
 from langchain_core.tools import tool
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_chroma import Chroma
+from config import settings
+from config.registry import get_chroma_client, get_embeddings, get_llm, get_memory_writer, get_session_store
+from config.tracing import span
+from memory.cache import LRUCache, collection_version
+from memory.embeddings import open_collection
+from memory.retention import SECONDS_PER_DAY, last_used, recency_score
+from memory.session_store import new_session_id
+from memory.short_term import ShortTermMemory
 import os
+import time
+
+import numpy as np
+
+## long term memory lookups shared by every MemoryManager, keyed by collection version
+_relevant_history_cache = LRUCache(settings.SEARCH_CACHE_SIZE)
 
 class MemoryManager:
-    def __init__(self,model_name="llama3.2:3b", persist_directory="db" ):
+    def __init__(self,model_name=settings.DEFAULT_MODEL, persist_directory=settings.PERSIST_DIRECTORY, session_id=None ):
+        """
+        Args:
+            model_name: Chat model used to summarize older turns.
+            persist_directory: Directory holding the memory databases.
+            session_id: Tenant session of a server. Its long term memories are stored under this id
+                and only they are recalled. Without it the manager owns the whole memory store, as the
+                in-process app does, and starts a new session id per conversation.
+        """
         self.model_name = model_name
         self.persist_directory = persist_directory
+        self.tenant_session = session_id
 
         os.makedirs(self.persist_directory, exist_ok=True)
 
-        ## short term memory
-        self.short_term_memory = ConversationBufferMemory(
-            human_prefix="User",
-            ai_prefix="AI",
-            memory_key="history")
+        ## short term memory, bounded by a token budget with a rolling summary of older turns
+        self.short_term_memory = ShortTermMemory(
+            max_tokens=settings.SHORT_TERM_TOKEN_BUDGET,
+            summary_tokens=settings.SHORT_TERM_SUMMARY_TOKENS,
+            summarizer=self._summarize)
         
         ## long term memory
-        self.embeddings = OllamaEmbeddings(model=self.model_name)
+        self.embeddings = get_embeddings()
         self.long_term_memory  = self._setup_long_term_memory()
+        self.memory_writer = get_memory_writer(self.persist_directory)
 
         ##session metadata
-        self.session_file = os.path.join(self.persist_directory, "session_metadata.json")
+        self.session_store = get_session_store(self.persist_directory)
         self.current_session = self._create_session_metadata()
 
     ## create vector store based storage for long term memory
     def _setup_long_term_memory(self):
-        """Initialize the long term memory using a vector store."""
-        try:
-
-            vector_store = Chroma(
-                collection_name="long_term_memory",
-                persist_directory=self.persist_directory,
-                embedding_function=self.embeddings
-            )
-
-            ## create retriever memory
-            retriever_memory = VectorStoreRetrieverMemory(
-                retriever=vector_store.as_retriever(search_kwargs={"k": 3}),
-                memory_key="relevant_history",
-                return_messages=True
+        """Initialize the long term memory collection."""
+        client = get_chroma_client(self.persist_directory)
+        ## raises if the collection was built with another embedding dimension
+        return open_collection(client, "long_term_memory", self.embeddings, self.embeddings.model_name)
+        
+    def _recall(self, query, k=None):
+        """
+        Search long term memory, ranking by similarity weighted with recency.
+        
+        Args:
+            query: Text to look up.
+            k: Number of memories, defaults to settings.MEMORY_RECALL_K.
+            
+        Returns:
+            List of (score, Document) pairs, best first, with the document ids set.
+        """
+        k = k or settings.MEMORY_RECALL_K
+        with span("memory_recall", "vector", collection="long_term_memory", k=k):
+            count = self.long_term_memory.count()
+            if not count:
+                return []
+            found = self.long_term_memory.query(
+                query_embeddings=[self.embeddings.embed_query(query)],
+                n_results=min(count, k * settings.MEMORY_RECALL_CANDIDATES),
+                where=self._memory_filter(),
+                include=["documents", "metadatas", "distances"],
             )
+        now = time.time()
+        cutoff = now - settings.MEMORY_TTL_DAYS * SECONDS_PER_DAY if settings.MEMORY_TTL_DAYS else None
+        scored = []
+        for memory_id, content, metadata, distance in zip(
+                found["ids"][0], found["documents"][0], found["metadatas"][0], found["distances"][0]):
+            ## expired memories wait for the next sweep, but are never recalled
+            if cutoff and 0 < last_used(metadata) < cutoff:
+                continue
+            scored.append((self._score(distance, metadata, now),
+                           Document(id=memory_id, page_content=content, metadata=metadata or {})))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:k]
+
+    @staticmethod
+    def _score(distance, metadata, now):
+        return recency_score(
+            1.0 / (1.0 + max(distance, 0.0)), metadata, now=now,
+            half_life_days=settings.MEMORY_HALF_LIFE_DAYS,
+            recency_weight=settings.MEMORY_RECENCY_WEIGHT,
+        )
 
-            return retriever_memory
-        except Exception as e:
-            print(f"Error setting up long term memory: {e}")
+    def _recall_pending(self, query):
+        """
+        Score the memories still queued for the writer like stored ones.
+
+        Only the memories recall may return once they are stored are
+        considered, so the same privacy rule applies before and after the write.
+
+        Returns:
+            List of (score, Document) pairs.
+        """
+        pending = self.memory_writer.pending(session_id=self.tenant_session)
+        if not pending:
+            return []
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        vectors = np.asarray(self.embeddings.embed_documents([content for content, _ in pending]), dtype=np.float32)
+        ## the distance chroma reports for the collection's space
+        space = (self.long_term_memory.metadata or {}).get("hnsw:space", "l2")
+        if space == "l2":
+            distances = ((vectors - query_vector) ** 2).sum(axis=1)
+        elif space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+            distances = 1.0 - vectors @ query_vector / np.where(norms == 0, 1.0, norms)
+        else:
+            distances = 1.0 - vectors @ query_vector
+        now = time.time()
+        return [
+            (self._score(float(distance), metadata, now), Document(page_content=content, metadata=metadata))
+            for (content, metadata), distance in zip(pending, distances)
+        ]
+
+    def _memory_filter(self):
+        """Where filter restricting long term memory to this tenant, None when it owns the whole store."""
+        if self.tenant_session is None:
             return None
-        
-    def _create_session_metadata(self):
-        """Create metadata for the current session."""
-        session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-        session_metadata = {}
-        ## load existing session metadata if available
-        if os.path.exists(self.session_file):
-            try:
-                with open(self.session_file, 'r') as f:
-                    session_metadata = json.load(f)
-            except Exception as e:
-                print(f"Error loading session metadata: {e}")
-                session_metadata = {}
-
-        ## create new session metadata
-        session_metadata[session_id] = {
-            "created_at": datetime.now().isoformat(),
-            "messages": 0
-        }
+        return {"session_id": self.tenant_session}
+
+    def _summarize(self, summary, messages):
+        """Fold older messages into the running summary of the conversation."""
+        transcript = "\n".join(
+            f"{'User' if message.role == 'human' else 'AI'}: {message.content}" for message in messages)
+        prompt = (
+            "Update the summary of a conversation between a user and an AI assistant. "
+            "Keep names, numbers, decisions and open questions; drop small talk. "
+            f"Answer with the new summary only, in at most {settings.SHORT_TERM_SUMMARY_TOKENS * 3 // 4} words.\n\n"
+            f"Current summary:\n{summary or '(empty)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+        return get_llm(self.model_name).invoke(prompt).content.strip()
 
-        ## save the session metadata
+    def _create_session_metadata(self):
+        """Create metadata for the current session, a tenant keeps its own id."""
         try:
-            with open(self.session_file, 'w') as f:
-                json.dump(session_metadata, f, indent=4)
+            return self.session_store.create(self.tenant_session)
         except Exception as e:
-            print(f"Error saving session metadata: {e}") 
-
-        return session_id
+            print(f"Error saving session metadata: {e}")
+            return self.tenant_session or new_session_id()
     
     def get_session_metadata(self):
         """Get metadata for the current session."""
         try:
-            with open(self.session_file, 'r') as f:
-                all_session_metadata = json.load(f)
-            return all_session_metadata.get(self.current_session, {})
+            return self.session_store.get(self.current_session)
         except Exception as e:
             print(f"Error retrieving session metadata: {e}")
             return {}
@@ -96,93 +170,71 @@ class MemoryManager:
             self.current_session = self._create_session_metadata()
             return
 
-        ## load all the session metadata
-        try:
-            with open(self.session_file, 'r') as f:
-                all_session_metadata = json.load(f)
-        except Exception as e:
-            print(f"Error loading session metadata: {e}")
-            return
-        
-        ## update the current session metadata
-        if self.current_session in all_session_metadata:
-            all_session_metadata[self.current_session]['messages'] += 1
-
         try:
-            with open(self.session_file, 'w') as f:
-                json.dump(all_session_metadata, f, indent=4)
+            self.session_store.increment(self.current_session)
         except Exception as e:
             print(f"Error updating session metadata: {e}")
 
     def add_to_short_term_memory(self, human_message, ai_message):
         """Add a message to the short term memory."""
         try:
-            self.short_term_memory.save_context(
-                {"input":human_message}, {"output":ai_message})
+            self.short_term_memory.add_turn(human_message, ai_message)
             self._update_session_metadata(1)
         except Exception as e:
             print(f"Error adding to short term memory: {e}")
 
     def add_to_long_term_memory(self, content, metadata=None):
-        if self.long_term_memory:
-            if metadata is None:
-                metadata = {
-                    "timestamp": datetime.now().isoformat(),
-                    "session_id": self.current_session
-                }
+        """Queue a memory for the background writer, it is readable right away through get_relevant_history."""
+        if self.long_term_memory is not None:
+            metadata = {
+                "timestamp": datetime.now().isoformat(),
+                "session_id": self.current_session,
+                **(metadata or {}),
+            }
 
             try:
-                self.long_term_memory.save_context(
-                    {"input": content}, {"output": ""}
-                )
+                self.memory_writer.submit(content, metadata)
+                return content
             except Exception as e:
                 print(f"Error adding to long term memory: {e}")
 
     def add_to_conversation(self,human_input, ai_response):
         """Add a conversation to the memory."""
-        self.short_term_memory.save_context(
-            {"input": human_input}, {"output": ai_response}
-        )
+        self.short_term_memory.add_turn(human_input, ai_response)
         self._update_session_metadata()
               
 
     def get_conversation_history(self, query=None):
-        """Get the conversation history from short term memory in the correct format."""
+        """Get the recent conversation, within the token budget, as (role, content) messages."""
         try:
-            # Get the memory variables
-            memory_vars = self.short_term_memory.load_memory_variables({})
-            history = memory_vars.get('history', '')
-            
-            # Convert string history to message format expected by ChatPromptTemplate
-            if history:
-                # Split the history into individual exchanges
-                exchanges = history.split('\n')
-                chat_history = []
-                
-                for exchange in exchanges:
-                    exchange = exchange.strip()
-                    if exchange.startswith('User:'):
-                        content = exchange.replace('User:', '').strip()
-                        if content:
-                            chat_history.append(("human", content))
-                    elif exchange.startswith('AI:'):
-                        content = exchange.replace('AI:', '').strip()
-                        if content:
-                            chat_history.append(("assistant", content))
-                
-                return {"chat_history": chat_history}
-            
-            return {"chat_history": []}
-            
+            return {"chat_history": self.short_term_memory.window()}
         except Exception as e:
             print(f"Error retrieving conversation history: {e}")
             return {"chat_history": []}
         
     def get_relevant_history(self, query):
-        """Get relevant history from long term memory."""
-        if self.long_term_memory:
+        """Get relevant history from long term memory, cached until the memory is next written."""
+        if self.long_term_memory is not None:
             try:
-                return self.long_term_memory.load_memory_variables({"prompt": query})
+                key = (
+                    os.path.abspath(self.persist_directory),
+                    collection_version(self.persist_directory, "long_term_memory"),
+                    self.tenant_session,
+                    query,
+                )
+                stored = _relevant_history_cache.get(key)
+                if stored is None:
+                    stored = self._recall(query)
+                    _relevant_history_cache.put(key, stored)
+                ## saves still queued for the writer are not searchable yet, but must not be
+                ## missed, so they compete with the stored memories for the top k
+                known = {document.page_content for _, document in stored}
+                pending = [item for item in self._recall_pending(query) if item[1].page_content not in known]
+                recalled = sorted(stored + pending, key=lambda item: item[0], reverse=True)[:settings.MEMORY_RECALL_K]
+
+                ## recall times feed retention, memories that keep being useful are kept
+                self.memory_writer.touch([document.id for _, document in recalled if document.id])
+                return {"relevant_history": [document for _, document in recalled]}
             except Exception as e:
                 print(f"Error retrieving relevant history: {e}")
                 return {}
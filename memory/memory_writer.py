@@ -0,0 +1,303 @@
+"""
+Write-behind queue for long term memory.
+
+Saving a memory only appends it to a queue, so the tool call that saved it
+returns at once. A background thread embeds queued memories in batches,
+drops near-duplicates of memories the same session already stored (or
+queued in the same batch) and writes the rest to chroma with their metadata. Memories still in
+the queue are visible through pending(), so a recall right after a save
+sees it, and the queue is flushed when the process exits. The same thread
+records when memories were recalled and applies the retention policy after
+each write. Memories whose batch fails, e.g. because the embedding server is
+down, are queued again up to a number of attempts before they are dropped.
+"""
+from datetime import datetime
+import atexit
+import hashlib
+import math
+import queue
+import threading
+import time
+
+from config.tracing import span
+from memory.cache import bump_collection_version
+from memory.retention import apply_retention
+
+## seconds between sweeps for memories past their TTL
+_TTL_SWEEP_INTERVAL = 3600
+## seconds to wait before retrying a failed batch, times the attempt number
+_RETRY_DELAY = 1.0
+
+
+def memory_key(content, session_id=None):
+    """Id of a memory, the same text saved by two sessions is two memories."""
+    key = content if session_id is None else f"{session_id}\n{content}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _unit(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(_unit(a), _unit(b)))
+
+
+class MemoryWriter:
+    def __init__(self, collection, embeddings, persist_directory, batch_size=16, batch_wait=0.5,
+                 duplicate_threshold=0.95, ttl_days=0, max_per_session=0, max_entries=0, max_attempts=3):
+        """
+        Args:
+            collection: chromadb collection holding the memories.
+            embeddings: Embedding client used for the collection.
+            persist_directory: Directory whose collection version is bumped after each write.
+            batch_size: Maximum memories embedded and written together.
+            batch_wait: Seconds to wait for more memories before writing a batch.
+            duplicate_threshold: Cosine similarity above which a memory counts as already known.
+            ttl_days: Retention of memories not recalled, 0 keeps them forever.
+            max_per_session: Cap on the memories saved by one session, 0 for no cap.
+            max_entries: Cap on the whole collection, 0 for no cap.
+            max_attempts: Times a memory is tried before it is dropped when its batch fails.
+        """
+        self.collection = collection
+        self.embeddings = embeddings
+        self.persist_directory = persist_directory
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.duplicate_threshold = duplicate_threshold
+        self.ttl_days = ttl_days
+        self.max_per_session = max_per_session
+        self.max_entries = max_entries
+        self.max_attempts = max_attempts
+        self.counters = {"queued": 0, "written": 0, "duplicates": 0, "retried": 0, "failed": 0, "evicted": 0}
+        self._attempts = {}
+        self._touched = {}
+        self._last_sweep = 0.0
+
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, content, metadata=None):
+        """
+        Queue a memory for writing and return immediately.
+
+        Args:
+            content: Text to remember.
+            metadata: Metadata stored with it, a timestamp is added if missing.
+
+        Returns:
+            The id the memory will be stored under.
+        """
+        metadata = dict(metadata or {})
+        now = time.time()
+        metadata.setdefault("timestamp", datetime.now().isoformat())
+        metadata.setdefault("created_at", now)
+        metadata.setdefault("last_recalled", now)
+        memory_id = memory_key(content, metadata.get("session_id"))
+        with self._lock:
+            self._pending[memory_id] = (content, metadata)
+            self.counters["queued"] += 1
+        self._queue.put(memory_id)
+        return memory_id
+
+    def touch(self, ids):
+        """Record that memories were recalled, written with the next batch."""
+        if not ids:
+            return
+        now = time.time()
+        with self._lock:
+            for memory_id in ids:
+                self._touched[memory_id] = now
+        self._queue.put(None)
+
+    def pending(self, session_id=None):
+        """
+        Memories accepted but not written yet.
+
+        Args:
+            session_id: Only return the memories saved by this session.
+
+        Returns:
+            List of (content, metadata) pairs.
+        """
+        with self._lock:
+            return [
+                (content, metadata) for content, metadata in self._pending.values()
+                if session_id is None or metadata.get("session_id") == session_id
+            ]
+
+    def flush(self, timeout=None):
+        """Block until every queued memory has been written or dropped."""
+        if timeout is None:
+            self._queue.join()
+            return
+        done = threading.Event()
+
+        def wait():
+            self._queue.join()
+            done.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            ## gather whatever else arrives shortly, so bursts share one embedding call
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=self.batch_wait))
+                except queue.Empty:
+                    break
+            ## the queued entries this batch writes; a memory submitted again meanwhile is a new
+            ## entry with its own place in the queue, and must survive this batch
+            with self._lock:
+                items = {
+                    memory_id: self._pending[memory_id]
+                    for memory_id in dict.fromkeys(batch) if memory_id is not None and memory_id in self._pending
+                }
+            retry = []
+            try:
+                ## runs outside of any turn, so the span is only exported
+                with span("memory_write", "vector", batch=len(batch)):
+                    self._write(list(items.items()))
+                with self._lock:
+                    for memory_id in items:
+                        self._attempts.pop(memory_id, None)
+            except Exception as e:
+                retry = self._failed(items, e)
+            try:
+                self._write_touches()
+            except Exception as e:
+                print(f"Error updating long term memory: {e}")
+            finally:
+                with self._lock:
+                    for memory_id, item in items.items():
+                        if memory_id not in retry and self._pending.get(memory_id) is item:
+                            del self._pending[memory_id]
+                ## queued again before task_done, so flush() waits for the retries
+                for memory_id in retry:
+                    self._queue.put(memory_id)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _failed(self, items, error):
+        """Count a failed attempt at writing memories and return the ids to retry."""
+        with self._lock:
+            retry, dropped = [], []
+            for memory_id, item in items.items():
+                ## submitted again meanwhile, the new entry is written by its own queue item
+                if self._pending.get(memory_id) is not item:
+                    continue
+                attempts = self._attempts.get(memory_id, 0) + 1
+                if attempts < self.max_attempts:
+                    self._attempts[memory_id] = attempts
+                    retry.append(memory_id)
+                else:
+                    self._attempts.pop(memory_id, None)
+                    dropped.append(self._pending[memory_id][0])
+            self.counters["retried"] += len(retry)
+            self.counters["failed"] += len(dropped)
+        if retry:
+            print(f"Error writing long term memory, retrying {len(retry)} memories: {error}")
+            time.sleep(_RETRY_DELAY * max(self._attempts[memory_id] for memory_id in retry))
+        for content in dropped:
+            print(f"Error writing long term memory, dropped after {self.max_attempts} attempts: {content!r}: {error}")
+        return retry
+
+    def _write(self, items):
+        """Write (memory_id, (content, metadata)) items, skipping duplicates within each session."""
+        if not items:
+            return
+
+        ## exact repeats are already stored under the same id
+        existing = set(self.collection.get(ids=[memory_id for memory_id, _ in items], include=[])["ids"])
+        count = len(items)
+        items = [(memory_id, item) for memory_id, item in items if memory_id not in existing]
+        self.counters["duplicates"] += count - len(items)
+        if not items:
+            return
+
+        vectors = self.embeddings.embed_documents([content for _, (content, _) in items])
+        nearest = self._nearest(vectors, [metadata.get("session_id") for _, (_, metadata) in items])
+
+        keep = []
+        for (memory_id, (content, metadata)), vector, neighbours in zip(items, vectors, nearest):
+            session_id = metadata.get("session_id")
+            known = list(neighbours) + [
+                kept_vector for _, _, kept_metadata, kept_vector in keep if kept_metadata.get("session_id") == session_id
+            ]
+            if any(_cosine(vector, other) >= self.duplicate_threshold for other in known):
+                self.counters["duplicates"] += 1
+                continue
+            keep.append((memory_id, content, metadata, vector))
+        if not keep:
+            return
+
+        self.collection.add(
+            ids=[memory_id for memory_id, _, _, _ in keep],
+            documents=[content for _, content, _, _ in keep],
+            metadatas=[metadata for _, _, metadata, _ in keep],
+            embeddings=[vector for _, _, _, vector in keep],
+        )
+        self.counters["written"] += len(keep)
+        bump_collection_version(self.persist_directory, "long_term_memory")
+        try:
+            self._retain({metadata.get("session_id") for _, _, metadata, _ in keep} - {None})
+        except Exception as e:
+            print(f"Error applying memory retention: {e}")
+
+    def _nearest(self, vectors, sessions):
+        """The closest stored memory of the same session for each vector, as lists of 0 or 1 vectors."""
+        nearest = [[] for _ in vectors]
+        if not self.collection.count():
+            return nearest
+        groups = {}
+        for index, session_id in enumerate(sessions):
+            groups.setdefault(session_id, []).append(index)
+        for session_id, indexes in groups.items():
+            found = self.collection.query(
+                query_embeddings=[vectors[index] for index in indexes], n_results=1,
+                where={"session_id": session_id} if session_id is not None else None,
+                include=["embeddings"],
+            )
+            for index, neighbours in zip(indexes, found["embeddings"]):
+                nearest[index] = [list(neighbour) for neighbour in (neighbours if neighbours is not None else [])]
+        return nearest
+
+    def _retain(self, sessions):
+        ## per-session and total caps only need checking where memories were added
+        now = time.time()
+        sweep = self.ttl_days and now - self._last_sweep >= _TTL_SWEEP_INTERVAL
+        if sweep:
+            self._last_sweep = now
+        evicted = apply_retention(
+            self.collection,
+            ttl_days=self.ttl_days if sweep else 0,
+            max_per_session=self.max_per_session,
+            max_entries=self.max_entries,
+            sessions=sessions,
+            now=now,
+        )
+        if evicted:
+            self.counters["evicted"] += evicted
+            bump_collection_version(self.persist_directory, "long_term_memory")
+
+    def _write_touches(self):
+        ## recall times only affect retention and ranking, so they do not bump the collection version
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            existing = set(self.collection.get(ids=list(touched), include=[])["ids"])
+            ids = [memory_id for memory_id in touched if memory_id in existing]
+            if ids:
+                self.collection.update(ids=ids, metadatas=[{"last_recalled": touched[memory_id]} for memory_id in ids])
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending))
@@ -0,0 +1,248 @@
+"""
+Vector store backed by a memory-mapped array of quantized vectors.
+
+Meant for read-mostly knowledge bases. Vectors are normalized and stored as
+float16, or as int8 with a per-vector scale, in one flat file that is
+appended to on writes and memory-mapped for search, so opening a large
+collection is instant, only the pages a search touches are resident, and
+worker processes share them through the OS page cache. Search is an exact
+NumPy dot product over the matrix in blocks followed by a top-k selection,
+so there is no index to build or tune. Chunk texts and metadata live in a
+SQLite table next to the vectors, and the BM25 index is shared with the
+chroma backend's code path, so hybrid search works the same way.
+
+Deleted chunks are only marked as deleted; their rows are skipped by
+search and the file keeps its size until the collection is rebuilt.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from langchain_core.documents import Document
+
+from config import settings
+from config.registry import get_embeddings, get_lexical_index
+from memory.embeddings import EmbeddingDimensionError, embedding_dimension
+from memory.vector_store import VectorStore
+
+## rows scored per matrix product, bounds the float32 copy of a block
+_BLOCK_ROWS = 65536
+
+
+class MmapVectorStore(VectorStore):
+    def __init__(self, collection_name="documents", persist_directory=settings.PERSIST_DIRECTORY, dtype=None,
+                 embeddings=None):
+        """
+        Args:
+            collection_name: Name of the collection.
+            persist_directory: Directory holding the collection's files.
+            dtype: "float16" or "int8", defaults to settings.MMAP_DTYPE. Fixed when the collection is created.
+            embeddings: Embedding client, defaults to the shared one from the registry.
+        """
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.directory = os.path.join(persist_directory, f"mmap_{collection_name}")
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self.embeddings = embeddings or get_embeddings()
+        self.dimension = embedding_dimension(self.embeddings)
+
+        self._db = sqlite3.connect(os.path.join(self.directory, "chunks.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT, "
+            "source TEXT, page INTEGER, ingested_at REAL, deleted INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_id ON chunks(id, deleted)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source, page)")
+        self._db.commit()
+        self.dtype = np.dtype(self._check_info(dtype or settings.MMAP_DTYPE))
+
+        self._vectors_path = os.path.join(self.directory, "vectors.bin")
+        self._scales_path = os.path.join(self.directory, "scales.bin")
+        self._rows = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+        ## rows written to the vector file but not committed to sqlite (a crash mid-write) are ignored
+        self._alive = np.zeros(self._rows, dtype=bool)
+        alive = [row for (row,) in self._db.execute("SELECT row FROM chunks WHERE deleted = 0")]
+        self._alive[alive] = True
+        self._map()
+
+        ## the lexical index is named after the backend so it never mixes with a chroma collection's
+        self.lexical_index = get_lexical_index(f"mmap_{self.collection_name}", self.persist_directory)
+
+    def _check_info(self, dtype):
+        """Record dimension, model and dtype on creation, and check them on every open."""
+        info = dict(self._db.execute("SELECT key, value FROM info").fetchall())
+        if not info:
+            info = {"dimension": str(self.dimension), "embedding_model": self.embeddings.model_name, "dtype": dtype}
+            self._db.executemany("INSERT INTO info (key, value) VALUES (?, ?)", info.items())
+            self._db.commit()
+        if int(info["dimension"]) != self.dimension:
+            raise EmbeddingDimensionError(
+                f"Collection '{self.collection_name}' holds {info['dimension']}-dimensional vectors "
+                f"({info['embedding_model']}) but {self.embeddings.model_name} produces {self.dimension}. "
+                f"Use the original embedding model or rebuild the collection."
+            )
+        if info["dtype"] not in ("float16", "int8"):
+            raise ValueError(f"Unsupported vector dtype: {info['dtype']}")
+        return info["dtype"]
+
+    def _map(self):
+        """(Re)map the vector file after it grew."""
+        self._vectors = None
+        self._scales = None
+        if self._rows:
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(self._rows, self.dimension))
+            if self.dtype == np.int8:
+                self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(self._rows,))
+
+    def _quantize(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if self.dtype == np.float16:
+            return vectors.astype(np.float16), None
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    ## storage hooks used by VectorStore.add_documents, delete and search
+    def _cache_namespace(self):
+        return os.path.abspath(self.directory)
+
+    def _existing_ids(self, ids):
+        with self._lock:
+            found = set()
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                found.update(id_ for (id_,) in self._db.execute(
+                    f"SELECT id FROM chunks WHERE deleted = 0 AND id IN ({','.join('?' * len(part))})", part))
+            return found
+
+    def _store(self, ids, vectors, texts, metadatas):
+        quantized, scales = self._quantize(vectors)
+        with self._lock:
+            start = self._rows
+            with open(self._vectors_path, "ab") as f:
+                ## the file may hold a partial write from a crash, so append at the committed end
+                f.truncate(start * self.dimension * self.dtype.itemsize)
+                f.write(quantized.tobytes())
+            if scales is not None:
+                with open(self._scales_path, "ab") as f:
+                    f.truncate(start * 4)
+                    f.write(scales.tobytes())
+            rows = []
+            for offset, (id_, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                metadata = metadata or {}
+                rows.append((
+                    start + offset, id_, text, json.dumps(metadata),
+                    metadata.get("source"), metadata.get("page"), metadata.get("ingested_at"),
+                ))
+            self._db.executemany(
+                "INSERT INTO chunks (row, id, text, metadata, source, page, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+            self._rows = start + len(ids)
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self._map()
+
+    def _remove(self, ids):
+        with self._lock:
+            placeholders = ",".join("?" * len(ids))
+            rows = [row for (row,) in self._db.execute(
+                f"SELECT row FROM chunks WHERE deleted = 0 AND id IN ({placeholders})", ids)]
+            self._db.execute(f"UPDATE chunks SET deleted = 1 WHERE id IN ({placeholders})", ids)
+            self._db.commit()
+            self._alive[rows] = False
+
+    def _candidate_rows(self, filters):
+        """Rows matching the filters, or None when every live row is a candidate."""
+        conditions, params = [], []
+        for key, column, op in (("source", "source", "="), ("page_start", "page", ">="), ("page_end", "page", "<="),
+                                ("since", "ingested_at", ">="), ("until", "ingested_at", "<=")):
+            if filters[key] is not None:
+                conditions.append(f"{column} {op} ?")
+                params.append(filters[key])
+        if not conditions:
+            return None
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT row FROM chunks WHERE deleted = 0 AND {' AND '.join(conditions)}", params
+            ).fetchall()
+        return np.fromiter((row for (row,) in rows), dtype=np.int64)
+
+    def _vector_search(self, query, k, filters):
+        if not self._rows:
+            return []
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+
+        with self._lock:
+            vectors, scales, alive, total = self._vectors, self._scales, self._alive, self._rows
+        candidates = self._candidate_rows(filters)
+        if candidates is not None and not len(candidates):
+            return []
+
+        best_rows, best_scores = [], []
+        count = total if candidates is None else len(candidates)
+        for start in range(0, count, _BLOCK_ROWS):
+            if candidates is None:
+                rows = np.arange(start, min(start + _BLOCK_ROWS, total))
+                block = vectors[start:start + _BLOCK_ROWS]
+            else:
+                rows = candidates[start:start + _BLOCK_ROWS]
+                block = vectors[rows]
+            scores = block.astype(np.float32) @ query_vector
+            if scales is not None:
+                scores *= scales[rows]
+            scores[~alive[rows]] = -np.inf
+            ## keep the block's top k, the final top k is picked from the survivors
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                rows, scores = rows[top], scores[top]
+            best_rows.append(rows)
+            best_scores.append(scores)
+
+        rows = np.concatenate(best_rows)
+        scores = np.concatenate(best_scores)
+        order = np.argsort(-scores)[:k]
+        order = order[np.isfinite(scores[order])]
+        return self._fetch_rows([int(row) for row in rows[order]])
+
+    def _fetch_rows(self, rows):
+        if not rows:
+            return []
+        with self._lock:
+            found = self._db.execute(
+                f"SELECT row, id, text, metadata FROM chunks WHERE row IN ({','.join('?' * len(rows))})", rows
+            ).fetchall()
+        by_row = {
+            row: Document(id=id_, page_content=text, metadata=json.loads(metadata) if metadata else {})
+            for row, id_, text, metadata in found
+        }
+        return [by_row[row] for row in rows if row in by_row]
+
+    def _fetch(self, ids):
+        """Load documents by id, keeping the order of ids."""
+        if not ids:
+            return []
+        ids = list(ids)
+        with self._lock:
+            found = self._db.execute(
+                f"SELECT id, text, metadata FROM chunks WHERE deleted = 0 AND id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        by_id = {
+            id_: Document(id=id_, page_content=text, metadata=json.loads(metadata) if metadata else {})
+            for id_, text, metadata in found
+        }
+        return [by_id[id_] for id_ in ids if id_ in by_id]
+
+    def count(self):
+        """Number of live chunks."""
+        return int(self._alive.sum())
@@ -0,0 +1,129 @@
+"""
+Retention and recall scoring for the long term memory collection.
+
+Memories carry created_at and last_recalled timestamps (seconds since the
+epoch) in their metadata. Retention drops memories past their TTL, keeps at
+most a fixed number per session and overall, evicting the least recently
+recalled first, so the collection and with it recall latency stay bounded.
+Recall ranks candidates by similarity weighted with how recently they were
+created or used.
+"""
+from datetime import datetime
+import time
+
+SECONDS_PER_DAY = 86400
+
+
+def last_used(metadata):
+    """When a memory was last recalled, or created if never recalled. Legacy memories count as oldest."""
+    metadata = metadata or {}
+    return max(metadata.get("last_recalled", 0), metadata.get("created_at", 0))
+
+
+def stamp(metadata, now):
+    """Give memories saved before retention existed the timestamps retention relies on."""
+    metadata = dict(metadata or {})
+    if "created_at" not in metadata:
+        try:
+            metadata["created_at"] = datetime.fromisoformat(metadata["timestamp"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            metadata["created_at"] = now
+    metadata.setdefault("last_recalled", metadata["created_at"])
+    return metadata
+
+
+def recency_score(similarity, metadata, now=None, half_life_days=30, recency_weight=0.3):
+    """
+    Blend similarity with an exponential recency decay.
+
+    Args:
+        similarity: Similarity of the memory to the query, higher is better.
+        metadata: Metadata of the memory.
+        now: Current time, defaults to time.time().
+        half_life_days: Age at which the recency factor halves.
+        recency_weight: Share of the score given to recency, 0 ranks by similarity only.
+
+    Returns:
+        The weighted score.
+    """
+    now = time.time() if now is None else now
+    used = last_used(metadata)
+    if not used or half_life_days <= 0:
+        decay = 0.0 if used == 0 else 1.0
+    else:
+        decay = 0.5 ** (max(0.0, now - used) / (half_life_days * SECONDS_PER_DAY))
+    return similarity * ((1 - recency_weight) + recency_weight * decay)
+
+
+def _least_recently_used(ids, metadatas, keep):
+    ranked = sorted(zip(ids, metadatas), key=lambda item: last_used(item[1]))
+    return [memory_id for memory_id, _ in ranked[: max(0, len(ranked) - keep)]]
+
+
+def apply_retention(collection, ttl_days=0, max_per_session=0, max_entries=0, sessions=None, now=None):
+    """
+    Delete memories that fall outside the retention policy.
+
+    Args:
+        collection: chromadb collection holding the memories.
+        ttl_days: Memories not recalled for this many days are deleted, 0 keeps them forever.
+            Memories without timestamps are stamped first, from their ISO timestamp if they have one.
+        max_per_session: Cap on the memories of one session, 0 for no cap.
+        max_entries: Cap on the whole collection, evicted down to 90% when exceeded, 0 for no cap.
+        sessions: Only check the per-session cap of these sessions, None checks every session.
+        now: Current time, defaults to time.time().
+
+    Returns:
+        Number of deleted memories.
+    """
+    now = time.time() if now is None else now
+    deleted = 0
+
+    if ttl_days:
+        ## the where clause below never matches memories missing either field, so backfill them
+        everything = collection.get(include=["metadatas"])
+        legacy = [
+            (memory_id, stamp(metadata, now))
+            for memory_id, metadata in zip(everything["ids"], everything["metadatas"])
+            if "created_at" not in (metadata or {}) or "last_recalled" not in (metadata or {})
+        ]
+        if legacy:
+            collection.update(ids=[memory_id for memory_id, _ in legacy], metadatas=[metadata for _, metadata in legacy])
+
+        cutoff = now - ttl_days * SECONDS_PER_DAY
+        expired = collection.get(
+            where={"$and": [{"created_at": {"$lt": cutoff}}, {"last_recalled": {"$lt": cutoff}}]}, include=[]
+        )["ids"]
+        if expired:
+            collection.delete(ids=expired)
+            deleted += len(expired)
+
+    if max_per_session:
+        if sessions is None:
+            everything = collection.get(include=["metadatas"])
+            by_session = {}
+            for memory_id, metadata in zip(everything["ids"], everything["metadatas"]):
+                session_id = (metadata or {}).get("session_id")
+                if session_id is not None:
+                    ids, metadatas = by_session.setdefault(session_id, ([], []))
+                    ids.append(memory_id)
+                    metadatas.append(metadata)
+            groups = list(by_session.values())
+        else:
+            groups = []
+            for session_id in set(sessions):
+                found = collection.get(where={"session_id": session_id}, include=["metadatas"])
+                groups.append((found["ids"], found["metadatas"]))
+        for ids, metadatas in groups:
+            if len(ids) > max_per_session:
+                evict = _least_recently_used(ids, metadatas, max_per_session)
+                collection.delete(ids=evict)
+                deleted += len(evict)
+
+    if max_entries and collection.count() > max_entries:
+        everything = collection.get(include=["metadatas"])
+        evict = _least_recently_used(everything["ids"], everything["metadatas"], int(max_entries * 0.9))
+        collection.delete(ids=evict)
+        deleted += len(evict)
+
+    return deleted
@@ -0,0 +1,137 @@
+"""
+Session metadata persisted in SQLite.
+
+Sessions are rows indexed by their id, so creating a session or reading
+its metadata costs the same with ten sessions as with ten thousand. Message
+counters are buffered in memory and written in one transaction per batch;
+WAL mode keeps concurrent Streamlit sessions from clobbering each other and
+a crash can lose at most the last unflushed batch of counts.
+"""
+from datetime import datetime
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from config.tracing import span
+
+
+def new_session_id():
+    """Readable, sortable and unique even for sessions created in the same second."""
+    return f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+class SessionStore:
+    def __init__(self, path, flush_every=20, flush_interval=5.0):
+        """
+        Args:
+            path: SQLite file holding the sessions.
+            flush_every: Buffered counter updates that trigger a write.
+            flush_interval: Seconds after which buffered updates are written anyway.
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, created_at TEXT NOT NULL, "
+            "messages INTEGER NOT NULL DEFAULT 0, updated_at TEXT)"
+        )
+        self._conn.commit()
+        self._migrate_json(os.path.join(directory, "session_metadata.json"))
+        atexit.register(self.flush)
+
+    def _migrate_json(self, json_path):
+        """Import the sessions of the old session_metadata.json once, then set the file aside."""
+        if not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, 'r') as f:
+                sessions = json.load(f)
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO sessions (session_id, created_at, messages) VALUES (?, ?, ?)",
+                    [
+                        (session_id, meta.get("created_at", ""), meta.get("messages", 0))
+                        for session_id, meta in sessions.items()
+                    ],
+                )
+                self._conn.commit()
+            os.replace(json_path, json_path + ".migrated")
+        except Exception as e:
+            print(f"Error migrating session metadata: {e}")
+
+    def create(self, session_id=None):
+        """Create a session and return its id."""
+        session_id = session_id or new_session_id()
+        with span("session_create", "metadata"), self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, created_at) VALUES (?, ?)",
+                (session_id, datetime.now().isoformat()),
+            )
+            self._conn.commit()
+        return session_id
+
+    def increment(self, session_id, messages=1):
+        """Count messages of a session. Writes are batched, see flush."""
+        with self._lock:
+            self._pending[session_id] = self._pending.get(session_id, 0) + messages
+            self._pending_count += 1
+            due = (
+                self._pending_count >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered counter updates in one transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            now = datetime.now().isoformat()
+            try:
+                with span("session_flush", "metadata", sessions=len(self._pending)):
+                    self._conn.executemany(
+                        "UPDATE sessions SET messages = messages + ?, updated_at = ? WHERE session_id = ?",
+                        [(count, now, session_id) for session_id, count in self._pending.items()],
+                    )
+                    self._conn.commit()
+                self._pending = {}
+                self._pending_count = 0
+                self._last_flush = time.monotonic()
+            except Exception as e:
+                print(f"Error writing session metadata: {e}")
+
+    def get(self, session_id):
+        """Metadata of a session including counts not yet written, or {} if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, messages, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return {}
+            return {
+                "created_at": row[0],
+                "messages": row[1] + self._pending.get(session_id, 0),
+                "updated_at": row[2],
+            }
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
@@ -0,0 +1,160 @@
+"""
+Token-bounded short term memory.
+
+Messages are kept as structured objects with their token counts, so building
+the prompt history is a walk over the newest messages instead of rendering
+and re-parsing the whole conversation. Once the stored turns exceed the token
+budget, the oldest ones are folded into a rolling summary on a background
+thread, so prompt size and per-turn work stay flat however long a session
+runs.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+import threading
+
+## summaries are short LLM calls, a couple of workers serve every session in the process
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summarize")
+
+
+def count_tokens(text):
+    """Approximate token count, about four characters per token for English text."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def _truncate(text, limit):
+    """Cut text to at most limit characters, at the last word boundary."""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    if not text[limit].isspace() and " " in cut:
+        cut = cut[: cut.rindex(" ")]
+    return cut.rstrip()
+
+
+@dataclass
+class Message:
+    role: str
+    content: str
+    tokens: int = 0
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    def __post_init__(self):
+        if not self.tokens:
+            self.tokens = count_tokens(self.content)
+
+
+class ShortTermMemory:
+    def __init__(self, max_tokens=2000, summary_tokens=300, summarizer=None):
+        """
+        Args:
+            max_tokens: Token budget of the history handed to the prompt, summary included.
+            summary_tokens: Upper bound on the rolling summary.
+            summarizer: Optional callable(summary, messages) returning the new summary.
+                Without one, turns beyond the budget are simply dropped.
+        """
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.messages = []
+        self.summary = ""
+        self.first_question = None
+        self._stored_tokens = 0
+        self._pending = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def add(self, role, content):
+        with self._lock:
+            message = Message(role, content)
+            self.messages.append(message)
+            self._stored_tokens += message.tokens
+            if role == "human" and self.first_question is None:
+                self.first_question = content
+            self._maybe_summarize()
+
+    def add_turn(self, human_message, ai_message):
+        self.add("human", human_message)
+        self.add("assistant", ai_message)
+
+    def window(self):
+        """
+        The history to put in a prompt.
+
+        Returns:
+            List of (role, content) tuples: the summary of older turns as a
+            system message, then the newest messages that fit the budget.
+        """
+        with self._lock:
+            history = []
+            budget = self.max_tokens
+            if self.summary:
+                budget -= count_tokens(self.summary)
+            for message in reversed(self.messages):
+                if message.tokens > budget:
+                    break
+                budget -= message.tokens
+                history.append((message.role, message.content))
+            history.reverse()
+            if self.summary:
+                history.insert(0, ("system", f"Summary of the earlier conversation: {self.summary}"))
+            return history
+
+    def clear(self):
+        with self._lock:
+            self.messages = []
+            self.summary = ""
+            self.first_question = None
+            self._stored_tokens = 0
+            ## a summary still running belongs to the old conversation
+            self._generation += 1
+            self._pending = None
+
+    def wait(self, timeout=None):
+        """Block until a running summarization finished. Mainly useful for tests and benchmarks."""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout=timeout)
+
+    def _maybe_summarize(self):
+        ## called with the lock held
+        if self._stored_tokens <= self.max_tokens or self._pending is not None:
+            return
+
+        ## fold the oldest turns until the rest fill half of the budget, so this runs every few turns
+        keep = self.max_tokens // 2
+        remaining = self._stored_tokens
+        count = 0
+        while count < len(self.messages) - 1 and remaining > keep:
+            remaining -= self.messages[count].tokens
+            count += 1
+        old = self.messages[:count]
+
+        if self.summarizer is None:
+            self._drop(old)
+            return
+        self._pending = _summary_executor.submit(self._summarize, self.summary, old, self._generation)
+
+    def _summarize(self, summary, old, generation):
+        try:
+            new_summary = _truncate(self.summarizer(summary, old), self.summary_tokens * 4)
+        except Exception as e:
+            ## keep the turns, the next message past the budget retries the summary
+            print(f"Error summarizing conversation: {e}")
+            with self._lock:
+                self._pending = None
+            return
+
+        with self._lock:
+            self._pending = None
+            if generation != self._generation:
+                return
+            self.summary = new_summary
+            self._drop(old)
+            ## turns kept arriving while the summary was written
+            self._maybe_summarize()
+
+    def _drop(self, old):
+        ## called with the lock held; old is always a prefix of self.messages
+        del self.messages[: len(old)]
+        self._stored_tokens -= sum(message.tokens for message in old)
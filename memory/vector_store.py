@@ -1,56 +1,371 @@
-import chromadb
-from langchain_ollama import OllamaEmbeddings
-from langchain_chroma import Chroma
-import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from langchain_core.documents import Document
+from datetime import datetime
+import hashlib
+import re
+import time
+from config import settings
+from config.registry import get_chroma_client, get_embeddings, get_lexical_index
+from config.tracing import span
+from memory.cache import LRUCache, bump_collection_version, collection_version
+from memory.embeddings import open_collection
+from memory.lexical_index import tokenize
+
+def chunk_id(text, source=None):
+    """
+    Id of a chunk, derived from its source document and its text.
+
+    A chunk repeated within a document is stored once, but each document
+    keeps its own copy with its own metadata, so source-filtered searches
+    find it and deleting one document's chunks never affects another's.
+    Embeddings stay content-addressed in the embedding cache, so the copy
+    is not embedded twice.
+    """
+    key = text if source is None else f"{source}\n{text}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+_IDENTIFIER = re.compile(r"^(?=.*\d)[\w.\-]+$|^[\w]*[_.\-][\w.\-]+$|^[A-Z][A-Z0-9]{2,}$")
+
+
+def is_exact_term_query(query):
+    """True for queries made only of identifiers, error codes, part numbers or quoted strings."""
+    query = query.strip()
+    if len(query) > 2 and query[0] == query[-1] == '"':
+        return True
+    words = query.split()
+    return bool(words) and len(words) <= 4 and all(_IDENTIFIER.match(word.strip("?,;:!()'\"")) for word in words)
+
+
+## search results shared by every VectorStore in the process, keyed by collection version
+_search_cache = LRUCache(settings.SEARCH_CACHE_SIZE)
+
 
 class VectorStore:
-    def __init__(self,collection_name="documents",persist_directory="db"):
+    def __init__(self,collection_name="documents",persist_directory=settings.PERSIST_DIRECTORY, embeddings=None):
         self.collection_name = collection_name
         self.persist_directory = persist_directory
 
-        ## intilialize ollama embeddings
-        self.embeddings = OllamaEmbeddings(model="llama3.2:3b")
+        ## shared embeddings and chroma client, embeddings can be injected for benchmarks
+        self.embeddings = embeddings or get_embeddings()
+        self.client = get_chroma_client(self.persist_directory)
 
-        ## create persist directory if it does not exist
-        if not os.path.exists(self.persist_directory):
-            os.makedirs(self.persist_directory)
+        ## open the collection first so a dimension mismatch fails before anything is written
+        self.collection = open_collection(self.client, self.collection_name, self.embeddings, self.embeddings.model_name)
 
-        ## initialize vector store
-        self.vector_store = Chroma(
-            collection_name=self.collection_name,
-            persist_directory=self.persist_directory,
-            embedding_function=self.embeddings
-        )
+        ## lexical index updated in the same write path as the vectors
+        self.lexical_index = get_lexical_index(self.collection_name, self.persist_directory)
+        if not len(self.lexical_index) and self.collection.count():
+            self._backfill_lexical_index()
+
+    def _backfill_lexical_index(self, batch_size=1000):
+        """Index chunks that were stored before the lexical index existed."""
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.lexical_index.add(page["ids"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+
+    ## storage hooks, overridden by other backends such as MmapVectorStore
+    def _cache_namespace(self):
+        return self.collection.id
+
+    def _existing_ids(self, ids):
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+
+    def _store(self, ids, vectors, texts, metadatas):
+        ## chroma rejects empty metadata dicts, so omit them when no chunk has any
+        metadatas = metadatas if any(metadatas) else None
+        self.collection.add(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+    def _remove(self, ids):
+        self.collection.delete(ids=ids)
 
     ## add documents to vector store
-    def add_documents(self, documents,metadata=None):
+    def add_documents(self, documents,metadata=None, batch_size=None, max_workers=None, progress=None):
         """
         Add documents to the vector store.
         
+        Documents are embedded in batches by a bounded pool of concurrent
+        embedding requests, and each batch is written to chroma as soon as
+        its embeddings are ready. A batch that fails is retried chunk by
+        chunk so one bad chunk does not lose the rest of the file. Chunks
+        are stored under ids derived from their source and text (see chunk_id),
+        and chunks already in the collection are skipped without being embedded again.
+        
         Args:
-            documents: List of documents to add.
+            documents: List (or any iterable) of texts or Document objects to add.
+            metadata: Optional list (or iterable) of metadata dicts, one per
+                text, stored with each vector. Documents carry their own
+                metadata. Values must be str, int, float or bool.
+            batch_size: Chunks per embedding request.
+            max_workers: Maximum concurrent embedding requests.
+            progress: Optional callable(done, total) called after each batch is stored.
+                total is None when documents has no length.
+            
+        Returns:
+            Dict with the number of chunks added, skipped and failed, the ids
+            of the failed chunks, and the seconds spent embedding them and
+            writing them to the store.
         """
+        batch_size = batch_size or settings.EMBED_BATCH_SIZE
+        max_workers = max_workers or settings.EMBED_WORKERS
+        total = len(documents) if hasattr(documents, "__len__") else None
+        stats = {"added": 0, "skipped": 0, "failed": 0, "failed_ids": [], "embed_seconds": 0.0, "store_seconds": 0.0}
+
+        seen = set()
+        if metadata is not None:
+            items = zip(documents, metadata)
+        else:
+            items = ((doc.page_content, doc.metadata or None) if isinstance(doc, Document) else (doc, None) for doc in documents)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed") as pool:
+            pending = set()
+            ## keep at most two batches per worker in flight so memory stays bounded
+            for batch in self._batches(items, batch_size):
+                ids, texts, metadatas = self._new_chunks(batch, seen)
+                stats["skipped"] += len(batch) - len(texts)
+                if not texts:
+                    if progress:
+                        progress(stats["added"] + stats["skipped"] + stats["failed"], total)
+                    continue
+                pending.add(pool.submit(self._embed_batch, ids, texts, metadatas))
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._store_batches(done, stats, total, progress)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self._store_batches(done, stats, total, progress)
+
+        print(f"Added {stats['added']} documents to the vector store "
+              f"({stats['skipped']} already stored, {stats['failed']} failed).")
+        return stats
+
+    @staticmethod
+    def _batches(documents, batch_size):
+        iterator = iter(documents)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _new_chunks(self, batch, seen):
+        """Drop chunks repeated within this call or already in the collection."""
+        ids, texts, metadatas = [], [], []
+        for text, metadata in batch:
+            id_ = chunk_id(text, (metadata or {}).get("source"))
+            if id_ not in seen:
+                seen.add(id_)
+                ids.append(id_)
+                texts.append(text)
+                metadatas.append(metadata)
+        if ids:
+            existing = self._existing_ids(ids)
+            if existing:
+                kept = [(i, t, m) for i, t, m in zip(ids, texts, metadatas) if i not in existing]
+                ids = [i for i, _, _ in kept]
+                texts = [t for _, t, _ in kept]
+                metadatas = [m for _, _, m in kept]
+        return ids, texts, metadatas
+
+    def _embed_batch(self, ids, batch, metadatas):
+        """Embed one batch, falling back to one chunk at a time if the batch fails."""
+        start = time.perf_counter()
         try:
-            self.vector_store.add_texts(texts=documents)
-            print(f"Added {len(documents)} documents to the vector store.")
+            vectors = self.embeddings.embed_documents(batch)
+            failed = []
         except Exception as e:
-            print(f"Error adding documents: {e}")
+            print(f"Error embedding batch, retrying chunks individually: {e}")
+            kept_ids, kept, kept_metadatas, vectors, failed = [], [], [], [], []
+            for id_, text, metadata in zip(ids, batch, metadatas):
+                try:
+                    vectors.append(self.embeddings.embed_documents([text])[0])
+                    kept_ids.append(id_)
+                    kept.append(text)
+                    kept_metadatas.append(metadata)
+                except Exception as e:
+                    print(f"Error embedding chunk: {e}")
+                    failed.append(id_)
+            ids, batch, metadatas = kept_ids, kept, kept_metadatas
+        return ids, batch, metadatas, vectors, failed, time.perf_counter() - start
+
+    def _store_batches(self, futures, stats, total, progress):
+        for future in futures:
+            ids, texts, metadatas, vectors, failed, embed_seconds = future.result()
+            stats["embed_seconds"] += embed_seconds
+            stats["failed"] += len(failed)
+            stats["failed_ids"].extend(failed)
+            if texts:
+                start = time.perf_counter()
+                try:
+                    self._store(ids, vectors, texts, metadatas)
+                    self.lexical_index.add(ids, texts, metadatas)
+                    bump_collection_version(self.persist_directory, self.collection_name)
+                    stats["added"] += len(texts)
+                except Exception as e:
+                    print(f"Error adding documents: {e}")
+                    stats["failed"] += len(texts)
+                    stats["failed_ids"].extend(ids)
+                stats["store_seconds"] += time.perf_counter() - start
+            if progress:
+                progress(stats["added"] + stats["skipped"] + stats["failed"], total)
+
+    ## delete documents from the vector store
+    def delete(self, ids, batch_size=500):
+        """
+        Delete documents by id.
+        
+        Args:
+            ids: Ids of the chunks to delete.
+            
+        Returns:
+            Number of ids deleted.
+        """
+        ids = list(ids)
+        for i in range(0, len(ids), batch_size):
+            self._remove(ids[i:i + batch_size])
+        self.lexical_index.delete(ids)
+        bump_collection_version(self.persist_directory, self.collection_name)
+        return len(ids)
 
     ## search for the documents in the vector store
-    def search(self, query, k=5):
+    def search(self, query, k=5, mode=None, source=None, pages=None, since=None, until=None):
         """
         Search for documents in the vector store.
         
         Args:
             query: The search query.
             k: Number of results to return.
+            mode: "vector", "lexical" or "hybrid", defaults to settings.SEARCH_MODE.
+                Hybrid fuses both rankings with reciprocal-rank fusion, and
+                answers exact-term queries (identifiers, error codes, quoted
+                strings) from the lexical index alone when it has a match.
+            source: Only search chunks of this source document.
+            pages: Optional (first, last) page range, either end may be None.
+            since: Only search chunks ingested at or after this datetime or epoch time.
+            until: Only search chunks ingested at or before this datetime or epoch time.
         
         Returns:
-            List of search results.
+            List of search results. Repeated searches are served from an
+            LRU cache until the collection is next written to.
         """
+        mode = mode or settings.SEARCH_MODE
+        filters = self._filters(source, pages, since, until)
+        key = (
+            self._cache_namespace(),
+            collection_version(self.persist_directory, self.collection_name),
+            query, k, mode, tuple(sorted(filters.items())),
+        )
+        with span("vector_search", "vector", collection=self.collection_name, mode=mode, k=k) as record:
+            results = _search_cache.get(key)
+            record.attributes["cached"] = results is not None
+            if results is None:
+                results = self._search(query, k, mode, filters)
+                if results:
+                    _search_cache.put(key, results)
+            record.attributes["results"] = len(results)
+        return list(results)
+
+    def _search(self, query, k, mode, filters):
         try:
-            results = self.vector_store.similarity_search(query, k=k)
-            return results
+            if mode == "vector":
+                return self._vector_search(query, k, filters)
+            if mode == "lexical":
+                return self._lexical_search(query, k, filters)
+
+            if is_exact_term_query(query):
+                hits = self.lexical_index.search(query, k, **filters)
+                terms = len(set(tokenize(query)))
+                ## only skip the embedder when the best hit contains every query term
+                if hits and hits[0][2] >= terms:
+                    return self._fetch([chunk_id for chunk_id, _, _ in hits])
+
+            candidates = k * 4
+            rankings = [
+                [doc.id for doc in self._vector_search(query, candidates, filters)],
+                [chunk_id for chunk_id, _, _ in self.lexical_index.search(query, candidates, **filters)],
+            ]
+            scores = {}
+            for ranking in rankings:
+                for rank, id_ in enumerate(ranking):
+                    scores[id_] = scores.get(id_, 0.0) + 1.0 / (settings.RRF_K + rank + 1)
+            fused = sorted(scores, key=scores.get, reverse=True)[:k]
+            return self._fetch(fused)
         except Exception as e:
             print(f"Error searching documents: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def _filters(source, pages, since, until):
+        page_start, page_end = pages if pages else (None, None)
+        if isinstance(since, datetime):
+            since = since.timestamp()
+        if isinstance(until, datetime):
+            until = until.timestamp()
+        return {"source": source, "page_start": page_start, "page_end": page_end, "since": since, "until": until}
+
+    @staticmethod
+    def _where(filters):
+        """Translate search filters to a chroma where clause."""
+        conditions = []
+        for key, field, op in (("source", "source", "$eq"), ("page_start", "page", "$gte"), ("page_end", "page", "$lte"),
+                               ("since", "ingested_at", "$gte"), ("until", "ingested_at", "$lte")):
+            if filters[key] is not None:
+                conditions.append({field: {op: filters[key]}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def _vector_search(self, query, k, filters):
+        results = self.collection.query(
+            query_embeddings=[self.embeddings.embed_query(query)],
+            n_results=k,
+            where=self._where(filters),
+            include=["documents", "metadatas"],
+        )
+        return [
+            Document(id=id_, page_content=text, metadata=metadata or {})
+            for id_, text, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+
+    def _lexical_search(self, query, k, filters):
+        return self._fetch([chunk_id for chunk_id, _, _ in self.lexical_index.search(query, k, **filters)])
+
+    def _fetch(self, ids):
+        """Load documents by id, keeping the order of ids."""
+        if not ids:
+            return []
+        found = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        by_id = {
+            id_: Document(id=id_, page_content=text, metadata=metadata or {})
+            for id_, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [by_id[id_] for id_ in ids if id_ in by_id]
+
+
+def create_vector_store(collection_name="documents", persist_directory=settings.PERSIST_DIRECTORY, backend=None,
+                        embeddings=None):
+    """
+    Create the vector store of a collection for the configured backend.
+    
+    Args:
+        collection_name: Name of the collection.
+        persist_directory: Directory holding the stored vectors.
+        backend: "chroma" or "mmap", defaults to settings.VECTOR_BACKEND.
+        embeddings: Embedding client, defaults to the shared one from the registry.
+        
+    Returns:
+        A VectorStore or MmapVectorStore, both with the same add_documents, search and delete.
+    """
+    backend = backend or settings.VECTOR_BACKEND
+    if backend == "chroma":
+        return VectorStore(collection_name, persist_directory, embeddings=embeddings)
+    if backend == "mmap":
+        from memory.mmap_store import MmapVectorStore
+
+        return MmapVectorStore(collection_name, persist_directory, embeddings=embeddings)
+    raise ValueError(f"Unknown vector backend: {backend}")
+
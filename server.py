@@ -0,0 +1,79 @@
+"""
+Headless multi-tenant server.
+
+Runs one shared agent stack behind an HTTP API so many clients (including
+the Streamlit app, see AGENT_SERVER_URL) share model clients and the
+knowledge base, while requests are admitted through a bounded queue.
+
+    python server.py
+
+Endpoints:
+    POST   /chat                  {"session_id": str, "message": str}
+    POST   /documents?filename=x  raw file bytes as the body
+    GET    /sessions/{session_id} a session's metadata, e.g. its message count
+    DELETE /sessions/{session_id} clear a session's conversation
+    GET    /metrics               queue depth, wait times, sessions
+"""
+from aiohttp import web
+
+from agents.admission import ServerBusyError
+from agents.service import AgentService
+from config import settings
+
+
+def busy_response(error):
+    return web.json_response(
+        {"error": str(error), "retry_after": error.retry_after},
+        status=503,
+        headers={"Retry-After": str(max(1, int(error.retry_after)))},
+    )
+
+
+def create_app(service=None):
+    app = web.Application(client_max_size=200 * 1024 * 1024)
+    app["service"] = service or AgentService()
+
+    async def chat(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "body must be a JSON object"}, status=400)
+        fields = (body.get("session_id"), body.get("message")) if isinstance(body, dict) else (None, None)
+        if not all(isinstance(field, str) and field for field in fields):
+            return web.json_response({"error": "session_id and message are required strings"}, status=400)
+        try:
+            result = await app["service"].chat(body["session_id"], body["message"])
+        except ServerBusyError as e:
+            return busy_response(e)
+        return web.json_response(result)
+
+    async def documents(request):
+        filename = request.query.get("filename")
+        if not filename:
+            return web.json_response({"error": "filename query parameter is required"}, status=400)
+        result = await app["service"].ingest(await request.read(), filename)
+        return web.json_response(result, status=200 if result["error"] is None else 422)
+
+    async def session_info(request):
+        info = await app["service"].session_info(request.match_info["session_id"])
+        if info is None:
+            return web.json_response({"error": "unknown session"}, status=404)
+        return web.json_response(info)
+
+    async def clear_session(request):
+        found = await app["service"].clear_session(request.match_info["session_id"])
+        return web.json_response({"cleared": found}, status=200 if found else 404)
+
+    async def metrics(request):
+        return web.json_response(app["service"].metrics())
+
+    app.router.add_post("/chat", chat)
+    app.router.add_post("/documents", documents)
+    app.router.add_get("/sessions/{session_id}", session_info)
+    app.router.add_delete("/sessions/{session_id}", clear_session)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=settings.SERVER_HOST, port=settings.SERVER_PORT)
@@ -0,0 +1,32 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+## settings are read at import time, so point them at a scratch directory before any app module loads
+_PERSIST_DIRECTORY = tempfile.mkdtemp(prefix="agent-tests-")
+atexit.register(shutil.rmtree, _PERSIST_DIRECTORY, ignore_errors=True)
+os.environ["AGENT_PERSIST_DIRECTORY"] = _PERSIST_DIRECTORY
+os.environ["AGENT_RESPONSE_CACHE"] = "0"
+
+import pytest
+
+from benchmarks.fakes import HashEmbeddings, ScriptedChatModel
+from config import registry
+import memory.embeddings
+
+## no model server in tests: scripted chat model and hashing embeddings, as in the benchmarks
+registry.ChatOllama = lambda model, temperature=None, max_tokens=None: ScriptedChatModel(model_name=model)
+memory.embeddings.create_embeddings = lambda backend, model_name: HashEmbeddings()
+
+
+@pytest.fixture
+def rag_agent(tmp_path):
+    """A RagAgent with its own empty knowledge base."""
+    from agents.rag_agent import RagAgent
+    from memory.vector_store import create_vector_store
+
+    agent = RagAgent()
+    agent.vector_store = create_vector_store(persist_directory=str(tmp_path))
+    agent.manifest = registry.get_document_manifest(str(tmp_path / "document_manifest.json"))
+    return agent
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from agents.admission import AdmissionController, ServerBusyError
+
+
+async def hold(controller, release, active, peak):
+    async with controller.admit():
+        active.append(1)
+        peak.append(len(active))
+        await release.wait()
+        active.pop()
+
+
+def test_concurrency_is_capped_and_waiters_are_admitted_in_turn():
+    async def run():
+        controller = AdmissionController(max_concurrency=2, max_queue=10, queue_timeout=5)
+        release, active, peak = asyncio.Event(), [], []
+        tasks = [asyncio.create_task(hold(controller, release, active, peak)) for _ in range(6)]
+        await asyncio.sleep(0.05)
+        assert controller.in_flight == 2 and controller.waiting == 4
+        release.set()
+        await asyncio.gather(*tasks)
+        return controller, peak
+
+    controller, peak = asyncio.run(run())
+    assert max(peak) == 2
+    assert controller.counters["admitted"] == 6 and controller.in_flight == 0
+
+
+def test_requests_beyond_the_queue_are_rejected_at_once():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(controller, release, [], [])) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ServerBusyError) as busy:
+            async with controller.admit():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return controller, busy.value
+
+    controller, error = asyncio.run(run())
+    assert controller.counters["rejected"] == 1 and controller.counters["admitted"] == 2
+    assert error.retry_after >= 0
+
+
+def test_requests_waiting_too_long_are_shed():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=0.05)
+        release = asyncio.Event()
+        task = asyncio.create_task(hold(controller, release, [], []))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ServerBusyError):
+            async with controller.admit():
+                pass
+        release.set()
+        await task
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.counters["timed_out"] == 1 and controller.waiting == 0
+
+
+def test_slots_are_released_when_a_request_fails():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=1)
+        with pytest.raises(RuntimeError):
+            async with controller.admit():
+                raise RuntimeError("model crashed")
+        async with controller.admit() as waited:
+            return controller, waited
+
+    controller, waited = asyncio.run(run())
+    assert controller.in_flight == 0 and waited < 0.5
+    metrics = controller.metrics()
+    assert metrics["admitted"] == 2 and metrics["queue_depth"] == 0 and metrics["max_concurrency"] == 1
@@ -0,0 +1,27 @@
+import time
+
+import numpy as np
+import pytest
+
+from tools.calculator import CalculatorError, calculator, evaluate, evaluate_array, evaluate_many
+
+
+def test_round_digits():
+    assert evaluate("round(3.14159, 2)") == 3.14
+    assert evaluate("round(1234, -2)") == 1200
+    assert evaluate_array("round(x, 1)", {"x": [1.26, 2.34]}).tolist() == [1.3, 2.3]
+
+
+@pytest.mark.parametrize("expression", ["round(5, -10**300)", "round(5, -10**6)", "round(5, 31)", "round(5, 2.0)"])
+def test_round_rejects_unbounded_digits(expression):
+    start = time.monotonic()
+    with pytest.raises(CalculatorError):
+        evaluate(expression)
+    assert calculator.invoke({"expression": expression}).startswith("Error")
+    assert isinstance(evaluate_many([expression])[0], CalculatorError)
+    assert time.monotonic() - start < 1
+
+
+def test_array_round_rejects_unbounded_digits():
+    with pytest.raises(CalculatorError):
+        evaluate_array("round(x, n)", {"x": np.ones(3), "n": -10 ** 6})
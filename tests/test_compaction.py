@@ -0,0 +1,99 @@
+import pytest
+
+from benchmarks.fakes import HashEmbeddings
+from config.registry import get_chroma_client
+from memory.compaction import _PREVIOUS, _TEMP, COLLECTION, _names, compact, merge_near_duplicates, recover
+
+EMBEDDINGS = HashEmbeddings(dimension=64)
+NOW = 1_800_000_000.0
+
+
+def memory(text, session_id="alice", created_at=NOW, last_recalled=NOW):
+    return text, {"session_id": session_id, "created_at": created_at, "last_recalled": last_recalled}
+
+
+def add(collection, memories):
+    collection.add(
+        ids=[f"{metadata['session_id']}-{i}" for i, (_, metadata) in enumerate(memories)],
+        documents=[text for text, _ in memories],
+        metadatas=[metadata for _, metadata in memories],
+        embeddings=EMBEDDINGS.embed_documents([text for text, _ in memories]),
+    )
+
+
+@pytest.fixture
+def client(tmp_path):
+    return get_chroma_client(str(tmp_path))
+
+
+@pytest.fixture
+def collection(client):
+    collection = client.create_collection(COLLECTION, metadata={"hnsw:space": "cosine"})
+    add(collection, [
+        memory("I like green tea", created_at=NOW - 50, last_recalled=NOW - 40),
+        memory("i like green tea!", created_at=NOW - 30, last_recalled=NOW - 10),
+        memory("my dog is called Rex"),
+        memory("I like green tea", session_id="bob"),
+    ])
+    return collection
+
+
+def test_near_duplicates_merge_into_the_most_recently_used():
+    texts = ["I like green tea", "i like green tea!", "my dog is called Rex", "I like green tea"]
+    metadatas = [
+        memory(texts[0], created_at=NOW - 50, last_recalled=NOW - 40)[1],
+        memory(texts[1], created_at=NOW - 30, last_recalled=NOW - 10)[1],
+        memory(texts[2])[1],
+        memory(texts[3], session_id="bob")[1],
+    ]
+    ids, documents, kept, _ = merge_near_duplicates(
+        ["a", "b", "c", "d"], texts, metadatas, EMBEDDINGS.embed_documents(texts))
+
+    assert sorted(ids) == ["b", "c", "d"]
+    tea = kept[ids.index("b")]
+    assert tea["created_at"] == NOW - 50 and tea["last_recalled"] == NOW - 10 and tea["merged"] == 2
+    ## bob's identical memory is his own and is not merged into alice's
+    assert kept[ids.index("d")]["session_id"] == "bob" and kept[ids.index("d")]["merged"] == 1
+
+
+def test_dry_run_changes_nothing(tmp_path, collection):
+    stats = compact(str(tmp_path), threshold=0.9, dry_run=True)
+    assert stats == {"before": 4, "merged": 1, "after": 3}
+    assert collection.count() == 4
+
+
+def test_compaction_rebuilds_the_collection(tmp_path, client, collection):
+    stats = compact(str(tmp_path), threshold=0.9)
+    assert stats["merged"] == 1 and stats["after"] == 3
+    assert _names(client) == {COLLECTION}
+    rebuilt = client.get_collection(COLLECTION)
+    assert sorted(rebuilt.get()["documents"]) == ["I like green tea", "i like green tea!", "my dog is called Rex"]
+    assert rebuilt.metadata["hnsw:space"] == "cosine"
+
+
+def test_recover_restores_an_interrupted_swap(client, collection):
+    collection.modify(name=_PREVIOUS)
+    assert recover(client)
+    assert client.get_collection(COLLECTION).count() == 4
+    assert _PREVIOUS not in _names(client)
+
+
+def test_recover_replaces_an_empty_collection_created_meanwhile(client, collection):
+    collection.modify(name=_PREVIOUS)
+    client.create_collection(COLLECTION)
+    assert recover(client)
+    assert client.get_collection(COLLECTION).count() == 4
+
+
+def test_recover_leaves_a_completed_swap_alone(client, collection):
+    client.create_collection(_PREVIOUS)
+    assert not recover(client)
+    assert client.get_collection(COLLECTION).count() == 4
+
+
+def test_compaction_recovers_first_and_clears_a_stale_rebuild(tmp_path, client, collection):
+    client.create_collection(_TEMP)
+    collection.modify(name=_PREVIOUS)
+    stats = compact(str(tmp_path), threshold=0.9)
+    assert stats["before"] == 4 and stats["after"] == 3
+    assert _names(client) == {COLLECTION}
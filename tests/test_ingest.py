@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from config import settings
+from memory.manifest import ID_SCHEME, DocumentManifest
+
+LINES = [
+    "Alpha page about solar panels and inverters for rooftop installations.\n",
+    "Beta page about battery storage, charge cycles and depth of discharge.\n",
+    "Gamma page about grid tie regulations and net metering tariffs here.\n",
+]
+
+
+@pytest.fixture(autouse=True)
+def one_line_per_page(monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_PAGE_CHARS", 60)
+
+
+def write(tmp_path, name, lines):
+    path = tmp_path / name
+    path.write_text("".join(lines))
+    return str(path)
+
+
+def test_unchanged_documents_are_skipped(rag_agent, tmp_path):
+    path = write(tmp_path, "energy.txt", LINES)
+    first = rag_agent.ingest(path, filename="energy.txt")
+    assert first.ok and first.chunks == 3 and first.changed_pages == 3
+
+    again = rag_agent.ingest(path, filename="energy.txt")
+    assert again.unchanged and again.chunks == 0 and again.skipped_chunks == 3
+    assert rag_agent.vector_store.collection.count() == 3
+
+
+def test_only_changed_pages_are_embedded_and_stale_chunks_deleted(rag_agent, tmp_path):
+    rag_agent.ingest(write(tmp_path, "energy.txt", LINES), filename="energy.txt")
+    edited = LINES[:1] + ["Beta page about heat pumps, defrost cycles and coefficient values.\n"] + LINES[2:]
+    result = rag_agent.ingest(write(tmp_path, "energy.txt", edited), filename="energy.txt")
+
+    assert result.ok and result.changed_pages == 1 and result.chunks == 1 and result.deleted_chunks == 1
+    assert rag_agent.vector_store.collection.count() == 3
+    found = rag_agent.vector_store.search("battery storage charge cycles", k=3, source="energy.txt")
+    assert all("battery" not in doc.page_content for doc in found)
+
+
+def test_documents_sharing_text_keep_their_own_chunks(rag_agent, tmp_path):
+    rag_agent.ingest(write(tmp_path, "a.txt", LINES), filename="alpha.txt")
+    rag_agent.ingest(write(tmp_path, "b.txt", LINES), filename="beta.txt")
+    rag_agent.ingest(write(tmp_path, "a.txt", LINES[:1]), filename="alpha.txt")
+
+    beta = rag_agent.vector_store.search("battery storage", k=3, source="beta.txt")
+    assert any("battery" in doc.page_content for doc in beta)
+    assert rag_agent.vector_store.collection.count() == 4
+
+
+def test_manifest_is_persisted(rag_agent, tmp_path):
+    rag_agent.ingest(write(tmp_path, "energy.txt", LINES), filename="energy.txt")
+    reloaded = DocumentManifest(str(tmp_path / "document_manifest.json"))
+    entry = reloaded.get("energy.txt")
+    assert sorted(entry["pages"]) == ["0", "1", "2"]
+    assert reloaded.referenced_ids() == {id_ for page in entry["pages"].values() for id_ in page["chunk_ids"]}
+
+
+def test_entries_from_an_older_id_scheme_are_rebuilt(rag_agent, tmp_path):
+    path = write(tmp_path, "energy.txt", LINES)
+    rag_agent.ingest(path, filename="energy.txt")
+    manifest_file = tmp_path / "document_manifest.json"
+    stored = json.loads(manifest_file.read_text())
+    del stored["energy.txt"]["id_scheme"]
+    manifest_file.write_text(json.dumps(stored))
+    rag_agent.manifest = DocumentManifest(str(manifest_file))
+
+    result = rag_agent.ingest(path, filename="energy.txt")
+    assert not result.unchanged and result.changed_pages == 3
+    assert rag_agent.manifest.get("energy.txt")["id_scheme"] == ID_SCHEME
@@ -0,0 +1,91 @@
+from langchain_core.documents import Document
+import pytest
+
+from memory.lexical_index import LexicalIndex, tokenize
+from memory.vector_store import VectorStore, is_exact_term_query
+
+CHUNKS = [
+    ("The installer fails with ERR-404 when the mirror is unreachable.", "install.md", 0),
+    ("Upgrade notes for v1.2: the config file moved to the home directory.", "upgrade.md", 0),
+    ("Battery storage keeps charge cycles low to extend lifetime.", "energy.txt", 0),
+    ("Solar panels convert sunlight into electricity for the battery.", "energy.txt", 1),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    index.add(
+        [f"c{i}" for i in range(len(CHUNKS))],
+        [text for text, _, _ in CHUNKS],
+        [{"source": source, "page": page, "ingested_at": 100.0 + i} for i, (_, source, page) in enumerate(CHUNKS)],
+    )
+    return index
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = VectorStore("documents", str(tmp_path))
+    store.add_documents([
+        Document(page_content=text, metadata={"source": source, "page": page, "ingested_at": 100.0})
+        for text, source, page in CHUNKS
+    ])
+    return store
+
+
+def test_compound_identifiers_are_indexed_whole_and_by_part():
+    assert tokenize("ERR-404 in v1.2") == ["err-404", "err", "404", "in", "v1.2", "v1", "2"]
+
+
+def test_bm25_ranks_the_chunk_with_the_rare_term_first(index):
+    hits = index.search("battery charge cycles", k=2)
+    assert [chunk_id for chunk_id, _, _ in hits] == ["c2", "c3"]
+    assert hits[0][1] > hits[1][1]
+    assert hits[0][2] == 3
+
+
+def test_identifiers_match_by_part(index):
+    assert index.search("404", k=1)[0][0] == "c0"
+    assert index.search("err-404", k=1)[0][0] == "c0"
+
+
+def test_filters_limit_matches(index):
+    assert [hit[0] for hit in index.search("battery", source="energy.txt", page_start=1)] == ["c3"]
+    assert index.search("battery", source="install.md") == []
+    assert [hit[0] for hit in index.search("battery", until=102.5)] == ["c2"]
+
+
+def test_delete_removes_postings(index):
+    index.delete(["c0"])
+    assert index.search("ERR-404") == []
+    assert len(index) == 3
+
+
+def test_adding_known_chunks_is_a_no_op(index):
+    index.add(["c0"], ["completely different text"])
+    assert index.search("completely different") == []
+
+
+@pytest.mark.parametrize("query, exact", [
+    ("ERR-404", True),
+    ('"config file moved"', True),
+    ("v1.2", True),
+    ("how do I upgrade", False),
+])
+def test_exact_term_queries(query, exact):
+    assert is_exact_term_query(query) is exact
+
+
+def test_hybrid_search_fuses_lexical_and_vector_rankings(store):
+    results = store.search("what causes ERR-404 during install", k=2, mode="hybrid")
+    assert results[0].metadata["source"] == "install.md"
+
+
+def test_exact_terms_are_answered_from_the_lexical_index(store, monkeypatch):
+    monkeypatch.setattr(store, "_vector_search", lambda *args: pytest.fail("embedded an exact term query"))
+    assert store.search("ERR-404", k=1, mode="hybrid")[0].metadata["source"] == "install.md"
+
+
+def test_hybrid_search_respects_filters(store):
+    results = store.search("battery", k=4, mode="hybrid", source="energy.txt", pages=(1, 1))
+    assert [(doc.metadata["source"], doc.metadata["page"]) for doc in results] == [("energy.txt", 1)]
@@ -0,0 +1,103 @@
+import chromadb
+import pytest
+
+from benchmarks.fakes import HashEmbeddings
+from memory import memory_writer
+from memory.memory_writer import MemoryWriter, memory_key
+
+
+class FlakyEmbeddings(HashEmbeddings):
+    """Fails the first few embedding calls, like an embedding server that is still starting."""
+
+    def __init__(self, failures):
+        super().__init__(dimension=64)
+        self.failures = failures
+
+    def embed_documents(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("embedding server unavailable")
+        return super().embed_documents(texts)
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(memory_writer, "_RETRY_DELAY", 0.0)
+
+
+def make_writer(tmp_path, embeddings=None, **kwargs):
+    collection = chromadb.PersistentClient(path=str(tmp_path)).get_or_create_collection(
+        "long_term_memory", metadata={"hnsw:space": "cosine"})
+    kwargs.setdefault("batch_wait", 0.05)
+    return MemoryWriter(collection, embeddings or HashEmbeddings(dimension=64), str(tmp_path), **kwargs)
+
+
+def stored(writer):
+    return sorted(writer.collection.get()["documents"])
+
+
+def test_queued_memories_are_pending_until_written(tmp_path):
+    writer = make_writer(tmp_path, batch_wait=0.3)
+    memory_id = writer.submit("I like tea", {"session_id": "alice"})
+    assert memory_id == memory_key("I like tea", "alice")
+    assert writer.pending(session_id="alice")[0][0] == "I like tea"
+    assert writer.pending(session_id="bob") == []
+    writer.flush()
+    assert writer.pending() == []
+    assert stored(writer) == ["I like tea"]
+
+
+def test_bursts_share_one_embedding_call(tmp_path):
+    embeddings = HashEmbeddings(dimension=64)
+    writer = make_writer(tmp_path, embeddings, batch_wait=0.3)
+    for fact in ("I like tea", "my dog is called Rex", "I live in Lyon"):
+        writer.submit(fact, {"session_id": "alice"})
+    writer.flush()
+    assert embeddings.calls == 1
+    assert writer.counters["written"] == 3
+
+
+def test_duplicates_are_dropped_within_a_session_only(tmp_path):
+    writer = make_writer(tmp_path)
+    writer.submit("I like tea", {"session_id": "alice"})
+    writer.flush()
+    writer.submit("I like tea", {"session_id": "alice"})
+    writer.submit("i like tea!", {"session_id": "alice"})
+    writer.submit("I like tea", {"session_id": "bob"})
+    writer.flush()
+    assert stored(writer) == ["I like tea", "I like tea"]
+    assert writer.counters["duplicates"] == 2
+
+
+def test_near_duplicates_in_one_batch_are_written_once(tmp_path):
+    writer = make_writer(tmp_path, batch_wait=0.3)
+    writer.submit("I like tea", {"session_id": "alice"})
+    writer.submit("i like tea!", {"session_id": "alice"})
+    writer.flush()
+    assert stored(writer) == ["I like tea"]
+
+
+def test_failed_batches_are_retried(tmp_path):
+    writer = make_writer(tmp_path, FlakyEmbeddings(failures=2), max_attempts=3)
+    writer.submit("I like tea", {"session_id": "alice"})
+    writer.flush()
+    assert stored(writer) == ["I like tea"]
+    assert writer.counters["retried"] == 2 and writer.counters["failed"] == 0
+
+
+def test_memories_are_dropped_after_the_last_attempt(tmp_path):
+    writer = make_writer(tmp_path, FlakyEmbeddings(failures=5), max_attempts=2)
+    writer.submit("I like tea", {"session_id": "alice"})
+    writer.flush()
+    assert stored(writer) == []
+    assert writer.pending() == []
+    assert writer.counters["retried"] == 1 and writer.counters["failed"] == 1
+
+
+def test_recalls_update_last_recalled(tmp_path):
+    writer = make_writer(tmp_path)
+    memory_id = writer.submit("I like tea", {"session_id": "alice", "created_at": 1.0, "last_recalled": 1.0})
+    writer.flush()
+    writer.touch([memory_id, "unknown"])
+    writer.flush()
+    assert writer.collection.get(ids=[memory_id])["metadatas"][0]["last_recalled"] > 1.0
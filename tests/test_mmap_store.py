@@ -0,0 +1,83 @@
+import os
+
+from langchain_core.documents import Document
+import pytest
+
+from benchmarks.fakes import HashEmbeddings
+from memory.embeddings import EmbeddingDimensionError
+from memory.mmap_store import MmapVectorStore
+from memory.vector_store import chunk_id
+
+TEXTS = [
+    "Battery storage keeps charge cycles low.",
+    "Solar panels convert sunlight into electricity.",
+    "Heat pumps move heat with a refrigerant loop.",
+    "Wind turbines feed the grid on stormy days.",
+]
+
+
+def open_store(tmp_path, dtype="float16", dimension=64):
+    return MmapVectorStore("documents", str(tmp_path), dtype=dtype, embeddings=HashEmbeddings(dimension=dimension))
+
+
+def fill(store):
+    store.add_documents([Document(page_content=text, metadata={"source": "energy.txt", "page": i})
+                         for i, text in enumerate(TEXTS)])
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_vector_search_finds_the_closest_chunk(tmp_path, dtype):
+    store = open_store(tmp_path, dtype)
+    fill(store)
+    assert store.count() == 4
+    assert store.search("solar panels sunlight", k=1, mode="vector")[0].page_content == TEXTS[1]
+
+
+def test_deleted_chunks_are_skipped_and_stay_deleted_after_reopen(tmp_path):
+    store = open_store(tmp_path)
+    fill(store)
+    deleted_id = chunk_id(TEXTS[1], "energy.txt")
+    assert store.delete([deleted_id]) == 1
+    assert store.count() == 3
+    assert all(doc.id != deleted_id for doc in store.search("solar panels sunlight", k=4, mode="vector"))
+
+    reopened = open_store(tmp_path)
+    assert reopened.count() == 3
+    results = reopened.search("solar panels sunlight", k=4, mode="hybrid")
+    assert deleted_id not in {doc.id for doc in results}
+    assert reopened.search("heat pumps", k=1, mode="vector")[0].page_content == TEXTS[2]
+
+
+def test_deleted_chunks_can_be_added_again(tmp_path):
+    store = open_store(tmp_path)
+    fill(store)
+    store.delete([chunk_id(TEXTS[1], "energy.txt")])
+    fill(store)
+    assert store.count() == 4
+    assert store.search("solar panels sunlight", k=1, mode="vector")[0].page_content == TEXTS[1]
+
+
+def test_filters_limit_vector_search(tmp_path):
+    store = open_store(tmp_path)
+    fill(store)
+    results = store.search("energy", k=4, mode="vector", pages=(2, 3))
+    assert sorted(doc.metadata["page"] for doc in results) == [2, 3]
+
+
+def test_partial_writes_are_ignored_on_reopen(tmp_path):
+    store = open_store(tmp_path)
+    fill(store)
+    with open(os.path.join(store.directory, "vectors.bin"), "ab") as f:
+        f.write(b"\x01" * 37)
+
+    reopened = open_store(tmp_path)
+    assert reopened.count() == 4
+    reopened.add_documents([Document(page_content="Tidal power follows the moon.", metadata={"source": "tide.txt"})])
+    assert reopened.search("tidal power moon", k=1, mode="vector")[0].metadata["source"] == "tide.txt"
+    assert reopened.search("heat pumps", k=1, mode="vector")[0].page_content == TEXTS[2]
+
+
+def test_reopening_with_another_dimension_fails(tmp_path):
+    fill(open_store(tmp_path))
+    with pytest.raises(EmbeddingDimensionError):
+        open_store(tmp_path, dimension=32)
@@ -0,0 +1,83 @@
+import pytest
+
+from agents.rag_agent import RagAgent
+
+PRICING = "Pricing overview. Enterprise customers get a discount of twenty percent on annual plans."
+ROADMAP = "Roadmap. The next release adds offline sync and a discount calculator."
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, inputs):
+        self.calls.append(inputs)
+        return {"output": "added"}
+
+
+@pytest.fixture
+def documents(rag_agent, tmp_path):
+    for name, text in (("pricing_report.txt", PRICING), ("roadmap.md", ROADMAP)):
+        path = tmp_path / name
+        path.write_text(text)
+        assert rag_agent.ingest(str(path), filename=name).ok
+    return rag_agent
+
+
+@pytest.mark.parametrize("text", [
+    "add the document /tmp/notes.pdf to the knowledge base",
+    "please upload this file: report.txt",
+    "what documents were added after Monday?",
+    "summarize what was uploaded yesterday",
+])
+def test_ingest_and_time_scoped_requests_need_the_agent(text):
+    assert RagAgent._needs_agent(text)
+
+
+@pytest.mark.parametrize("text", [
+    "what does the pricing report say about discounts?",
+    "summarize pages 2-5 of roadmap.md",
+    "which plans are discounted",
+])
+def test_lookups_are_answered_directly(text):
+    assert not RagAgent._needs_agent(text)
+
+
+def test_mentioned_source_matches_file_names_and_stems(documents):
+    assert documents.mentioned_source("what does pricing report say about discounts") == "pricing_report.txt"
+    assert documents.mentioned_source("summarize roadmap.md") == "roadmap.md"
+    assert documents.mentioned_source("what is on the roadmap") == "roadmap.md"
+    assert documents.mentioned_source("any discounts?") is None
+
+
+def test_scope_filters_name_document_and_pages(documents):
+    assert documents.scope_filters("pages 2 to 4 of the pricing report") == {
+        "source": "pricing_report.txt", "pages": (1, 3)}
+    assert documents.scope_filters("what is on page 1") == {"pages": (0, 0)}
+    assert documents.scope_filters("any discounts?") == {}
+
+
+def test_direct_mode_keeps_document_scope(documents, monkeypatch):
+    searches = []
+    search = documents.vector_store.search
+
+    def recording_search(query, k=None, **filters):
+        searches.append(filters)
+        return search(query, k, **filters)
+
+    monkeypatch.setattr(documents.vector_store, "search", recording_search)
+    monkeypatch.setattr(documents, "agent_executor", FakeExecutor())
+
+    response = documents.run("what does the roadmap say about discount", mode="direct")
+    assert searches == [{"source": "roadmap.md"}]
+    assert response["source_documents"]
+    assert {doc.metadata["source"] for doc in response["source_documents"]} == {"roadmap.md"}
+    assert documents.agent_executor.calls == []
+
+
+def test_direct_mode_hands_ingest_requests_to_the_agent(documents, monkeypatch):
+    monkeypatch.setattr(documents, "answer", lambda *args, **kwargs: pytest.fail("answered directly"))
+    monkeypatch.setattr(documents, "agent_executor", FakeExecutor())
+
+    assert documents.run("add the document notes.pdf to the knowledge base", mode="direct") == {"output": "added"}
+    assert documents.agent_executor.calls == [{"input": "add the document notes.pdf to the knowledge base"}]
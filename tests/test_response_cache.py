@@ -0,0 +1,87 @@
+import pytest
+
+from agents.response_cache import ResponseCache, is_history_dependent
+from benchmarks.fakes import HashEmbeddings
+
+VERSIONS = (1, 1)
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(embeddings=HashEmbeddings(dimension=64), threshold=0.9)
+
+
+@pytest.mark.parametrize("text", [
+    "What was my first question?",
+    "what did you say about chroma",
+    "as you said earlier, which model?",
+    "summarize our conversation",
+    "do you remember the plan",
+    "and what about Rust?",
+    "why is it slow?",
+    "tell me more",
+    "what is my name",
+    "who am i",
+    "do I like tea?",
+])
+def test_conversation_references_bypass_the_cache(text):
+    assert is_history_dependent(text)
+
+
+@pytest.mark.parametrize("text", [
+    "summarize my uploaded doc",
+    "what does our document say about pricing",
+    "what happened before the French revolution",
+    "tell me the history of Rome",
+    "explain it like I'm five: what is a vector store",
+    "can we use sqlite for this?",
+    "show the table again",
+])
+def test_ordinary_questions_are_cacheable(text):
+    assert not is_history_dependent(text)
+
+
+def test_answers_are_shared_between_sessions(cache):
+    cache.store("Summarize my uploaded doc", VERSIONS, "A summary.", ["call_rag_agent"], session="alice")
+    assert cache.lookup("summarize my uploaded doc?", VERSIONS, session="bob") == "A summary."
+    assert cache.lookup("summarize my uploaded doc", VERSIONS) == "A summary."
+
+
+def test_memory_answers_stay_in_their_session(cache):
+    cache.store("which colour suits the shed", VERSIONS, "Blue.", ["retrieve_from_memory"], session="alice")
+    assert cache.lookup("which colour suits the shed", VERSIONS, session="alice") == "Blue."
+    assert cache.lookup("which colour suits the shed", VERSIONS, session="bob") is None
+    assert cache.lookup("which colour suits the shed", VERSIONS) is None
+
+
+def test_memory_answers_without_a_session_are_not_cached(cache):
+    cache.store("which colour suits the shed", VERSIONS, "Blue.", ["retrieve_from_memory"])
+    assert cache.stats()["stored"] == 0
+
+
+def test_side_effect_tools_are_not_cached(cache):
+    cache.store("note that the build is green", VERSIONS, "Saved.", ["save_to_memory"], session="alice")
+    assert cache.lookup("note that the build is green", VERSIONS, session="alice") is None
+
+
+def test_new_state_versions_invalidate_answers(cache):
+    cache.store("what is a vector store", VERSIONS, "An index.", [])
+    assert cache.lookup("what is a vector store", (2, 1)) is None
+    assert cache.lookup("what is a vector store", VERSIONS) == "An index."
+
+
+def test_similar_questions_hit_semantically(cache):
+    cache.store("what is a vector store", VERSIONS, "An index.", [])
+    assert cache.lookup("what is a vector store please", VERSIONS) == "An index."
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(embeddings=HashEmbeddings(dimension=16), max_entries=2)
+    cache.store("first question", VERSIONS, "1", [])
+    cache.store("second question", VERSIONS, "2", [])
+    cache.lookup("first question", VERSIONS)
+    cache.store("third question", VERSIONS, "3", [])
+    assert cache.lookup("second question", VERSIONS) is None
+    assert cache.lookup("first question", VERSIONS) == "1"
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import chromadb
+import pytest
+
+from memory.retention import SECONDS_PER_DAY, apply_retention, last_used, recency_score
+
+NOW = 1_800_000_000.0
+DAY = SECONDS_PER_DAY
+
+
+@pytest.fixture
+def collection(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    return client.get_or_create_collection("long_term_memory")
+
+
+def add(collection, memory_id, session_id="alice", **metadata):
+    collection.add(ids=[memory_id], documents=[memory_id], embeddings=[[1.0, 0.0]],
+                   metadatas=[dict(metadata, session_id=session_id)])
+
+
+def test_ttl_deletes_memories_neither_created_nor_recalled_recently(collection):
+    add(collection, "stale", created_at=NOW - 200 * DAY, last_recalled=NOW - 200 * DAY)
+    add(collection, "recalled", created_at=NOW - 200 * DAY, last_recalled=NOW - DAY)
+    add(collection, "fresh", created_at=NOW - DAY, last_recalled=NOW - DAY)
+    assert apply_retention(collection, ttl_days=180, now=NOW) == 1
+    assert sorted(collection.get()["ids"]) == ["fresh", "recalled"]
+
+
+def test_ttl_expires_legacy_memories_by_their_old_timestamp(collection):
+    add(collection, "legacy-old", timestamp=datetime.fromtimestamp(NOW - 365 * DAY).isoformat())
+    add(collection, "legacy-new", timestamp=datetime.fromtimestamp(NOW - DAY).isoformat())
+    add(collection, "legacy-undated")
+    assert apply_retention(collection, ttl_days=180, now=NOW) == 1
+
+    kept = collection.get(include=["metadatas"])
+    assert sorted(kept["ids"]) == ["legacy-new", "legacy-undated"]
+    ## the survivors were backfilled, undated ones from the time of the sweep
+    stamps = dict(zip(kept["ids"], kept["metadatas"]))
+    assert stamps["legacy-undated"]["created_at"] == NOW
+    assert stamps["legacy-new"]["last_recalled"] == pytest.approx(NOW - DAY)
+
+
+def test_session_cap_evicts_least_recently_used(collection):
+    for i in range(5):
+        add(collection, f"m{i}", created_at=NOW - i * DAY, last_recalled=NOW - i * DAY)
+    add(collection, "other", session_id="bob", created_at=NOW - 99 * DAY, last_recalled=NOW - 99 * DAY)
+    assert apply_retention(collection, max_per_session=3, sessions=["alice"], now=NOW) == 2
+    assert sorted(collection.get()["ids"]) == ["m0", "m1", "m2", "other"]
+
+
+def test_total_cap_evicts_down_to_ninety_percent(collection):
+    for i in range(12):
+        add(collection, f"m{i:02d}", session_id=f"s{i}", created_at=NOW - i * DAY, last_recalled=NOW - i * DAY)
+    assert apply_retention(collection, max_entries=10, now=NOW) == 3
+    assert collection.count() == 9
+
+
+def test_recency_weights_recall_scores():
+    fresh = recency_score(0.8, {"created_at": NOW}, now=NOW)
+    month_old = recency_score(0.8, {"created_at": NOW - 30 * DAY}, now=NOW)
+    legacy = recency_score(0.8, {}, now=NOW)
+    assert fresh == pytest.approx(0.8)
+    assert month_old == pytest.approx(0.8 * (0.7 + 0.3 * 0.5))
+    assert legacy == pytest.approx(0.8 * 0.7)
+    assert last_used({"created_at": 1.0, "last_recalled": 5.0}) == 5.0
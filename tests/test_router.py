@@ -0,0 +1,94 @@
+import pytest
+
+from agents.router import default_router
+
+
+class FakeShortTermMemory:
+    first_question = None
+
+
+class FakeMemoryManager:
+    def __init__(self, questions=()):
+        self.questions = list(questions)
+        self.saved = []
+        self.short_term_memory = FakeShortTermMemory()
+
+    def get_conversation_history(self, query=None):
+        return {"chat_history": [("human", question) for question in self.questions]}
+
+    def add_to_long_term_memory(self, content, metadata=None):
+        self.saved.append(content)
+        return content
+
+
+@pytest.fixture
+def memory_manager():
+    return FakeMemoryManager(["hello", "what is a vector store?"])
+
+
+@pytest.fixture
+def router(memory_manager):
+    return default_router(memory_manager)
+
+
+@pytest.mark.parametrize("text, output", [
+    ("12 * 7", "12 * 7 = 84"),
+    ("calculate 2847*392+1583", "2847*392+1583 = 1117607"),
+    ("what is 2+2?", "2+2 = 4"),
+    ("(3 + 4) * 2", "(3 + 4) * 2 = 14"),
+    ("what is 10 / 4", "10 / 4 = 2.5"),
+])
+def test_arithmetic_is_routed(router, text, output):
+    route = router.route(text)
+    assert route is not None and route.rule == "calculator"
+    assert route.output == output
+
+
+@pytest.mark.parametrize("text", [
+    "2024-05-01",
+    "what is 2024-05-01",
+    "555-1234",
+    "555-123-4567",
+    "05/01/2024",
+    "2+2",
+    "what is 1/0",
+    "2024 was a good year",
+])
+def test_dates_phone_numbers_and_bare_expressions_go_to_the_llm(router, text):
+    assert router.route(text) is None
+
+
+def test_history_questions_are_answered_from_short_term_memory(router):
+    assert router.route("What was my first question?").output == 'Your first question was: "hello"'
+    assert router.route("what was my last question").output == 'Your previous question was: "what is a vector store?"'
+
+
+@pytest.mark.parametrize("text, fact", [
+    ("remember that my favourite colour is blue", "my favourite colour is blue"),
+    ("Please remember that I like tea.", "I like tea"),
+    ("remember: my dog is called Rex", "my dog is called Rex"),
+    ("keep in mind that I am vegan", "I am vegan"),
+])
+def test_explicit_remember_instructions_are_saved(router, memory_manager, text, fact):
+    assert router.route(text).rule == "remember"
+    assert memory_manager.saved == [fact]
+
+
+@pytest.mark.parametrize("text", [
+    "Remember what my favourite colour is?",
+    "remember when I told you about the trip?",
+    "remember that I asked?",
+    "remember my name is Bob",
+    "do you remember my name",
+])
+def test_recall_questions_are_not_saved(router, memory_manager, text):
+    assert router.route(text) is None
+    assert memory_manager.saved == []
+
+
+def test_stats_count_routed_and_fallthrough(router):
+    router.route("12 * 7")
+    router.route("tell me a joke")
+    stats = router.stats()
+    assert stats["routed"] == 1 and stats["fallthrough"] == 1 and stats["calculator"] == 1
+    assert stats["hit_rate"] == 0.5
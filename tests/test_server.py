@@ -0,0 +1,55 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+import pytest
+
+from agents.admission import ServerBusyError
+from server import create_app
+
+
+class FakeService:
+    def __init__(self, busy=False):
+        self.busy = busy
+        self.turns = []
+
+    async def chat(self, session_id, message):
+        if self.busy:
+            raise ServerBusyError("Server busy", retry_after=2.5)
+        self.turns.append((session_id, message))
+        return {"session_id": session_id, "output": f"echo: {message}"}
+
+
+def post_chat(service, **kwargs):
+    async def run():
+        async with TestClient(TestServer(create_app(service))) as client:
+            response = await client.post("/chat", **kwargs)
+            return response.status, await response.json(), response.headers
+    return asyncio.run(run())
+
+
+def test_chat_answers():
+    service = FakeService()
+    status, body, _ = post_chat(service, json={"session_id": "alice", "message": "hi"})
+    assert status == 200 and body["output"] == "echo: hi"
+    assert service.turns == [("alice", "hi")]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"data": "{not json", "headers": {"Content-Type": "application/json"}},
+    {"data": b"\xff\xfe", "headers": {"Content-Type": "application/json"}},
+    {"json": ["alice", "hi"]},
+    {"json": {"session_id": "alice"}},
+    {"json": {"session_id": "alice", "message": ""}},
+    {"json": {"session_id": "alice", "message": 5}},
+])
+def test_bad_requests_are_rejected(kwargs):
+    service = FakeService()
+    status, body, _ = post_chat(service, **kwargs)
+    assert status == 400 and "error" in body
+    assert service.turns == []
+
+
+def test_busy_server_asks_to_retry():
+    status, body, headers = post_chat(FakeService(busy=True), json={"session_id": "alice", "message": "hi"})
+    assert status == 503 and body["retry_after"] == 2.5
+    assert headers["Retry-After"] == "2"
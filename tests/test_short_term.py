@@ -0,0 +1,80 @@
+from memory.short_term import ShortTermMemory, count_tokens
+
+## 40 characters, 10 tokens
+TURN = "a" * 40
+
+
+def fill(memory, turns):
+    for i in range(turns):
+        memory.add_turn(f"{i} {TURN}", f"{i} {TURN}")
+        memory.wait(timeout=5)
+
+
+def test_window_keeps_the_newest_messages_within_budget():
+    memory = ShortTermMemory(max_tokens=10_000)
+    fill(memory, 3)
+    history = memory.window()
+    assert [role for role, _ in history] == ["human", "assistant"] * 3
+    assert memory.first_question.startswith("0 ")
+
+
+def test_turns_beyond_the_budget_are_dropped_without_a_summarizer():
+    memory = ShortTermMemory(max_tokens=100)
+    fill(memory, 20)
+    assert sum(message.tokens for message in memory.messages) <= 100
+    assert memory.messages[-1].content.startswith("19 ")
+    assert memory.summary == ""
+    ## the first question survives eviction
+    assert memory.first_question.startswith("0 ")
+
+
+def test_old_turns_are_folded_into_the_summary():
+    calls = []
+
+    def summarizer(summary, messages):
+        calls.append(len(messages))
+        return (summary + " " + " ".join(m.content.split()[0] for m in messages)).strip()
+
+    memory = ShortTermMemory(max_tokens=100, summarizer=summarizer)
+    fill(memory, 10)
+    assert calls
+    assert memory.summary.split()[:2] == ["0", "0"]
+    history = memory.window()
+    assert history[0][0] == "system" and memory.summary in history[0][1]
+    assert sum(count_tokens(content) for _, content in history[1:]) + count_tokens(memory.summary) <= 100
+
+
+def test_failed_summary_keeps_the_turns_and_retries():
+    attempts = []
+
+    def summarizer(summary, messages):
+        attempts.append(len(messages))
+        if len(attempts) == 1:
+            raise RuntimeError("model offline")
+        return "earlier turns"
+
+    memory = ShortTermMemory(max_tokens=100, summarizer=summarizer)
+    fill(memory, 5)
+    assert len(attempts) == 1
+    ## nothing was lost while the summarizer failed
+    assert memory.messages[0].content.startswith("0 ")
+    assert memory.summary == ""
+
+    fill(memory, 1)
+    assert len(attempts) == 2
+    assert memory.summary == "earlier turns"
+    assert not memory.messages[0].content.startswith("0 ")
+
+
+def test_summary_is_cut_at_a_word_boundary():
+    memory = ShortTermMemory(max_tokens=100, summary_tokens=5, summarizer=lambda summary, messages: "word " * 20)
+    fill(memory, 5)
+    assert len(memory.summary) <= 20
+    assert memory.summary.split() == ["word"] * 4
+
+
+def test_clear_discards_a_running_summary():
+    memory = ShortTermMemory(max_tokens=100, summarizer=lambda summary, messages: "stale")
+    fill(memory, 5)
+    memory.clear()
+    assert memory.messages == [] and memory.summary == "" and memory.first_question is None
@@ -0,0 +1,55 @@
+import asyncio
+
+from langchain_core.tools import tool
+
+from agents.subagents import agent_output, attach_async_subagents
+
+
+class FakeAgent:
+    def __init__(self, response):
+        self.response = response
+
+    async def arun(self, query):
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+@tool
+def call_calculator_agent(query):
+    """Call the calculator agent."""
+    return "sync"
+
+
+@tool
+def call_rag_agent(query):
+    """Call the RAG agent."""
+    return "sync"
+
+
+@tool
+def save_to_memory(query):
+    """Save to memory."""
+    return "saved"
+
+
+def test_agent_output_accepts_dicts_and_error_strings():
+    assert agent_output({"output": "4"}) == "4"
+    assert agent_output("An error occurred: boom") == "An error occurred: boom"
+
+
+def test_async_tools_normalize_sub_agent_responses():
+    tools = attach_async_subagents(
+        [call_calculator_agent, call_rag_agent, save_to_memory],
+        FakeAgent({"output": "4"}),
+        FakeAgent("An error occurred: no documents"),
+    )
+    calculator, rag, save = tools
+    assert asyncio.run(calculator.ainvoke({"query": "2 + 2"})) == "4"
+    assert asyncio.run(rag.ainvoke({"query": "summarize"})) == "An error occurred: no documents"
+    assert save.coroutine is None
+
+
+def test_async_tools_report_sub_agent_exceptions():
+    (calculator,) = attach_async_subagents([call_calculator_agent], FakeAgent(RuntimeError("down")), None)
+    assert asyncio.run(calculator.ainvoke({"query": "2 + 2"})) == "Error calling calculator agent: down"
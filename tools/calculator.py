@@ -1,22 +1,539 @@
+"""
+Calculator tools backed by a safe, bounded-cost expression evaluator.
+
+Expressions are parsed with `ast` and evaluated node by node. Only numbers,
+arithmetic operators, the constants pi, e and tau and an allowlist of math
+functions are accepted; attributes, subscripts, strings and any other name
+or call are rejected. Every intermediate result is checked against a
+magnitude limit and powers and factorials are checked before they are
+computed, so no single operation can build a huge integer, and a deadline
+is checked at every node. The cost of any expression is therefore bounded
+by the settings.CALC_* limits, whoever sent it. `^` is accepted as a power
+operator, as users often write it.
+
+Two batch modes use NumPy:
+
+- evaluate_array evaluates one expression over arrays of variable values
+- evaluate_many evaluates many expressions, grouping those of the same
+  shape (e.g. "12 * 7" and "3 * 4") into one vectorized evaluation
+"""
+from dataclasses import dataclass, replace
+import ast
+import functools
+import math
+import operator
+import re
+import time
+
+import numpy as np
 from langchain_core.tools import tool
 
+from config import settings
+
+## integers beyond this are not exact in float64, batch results past it are recomputed exactly
+_EXACT_LIMIT = 2 ** 53
+## round(x, -n) builds 10 ** n inside one builtin call, where the deadline cannot interrupt it
+_MAX_ROUND_DIGITS = 30
+
+
+class CalculatorError(ValueError):
+    """An expression that cannot be evaluated within the calculator's limits."""
+
+
+class InvalidExpression(CalculatorError):
+    """An expression using syntax, names or functions the calculator does not support."""
+
+
+@dataclass(frozen=True)
+class Limits:
+    max_length: int = settings.CALC_MAX_LENGTH
+    max_depth: int = settings.CALC_MAX_DEPTH
+    max_magnitude: float = settings.CALC_MAX_MAGNITUDE
+    max_exponent: int = settings.CALC_MAX_EXPONENT
+    timeout: float = settings.CALC_TIMEOUT
+    batch_timeout: float = settings.CALC_BATCH_TIMEOUT
+    max_batch: int = settings.CALC_MAX_BATCH
+
+
+def _integral(values):
+    return np.isfinite(values) & (values == np.floor(values))
+
+
+## n! for every n whose factorial fits in a float64
+_FACTORIALS = np.cumprod(np.concatenate([[1.0], np.arange(1, 171, dtype=np.float64)]))
+
+
+def _array_factorial(n):
+    n = np.asarray(n, dtype=np.float64)
+    valid = _integral(n) & (n >= 0) & (n < len(_FACTORIALS))
+    return np.where(valid, _FACTORIALS[np.where(valid, n, 0).astype(np.int64)], np.nan)
+
+
+def _array_gcd(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    valid = _integral(a) & _integral(b) & (np.abs(a) < _EXACT_LIMIT) & (np.abs(b) < _EXACT_LIMIT)
+    result = np.gcd(np.where(valid, a, 0).astype(np.int64), np.where(valid, b, 0).astype(np.int64))
+    return np.where(valid, result, np.nan)
+
+
+def _array_log(x, base=None):
+    return np.log(x) if base is None else np.log(x) / np.log(base)
+
+
+def _array_round(x, ndigits=None):
+    if ndigits is None:
+        return np.round(x)
+    ## NumPy rounds a whole array to one number of digits
+    digits = np.unique(ndigits)
+    if len(digits) != 1 or not _integral(digits).all():
+        raise TypeError("round() needs the same whole number of digits for every value")
+    if abs(digits[0]) > _MAX_ROUND_DIGITS:
+        raise ValueError(f"round() takes at most {_MAX_ROUND_DIGITS} digits")
+    return np.round(x, int(digits[0]))
+
+
+_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+## name: (function, vectorized function, min args, max args)
+_FUNCTIONS = {
+    "sqrt": (math.sqrt, np.sqrt, 1, 1),
+    "exp": (math.exp, np.exp, 1, 1),
+    "log": (math.log, _array_log, 1, 2),
+    "log10": (math.log10, np.log10, 1, 1),
+    "log2": (math.log2, np.log2, 1, 1),
+    "sin": (math.sin, np.sin, 1, 1),
+    "cos": (math.cos, np.cos, 1, 1),
+    "tan": (math.tan, np.tan, 1, 1),
+    "asin": (math.asin, np.arcsin, 1, 1),
+    "acos": (math.acos, np.arccos, 1, 1),
+    "atan": (math.atan, np.arctan, 1, 1),
+    "atan2": (math.atan2, np.arctan2, 2, 2),
+    "sinh": (math.sinh, np.sinh, 1, 1),
+    "cosh": (math.cosh, np.cosh, 1, 1),
+    "tanh": (math.tanh, np.tanh, 1, 1),
+    "degrees": (math.degrees, np.degrees, 1, 1),
+    "radians": (math.radians, np.radians, 1, 1),
+    "hypot": (math.hypot, np.hypot, 2, 2),
+    "abs": (abs, np.abs, 1, 1),
+    "round": (round, _array_round, 1, 2),
+    "floor": (math.floor, np.floor, 1, 1),
+    "ceil": (math.ceil, np.ceil, 1, 1),
+    "min": (min, lambda *args: functools.reduce(np.minimum, args), 2, 32),
+    "max": (max, lambda *args: functools.reduce(np.maximum, args), 2, 32),
+    "factorial": (math.factorial, _array_factorial, 1, 1),
+    "gcd": (math.gcd, _array_gcd, 2, 2),
+}
+## functions returning integers whatever their arguments
+_INTEGER_FUNCTIONS = {"floor", "ceil", "factorial", "gcd"}
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_POWER = (ast.Pow, ast.BitXor)
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+class _Evaluator:
+    """
+    Walks a parsed expression, on Python numbers or on float64 arrays.
+
+    Vectorized evaluation is strict by default and raises on limit
+    violations like scalar evaluation does; non-strict evaluation replaces
+    the offending elements with nan instead, and marks elements whose
+    intermediate values are too large to be exact integers in `inexact`.
+    """
+
+    def __init__(self, limits, variables=None, vectorized=False, strict=True, deadline=None):
+        self.limits = limits
+        self.variables = variables or {}
+        self.vectorized = vectorized
+        self.strict = strict
+        self.deadline = deadline or time.monotonic() + limits.timeout
+        self.log_max = math.log10(limits.max_magnitude)
+        self.inexact = False
+
+    def evaluate(self, node, depth=0):
+        if depth > self.limits.max_depth:
+            raise CalculatorError(f"expression is nested deeper than {self.limits.max_depth} levels")
+        if time.monotonic() > self.deadline:
+            raise CalculatorError("evaluation took too long")
+
+        if isinstance(node, ast.Expression):
+            return self.evaluate(node.body, depth)
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise InvalidExpression(f"unsupported value {node.value!r}")
+            return self.check(node.value)
+        if isinstance(node, ast.Name):
+            if node.id in self.variables:
+                return self.variables[node.id]
+            if node.id in _CONSTANTS:
+                return self.check(_CONSTANTS[node.id])
+            raise InvalidExpression(f"unknown name '{node.id}'")
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            return _UNARY[type(node.op)](self.evaluate(node.operand, depth + 1))
+        if isinstance(node, ast.BinOp) and (type(node.op) in _BINARY or type(node.op) in _POWER):
+            left = self.evaluate(node.left, depth + 1)
+            right = self.evaluate(node.right, depth + 1)
+            if type(node.op) in _POWER:
+                return self.power(left, right)
+            return self.check(_BINARY[type(node.op)](left, right))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            return self.call(node.func.id, node.args, depth)
+        raise InvalidExpression(f"unsupported syntax '{type(node).__name__}'")
+
+    def check(self, value):
+        """Enforce the magnitude limit on a result."""
+        if self.vectorized:
+            value = np.asarray(value, dtype=np.float64)
+            over = np.isfinite(value) & (np.abs(value) > self.limits.max_magnitude)
+            if over.any():
+                if self.strict:
+                    raise CalculatorError(f"result exceeds the magnitude limit of {self.limits.max_magnitude:g}")
+                value = np.where(over, np.nan, value)
+            self.inexact = self.inexact | (np.abs(value) >= _EXACT_LIMIT)
+            return value
+        if isinstance(value, complex):
+            raise CalculatorError("result is a complex number")
+        if isinstance(value, float) and not math.isfinite(value):
+            raise CalculatorError("result is not a finite number")
+        if abs(value) > self.limits.max_magnitude:
+            raise CalculatorError(f"result exceeds the magnitude limit of {self.limits.max_magnitude:g}")
+        return value
+
+    def power(self, base, exponent):
+        """Raise to a power, refusing before computing it if the result would be too large."""
+        if self.vectorized:
+            base = np.asarray(base, dtype=np.float64)
+            exponent = np.asarray(exponent, dtype=np.float64)
+            too_large = (np.abs(exponent) > self.limits.max_exponent) | (
+                (base != 0) & (exponent * np.log10(np.abs(base)) > self.log_max))
+            if too_large.any():
+                if self.strict:
+                    raise CalculatorError("power exceeds the calculator's limits")
+                base = np.where(too_large, np.nan, base)
+            return self.check(np.power(base, exponent))
+
+        if abs(exponent) > self.limits.max_exponent:
+            raise CalculatorError(f"exponent {exponent} exceeds the limit of {self.limits.max_exponent}")
+        if base != 0 and exponent * math.log10(abs(base)) > self.log_max:
+            raise CalculatorError(f"result exceeds the magnitude limit of {self.limits.max_magnitude:g}")
+        return self.check(base ** exponent)
+
+    def call(self, name, nodes, depth):
+        if name not in _FUNCTIONS:
+            raise InvalidExpression(f"unknown function '{name}'")
+        function, vectorized, min_args, max_args = _FUNCTIONS[name]
+        if not min_args <= len(nodes) <= max_args:
+            expected = min_args if min_args == max_args else f"{min_args} to {max_args}"
+            raise InvalidExpression(f"{name}() takes {expected} arguments, {len(nodes)} given")
+        args = [self.evaluate(node, depth + 1) for node in nodes]
+        if self.vectorized:
+            return self.check(vectorized(*args))
+        if name == "round" and len(args) == 2:
+            if not isinstance(args[1], int):
+                raise CalculatorError("round() digits must be a whole number")
+            if abs(args[1]) > _MAX_ROUND_DIGITS:
+                raise CalculatorError(f"round() takes at most {_MAX_ROUND_DIGITS} digits")
+        if name == "factorial" and isinstance(args[0], int) and args[0] > 0 \
+                and math.lgamma(args[0] + 1) / math.log(10) > self.log_max:
+            raise CalculatorError(f"result exceeds the magnitude limit of {self.limits.max_magnitude:g}")
+        return self.check(function(*args))
+
+
+def _run(evaluator, tree):
+    try:
+        return evaluator.evaluate(tree)
+    except CalculatorError:
+        raise
+    except (ArithmeticError, ValueError, TypeError, RecursionError) as e:
+        raise CalculatorError(str(e)) from e
+
+
+def parse(expression, limits=None):
+    """
+    Parse an expression, checking its length and syntax.
+
+    Returns:
+        The ast.Expression.
+
+    Raises:
+        InvalidExpression: If it is too long or not a Python expression.
+    """
+    limits = limits or Limits()
+    if not isinstance(expression, str):
+        raise InvalidExpression("expression must be a string")
+    if len(expression) > limits.max_length:
+        raise InvalidExpression(f"expression is longer than {limits.max_length} characters")
+    try:
+        return ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise InvalidExpression(f"could not parse expression: {e.msg}") from e
+    except (ValueError, RecursionError, MemoryError) as e:
+        raise InvalidExpression(f"could not parse expression: {e}") from e
+
+
+def evaluate(expression, variables=None, limits=None):
+    """
+    Evaluate an expression.
+
+    Args:
+        expression: Expression text, e.g. "2 ** 10 + sqrt(16)".
+        variables: Optional dict of names to numbers usable in the expression.
+        limits: Limits, defaults to the settings.
+
+    Returns:
+        An int or a float, with Python's arithmetic semantics.
+
+    Raises:
+        InvalidExpression: For syntax, names or functions that are not supported.
+        CalculatorError: For math errors and exceeded limits.
+    """
+    limits = limits or Limits()
+    evaluator = _Evaluator(limits)
+    for name, value in (variables or {}).items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise InvalidExpression(f"variable '{name}' is not a number")
+        evaluator.variables[name] = evaluator.check(value)
+    return _run(evaluator, parse(expression, limits))
+
+
+def evaluate_array(expression, variables=None, limits=None):
+    """
+    Evaluate one expression over arrays of values, vectorized with NumPy.
+
+    Args:
+        expression: Expression over the variable names, e.g. "sqrt(x ** 2 + y ** 2)".
+        variables: Dict of names to numbers or array-likes, broadcast against each other.
+        limits: Limits, defaults to the settings.
+
+    Returns:
+        A float64 ndarray of the broadcast shape. As in NumPy, math errors
+        such as sqrt(-1) or a division by zero give nan or inf.
+
+    Raises:
+        InvalidExpression: For syntax, names or functions that are not supported.
+        CalculatorError: When any element exceeds the limits.
+    """
+    limits = limits or Limits()
+    try:
+        arrays = {name: np.asarray(value, dtype=np.float64) for name, value in (variables or {}).items()}
+        shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+    except (TypeError, ValueError) as e:
+        raise CalculatorError(f"invalid variables: {e}") from e
+    if math.prod(shape) > limits.max_batch:
+        raise CalculatorError(f"more than {limits.max_batch} values")
+
+    evaluator = _Evaluator(limits, vectorized=True)
+    with np.errstate(all="ignore"):
+        evaluator.variables = {name: evaluator.check(array) for name, array in arrays.items()}
+        result = _run(evaluator, parse(expression, limits))
+    return np.broadcast_to(result, np.broadcast_shapes(result.shape, shape)).copy()
+
+
+## numeric literals, lifted out of batch expressions; others (0x10, 1j, 007) stay in the template
+_NUMBER = re.compile(
+    r"(?<![\w.])(?:"
+    r"(?P<float>\d[\d_]*\.[\d_]*(?:[eE][+-]?\d[\d_]*)?|\.\d[\d_]*(?:[eE][+-]?\d[\d_]*)?|\d[\d_]*[eE][+-]?\d[\d_]*)"
+    r"|(?P<int>[1-9][\d_]*|0)"
+    r")(?![\w.])"
+)
+_PLACEHOLDER = "__num"
+_MARK = "\x00"
+
+
+def _lift_numbers(expression):
+    """
+    Cut the numbers out of an expression.
+
+    Returns:
+        (shape, numbers): the text with every number replaced by a mark plus
+        the type of each number, so "2 * 3" and "2.0 * 3" differ and ints keep
+        their semantics, and the numbers' texts.
+    """
+    tokens = _NUMBER.findall(expression)
+    shape = (_NUMBER.sub(_MARK, expression), "".join("f" if number else "i" for number, _ in tokens))
+    return shape, [number or integer for number, integer in tokens]
+
+
+def _template(shape):
+    """Template text of a shape, with a typed placeholder name for each number."""
+    text, types = shape
+    parts = text.split(_MARK)
+    names = [f"{_PLACEHOLDER}{position}{kind}" for position, kind in enumerate(types)]
+    return "".join(part + name for part, name in zip(parts, names)) + parts[-1], names
+
+
+def _is_integer(node):
+    """Whether Python would compute an int for this template, given the types of its numbers."""
+    if isinstance(node, ast.Expression):
+        return _is_integer(node.body)
+    if isinstance(node, ast.Name):
+        return node.id.startswith(_PLACEHOLDER) and node.id.endswith("i")
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, int)
+    if isinstance(node, ast.UnaryOp):
+        return _is_integer(node.operand)
+    if isinstance(node, ast.BinOp):
+        return not isinstance(node.op, ast.Div) and _is_integer(node.left) and _is_integer(node.right)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        name = node.func.id
+        if name in _INTEGER_FUNCTIONS:
+            return True
+        if name == "round":
+            return len(node.args) == 1 or _is_integer(node.args[0])
+        if name in ("abs", "min", "max"):
+            return all(_is_integer(arg) for arg in node.args)
+    return False
+
+
+def _evaluate_group(shape, rows, limits, deadline):
+    """
+    Evaluate expressions of the same shape in one vectorized pass.
+
+    Returns:
+        (values, whether they are ints), values are nan where the exact path is needed.
+    """
+    template, names = _template(shape)
+    try:
+        tree = ast.parse(template, mode="eval")
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return np.full(len(rows), np.nan), False
+    integer = _is_integer(tree)
+    ## round(x, 2.0) is a TypeError in Python, leave it to the exact path
+    if any(isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "round"
+           and len(node.args) == 2 and not _is_integer(node.args[1]) for node in ast.walk(tree)):
+        return np.full(len(rows), np.nan), integer
+    evaluator = _Evaluator(limits, vectorized=True, strict=False, deadline=deadline)
+    try:
+        with np.errstate(all="ignore"):
+            ## NumPy parses the number texts of a whole column at once
+            for name, column in zip(names, zip(*rows)):
+                evaluator.variables[name] = evaluator.check(np.array(column).astype(np.float64))
+            values = evaluator.evaluate(tree)
+    except (ArithmeticError, ValueError, TypeError):
+        return np.full(len(rows), np.nan), integer
+    values = np.broadcast_to(values, (len(rows),))
+    if integer:
+        values = np.where(np.broadcast_to(evaluator.inexact, (len(rows),)), np.nan, values)
+    return values, integer
+
+
+def evaluate_many(expressions, limits=None):
+    """
+    Evaluate many expressions, vectorizing those of the same shape.
+
+    The numbers of each expression are lifted out, so "12 * 7" and "3 * 4"
+    share the template "a * b", which is parsed once and computed for all
+    of them together by NumPy. Results NumPy cannot give exactly (math
+    errors, exceeded limits, integers beyond float64 precision) are
+    recomputed one by one with evaluate. The whole batch shares
+    settings.CALC_BATCH_TIMEOUT.
+
+    Args:
+        expressions: Expression texts.
+        limits: Limits, defaults to the settings.
+
+    Returns:
+        One result per expression: an int or float, or the CalculatorError
+        (or InvalidExpression) raised for it. Floats may differ from
+        evaluate's in the last digit, since NumPy's math functions round
+        differently from the math module's.
+
+    Raises:
+        CalculatorError: If there are more than limits.max_batch expressions.
+    """
+    limits = limits or Limits()
+    if len(expressions) > limits.max_batch:
+        raise CalculatorError(f"more than {limits.max_batch} expressions")
+    deadline = time.monotonic() + limits.batch_timeout
+    results = [None] * len(expressions)
+    exact = []
+
+    groups = {}
+    for index, expression in enumerate(expressions):
+        if (time.monotonic() > deadline or not isinstance(expression, str) or len(expression) > limits.max_length
+                or _PLACEHOLDER in expression or _MARK in expression):
+            exact.append(index)
+            continue
+        shape, numbers = _lift_numbers(expression)
+        group = groups.setdefault(shape, ([], []))
+        group[0].append(index)
+        group[1].append(numbers)
+
+    for shape, (indexes, rows) in groups.items():
+        if time.monotonic() > deadline:
+            exact.extend(indexes)
+            continue
+        values, integer = _evaluate_group(shape, rows, limits, deadline)
+        for index, value in zip(indexes, values.tolist()):
+            if not math.isfinite(value):
+                exact.append(index)
+                continue
+            results[index] = int(value) if integer and value.is_integer() else value
+
+    ## errors and inexact integers take the exact path, within what is left of the batch's time
+    for index in sorted(exact):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            results[index] = CalculatorError("batch evaluation took too long")
+            continue
+        try:
+            results[index] = evaluate(expressions[index], limits=replace(limits, timeout=min(limits.timeout, remaining)))
+        except CalculatorError as e:
+            results[index] = e
+    return results
+
+
+def _format_error(error):
+    if isinstance(error, InvalidExpression):
+        return f"Invalid expression: {error}"
+    return f"Error evaluating expression: {error}"
+
+
 @tool
 def calculator(expression: str) -> str:
     """
     Evaluate a mathematical expression.
-    
+
+    Supports + - * / // % ** (or ^), parentheses, pi, e, tau and the functions
+    sqrt, exp, log, log10, log2, sin, cos, tan, asin, acos, atan, atan2, sinh,
+    cosh, tanh, degrees, radians, hypot, abs, round, floor, ceil, min, max,
+    factorial and gcd.
+
     Args:
-        expression: A mathematical expression to evaluate (e.g., "2 + 3 * 4")
-        
+        expression: A mathematical expression to evaluate (e.g., "2 + 3 * 4" or "sqrt(2) * sin(pi / 4)")
+
     Returns:
         The result of the calculation as a string
     """
     try:
-        allowed_chars = set("0123456789+-*/(). ")
-        if not all(char in allowed_chars for char in expression):
-            return "Invalid characters in expression. Only numbers and operators are allowed."
-        result = eval(expression)
-        return str(result)
-    except Exception as e:
-        return f"Error evaluating expression: {e}"
-            
\ No newline at end of file
+        return str(evaluate(expression))
+    except CalculatorError as e:
+        return _format_error(e)
+
+
+@tool
+def batch_calculator(expressions: list[str]) -> str:
+    """
+    Evaluate several mathematical expressions at once, with the same syntax as the calculator.
+
+    Args:
+        expressions: The expressions to evaluate (e.g., ["12 * 7", "sqrt(144)"])
+
+    Returns:
+        One "expression = result" line per expression
+    """
+    try:
+        results = evaluate_many(expressions)
+    except CalculatorError as e:
+        return _format_error(e)
+    return "\n".join(
+        f"{expression}: {_format_error(result)}" if isinstance(result, CalculatorError) else f"{expression} = {result}"
+        for expression, result in zip(expressions, results)
+    )
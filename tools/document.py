@@ -1,30 +1,33 @@
 from langchain.tools import tool
-from langchain_community.document_loaders import PyPDFLoader,TextLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from concurrent.futures import ProcessPoolExecutor
+from config import settings
+import io
 import os
 
 @tool
-def document_loader(file_path):
+def document_loader(file_path, max_chars=20000):
     """
     Load a document from the specified file path.
     
     Args:
         file_path: Path to the document file.
+        max_chars: Maximum number of characters to return.
         
     Returns:
         Loaded document content as a string.
     """
     try:
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        if file_path.endswith('.pdf'):
-            loader = PyPDFLoader(file_path)
-        else:
-            loader = TextLoader(file_path)
-        documents = loader.load()
-
-        return "\n".join([doc.page_content for doc in documents])
+        parts = []
+        size = 0
+        ## stop parsing as soon as enough text has been collected
+        for page in iter_pages(file_path):
+            parts.append(page.page_content)
+            size += len(page.page_content) + 1
+            if size >= max_chars:
+                break
+        return "\n".join(parts)[:max_chars]
     except Exception as e:
         return f"Error loading document: {e}"
 
@@ -48,4 +51,120 @@ def split_document_content(content, chunk_size=1000, chunk_overlap=200):
         )
         return text_splitter.split_text(content)
     except Exception as e:
-        return f"Error splitting document content: {e}"
\ No newline at end of file
+        return f"Error splitting document content: {e}"
+
+
+def load_document(source, filename=None):
+    """
+    Load a document into a list of page documents.
+    
+    Prefer iter_pages for large files, this keeps every page in memory.
+    
+    Args:
+        source: Path to the document file, or the raw file contents as bytes.
+        filename: Name used to detect the file type when source is bytes.
+        
+    Returns:
+        List of Document objects, one per page.
+    """
+    return list(iter_pages(source, filename=filename))
+
+
+def iter_pages(source, filename=None, workers=None):
+    """
+    Yield the pages of a document as they are parsed.
+    
+    PDFs yield one Document per page. Large PDFs on disk are extracted in a
+    process pool, a few pages at a time, so only a bounded number of pages
+    is held in memory. Text files are streamed in pages of about
+    settings.TEXT_PAGE_CHARS characters.
+    
+    Args:
+        source: Path to the document file, or the raw file contents as bytes.
+        filename: Name used to detect the file type when source is bytes.
+        workers: Processes used to extract large PDFs.
+        
+    Yields:
+        Document objects with source and page metadata.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        name = filename or "document"
+        if name.lower().endswith('.pdf'):
+            yield from _iter_pdf_pages(io.BytesIO(source), name)
+        else:
+            yield from _iter_text_pages(io.StringIO(bytes(source).decode("utf-8", errors="replace")), name)
+        return
+
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"File not found: {source}")
+
+    if source.lower().endswith('.pdf'):
+        yield from _iter_pdf_file_pages(source, workers or settings.PDF_WORKERS)
+    else:
+        with open(source, 'r', encoding="utf-8", errors="replace") as f:
+            yield from _iter_text_pages(f, source)
+
+
+def _iter_pdf_pages(stream, name):
+    from pypdf import PdfReader
+
+    reader = PdfReader(stream)
+    for number, page in enumerate(reader.pages):
+        yield Document(page_content=page.extract_text() or "", metadata={"source": name, "page": number})
+
+
+def _iter_pdf_file_pages(path, workers):
+    from pypdf import PdfReader
+
+    page_count = len(PdfReader(path).pages)
+    if workers <= 1 or page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        with open(path, 'rb') as f:
+            yield from _iter_pdf_pages(f, path)
+        return
+
+    ## extract pages in small ranges and keep only a couple of ranges per worker in flight
+    step = 4
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < workers * 2:
+                start, stop = ranges[next_range]
+                pending.append((start, pool.submit(_extract_pdf_pages, path, start, stop)))
+                next_range += 1
+            start, future = pending.pop(0)
+            for offset, text in enumerate(future.result()):
+                yield Document(page_content=text, metadata={"source": path, "page": start + offset})
+
+
+_pdf_readers = {}
+
+
+def _extract_pdf_pages(path, start, stop):
+    """Extract the text of pages [start, stop) in a worker process."""
+    from pypdf import PdfReader
+
+    ## each worker opens the file once and reuses the reader for every range it gets
+    key = (path, os.path.getmtime(path))
+    if key not in _pdf_readers:
+        _pdf_readers.clear()
+        _pdf_readers[key] = PdfReader(path)
+    reader = _pdf_readers[key]
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _iter_text_pages(stream, name):
+    page_chars = settings.TEXT_PAGE_CHARS
+    lines = []
+    size = 0
+    number = 0
+    for line in stream:
+        lines.append(line)
+        size += len(line)
+        if size >= page_chars:
+            yield Document(page_content="".join(lines), metadata={"source": name, "page": number})
+            number += 1
+            lines, size = [], 0
+    if lines or number == 0:
+        yield Document(page_content="".join(lines), metadata={"source": name, "page": number})